@@ -0,0 +1,174 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare plain dicts with the records of ``matrixctl.records``.
+
+Run it with:
+
+.. code-block:: console
+
+   $ python benchmarks/records.py [NUMBER_OF_USERS]
+
+The benchmark decodes a page-wise JSON payload of users, like
+``matrixctl users`` receives it, and keeps all users in memory, like the
+table output does. It reports the time and the peak memory per run.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import sys
+import time
+import tracemalloc
+import typing as t
+
+from collections.abc import Callable
+
+from matrixctl.records import UserRecord
+from matrixctl.typehints import JsonDict
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+PAGE_SIZE: int = 100
+
+
+def generate_pages(number_of_users: int) -> list[bytes]:
+    """Generate the raw bodies of the paginated users endpoint.
+
+    Parameters
+    ----------
+    number_of_users : int
+        The total number of users.
+
+    Returns
+    -------
+    pages : list of bytes
+        The encoded pages.
+
+    """
+    return [
+        json.dumps(
+            {
+                "users": [
+                    {
+                        "name": f"@user{i}:example.com",
+                        "user_type": None,
+                        "is_guest": False,
+                        "admin": i % 100 == 0,
+                        "deactivated": False,
+                        "shadow_banned": False,
+                        "displayname": f"User {i}",
+                        "avatar_url": None,
+                        "creation_ts": 1_600_000_000_000 + i,
+                        "approved": True,
+                        "erased": False,
+                        "last_seen_ts": None,
+                        "locked": False,
+                    }
+                    for i in range(
+                        start,
+                        min(start + PAGE_SIZE, number_of_users),
+                    )
+                ],
+                "total": number_of_users,
+            },
+        ).encode("utf-8")
+        for start in range(0, number_of_users, PAGE_SIZE)
+    ]
+
+
+def measure(
+    pages: list[bytes],
+    decoder: Callable[[JsonDict], t.Any],
+) -> tuple[float, int]:
+    """Decode all pages and keep the decoded users.
+
+    Parameters
+    ----------
+    pages : list of bytes
+        The encoded pages.
+    decoder : collections.abc.Callable
+        The function, which converts a user to its final representation.
+
+    Returns
+    -------
+    duration : float
+        The duration in seconds.
+    peak : int
+        The peak of allocated memory in bytes.
+
+    """
+
+    def decode() -> list[t.Any]:
+        return [
+            decoder(user)
+            for page in pages
+            for user in json.loads(page)["users"]
+        ]
+
+    # tracemalloc slows down allocations, so time and memory are measured
+    # in separate runs.
+    gc.collect()
+    start: float = time.perf_counter()
+    users: list[t.Any] = decode()
+    duration: float = time.perf_counter() - start
+    del users
+
+    gc.collect()
+    tracemalloc.start()
+    users = decode()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return duration, peak
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    number_of_users: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    pages: list[bytes] = generate_pages(number_of_users)
+
+    print(f"Users: {number_of_users}")
+    for name, decoder in (
+        ("dict", lambda user: user),
+        ("UserRecord", UserRecord.from_json),
+    ):
+        duration, peak = measure(pages, decoder)
+        print(
+            f"{name:>10}: {duration * 1000:8.1f} ms, "
+            f"peak {peak / 1024 / 1024:7.1f} MiB",
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: set ft=python :
@@ -0,0 +1,164 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the throughput of the row output of ``matrixctl get-events``.
+
+Run it with:
+
+.. code-block:: console
+
+   $ python benchmarks/rows.py [NUMBER_OF_EVENTS] > /dev/null
+
+The benchmark renders text message events, like ``get-events`` reads them
+from the database, to stdout. Redirect stdout to measure the rendering
+rather than the terminal. The results are written to stderr in rows per
+second. "console per row" is the output before the ``RowWriter``, which
+created a new console and flushed stdout for every row.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+import typing as t
+
+from collections.abc import Callable
+
+from psycopg.rows import TupleRow
+from rich.console import Console
+
+from matrixctl.commands.get_events.addon import format_row
+from matrixctl.commands.get_events.addon import output_as_rows
+from matrixctl.handlers.rows import Ctx
+from matrixctl.handlers.rows import to_row_context
+from matrixctl.handlers.yaml import YAML
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+class ImagesDisabled:
+    """Stand in for the config file with images disabled."""
+
+    def get(self, *_: str) -> t.Any:
+        """Disable every option."""
+        return False
+
+
+def generate_rows(number_of_events: int) -> list[TupleRow]:
+    """Generate the rows of the query of ``get-events``.
+
+    Parameters
+    ----------
+    number_of_events : int
+        The number of events.
+
+    Returns
+    -------
+    rows : list of psycopg.rows.TupleRow
+        The event ID, event JSON, ``origin_server_ts`` and ``received_ts``.
+
+    """
+    return [
+        (
+            f"$event{i}",
+            json.dumps(
+                {
+                    "type": "m.room.message",
+                    "room_id": "!room:example.com",
+                    "sender": f"@user{i % 50}:example.com",
+                    "content": {"msgtype": "m.text", "body": f"Message {i}"},
+                },
+            ),
+            1_600_000_000_000 + i * 1000,
+            1_600_000_000_000 + i * 1000 + 10,
+        )
+        for i in range(number_of_events)
+    ]
+
+
+def output_console_per_row(rows: list[TupleRow], yaml: YAML) -> int:
+    """Output the rows like ``get-events`` did before the ``RowWriter``."""
+    for event in rows:
+        ev = json.loads(event[1])
+        ctx: Ctx = to_row_context(ev, yaml)
+        console = Console()
+        console.print(format_row(event, ev, ctx), soft_wrap=True)
+        if ctx.post_buf:
+            ctx.write_post_buf(sys.stdout.buffer)
+            sys.stdout.flush()
+        print()
+    return 0
+
+
+def measure(
+    rows: list[TupleRow],
+    output: Callable[[t.Any, YAML], int],
+) -> float:
+    """Measure the throughput of an output function.
+
+    Parameters
+    ----------
+    rows : list of psycopg.rows.TupleRow
+        The rows to output.
+    output : collections.abc.Callable
+        The output function.
+
+    Returns
+    -------
+    throughput : float
+        The throughput in rows per second.
+
+    """
+    yaml: YAML = t.cast(YAML, ImagesDisabled())
+    start: float = time.perf_counter()
+    output(rows, yaml)
+    sys.stdout.flush()
+    return len(rows) / (time.perf_counter() - start)
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    number_of_events: int = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rows: list[TupleRow] = generate_rows(number_of_events)
+
+    print(f"Events: {number_of_events}", file=sys.stderr)
+    for name, output in (
+        ("console per row", output_console_per_row),
+        ("RowWriter", output_as_rows),
+    ):
+        throughput: float = measure(rows, output)
+        print(f"{name:>15}: {throughput:10.0f} rows/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: set ft=python :
@@ -0,0 +1,191 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure indexing and searching the messages of the local mirror.
+
+Run it with:
+
+.. code-block:: console
+
+   $ python benchmarks/search.py [NUMBER_OF_EVENTS]
+
+The benchmark stores ``NUMBER_OF_EVENTS`` events (default: 200000), of
+which four of five are text messages, in a temporary mirror. It indexes
+them with batches of 100 rows and of ``MIRROR_INDEX_BATCH_SIZE`` rows, and
+reports the throughput in events per second. Every batch is one
+transaction. Afterwards, it reports the time per search.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+from matrixctl.handlers.mirror import MIRROR_INDEX_BATCH_SIZE
+from matrixctl.handlers.mirror import EventMirror
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+WORDS: tuple[str, ...] = (
+    "synapse",
+    "deploy",
+    "server",
+    "room",
+    "federation",
+    "backup",
+    "update",
+    "media",
+)
+
+SEARCH_RUNS: int = 100
+
+
+def fill_mirror(mirror: EventMirror, number_of_events: int) -> None:
+    """Store the events in the mirror.
+
+    Parameters
+    ----------
+    mirror : matrixctl.handlers.mirror.EventMirror
+        The mirror.
+    number_of_events : int
+        The number of events.
+
+    Returns
+    -------
+    None
+
+    """
+    room_id: str = "!room:example.com"
+    mirror.store(
+        room_id,
+        [
+            (
+                f"$event{i}",
+                i,
+                room_id,
+                f"@user{i % 50}:example.com",
+                "m.room.member" if i % 5 == 0 else "m.room.message",
+                1_600_000_000_000 + i * 1000,
+                1_600_000_000_000 + i * 1000 + 10,
+                json.dumps(
+                    {
+                        "content": {
+                            "msgtype": "m.text",
+                            "body": " ".join(
+                                (
+                                    *(
+                                        WORDS[(i * k) % len(WORDS)]
+                                        for k in range(7)
+                                    ),
+                                    f"ticket{i % 1000}",
+                                ),
+                            ),
+                        },
+                    },
+                ),
+            )
+            for i in range(number_of_events)
+        ],
+    )
+
+
+def measure_index(path: Path, number_of_events: int, batch_size: int) -> float:
+    """Measure indexing all events of a new mirror.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path to the mirror.
+    number_of_events : int
+        The number of events.
+    batch_size : int
+        The number of rows, which are indexed in one transaction.
+
+    Returns
+    -------
+    throughput : float
+        The throughput in events per second.
+
+    """
+    with EventMirror(path) as mirror:
+        fill_mirror(mirror, number_of_events)
+        start: float = time.perf_counter()
+        mirror.index_messages(batch_size)
+        return number_of_events / (time.perf_counter() - start)
+
+
+def measure_search(path: Path) -> float:
+    """Measure searching the mirror.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path to the indexed mirror.
+
+    Returns
+    -------
+    elapsed : float
+        The time per search in milliseconds.
+
+    """
+    with EventMirror(path) as mirror:
+        start: float = time.perf_counter()
+        for _ in range(SEARCH_RUNS):
+            list(
+                mirror.search(
+                    "deploy AND ticket42", users=["@user3:example.com"]
+                )
+            )
+        return (time.perf_counter() - start) / SEARCH_RUNS * 1e3
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    number_of_events: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    print(f"Events: {number_of_events}")
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in (100, MIRROR_INDEX_BATCH_SIZE):
+            path: Path = Path(directory) / f"mirror{batch_size}.sqlite3"
+            throughput: float = measure_index(
+                path, number_of_events, batch_size
+            )
+            print(f"batch size {batch_size:>6}: {throughput:10.0f} events/s")
+        print(f"search: {measure_search(path):8.2f} ms/search")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: set ft=python :
@@ -20,7 +20,9 @@ from __future__ import annotations
 
 import argparse
 import logging
+import sys
 
+from collections.abc import Callable
 from importlib import import_module
 from pathlib import Path
 from types import ModuleType
@@ -124,6 +126,184 @@ def setup_logging(*, debug_mode: bool) -> None:
     logger_sshtunnel.disabled = not debug_mode
 
 
+def setup_client_pool(yaml: YAML) -> None:
+    """Use this function to configure the connection pool of the API client.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    from matrixctl.handlers.api import ConnectionPoolLimits  # noqa: PLC0415
+    from matrixctl.handlers.api import client_pool  # noqa: PLC0415
+
+    client_pool.configure(
+        ConnectionPoolLimits(
+            max_connections=int(
+                yaml.get("server", "api", "connection_pool", "max_connections")
+            ),
+            max_keepalive_connections=int(
+                yaml.get(
+                    "server",
+                    "api",
+                    "connection_pool",
+                    "max_keepalive_connections",
+                )
+            ),
+            keepalive_expiry=float(
+                yaml.get(
+                    "server", "api", "connection_pool", "keepalive_expiry"
+                )
+            ),
+        )
+    )
+
+
+def setup_db_pool(yaml: YAML) -> None:
+    """Use this function to configure the database connection pool.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    from matrixctl.handlers.db import DBPoolLimits  # noqa: PLC0415
+    from matrixctl.handlers.db import db_pool  # noqa: PLC0415
+
+    db_pool.configure(
+        yaml,
+        DBPoolLimits(
+            pool_size=int(yaml.get("server", "database", "pool_size")),
+            health_check_after=float(
+                yaml.get("server", "database", "health_check_after")
+            ),
+        ),
+    )
+
+
+def setup_response_cache(yaml: YAML) -> None:
+    """Use this function to configure the response cache of the API client.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    from matrixctl.handlers.cache import ResponseCacheConfig  # noqa: PLC0415
+    from matrixctl.handlers.cache import response_cache  # noqa: PLC0415
+
+    response_cache.configure(
+        ResponseCacheConfig(
+            enabled=bool(
+                yaml.get("server", "api", "response_cache", "enabled")
+            ),
+            ttl=float(yaml.get("server", "api", "response_cache", "ttl")),
+            max_bytes=int(
+                yaml.get("server", "api", "response_cache", "max_bytes")
+            ),
+        )
+    )
+
+
+def setup_media_cache(yaml: YAML) -> None:
+    """Use this function to configure the cache of media shown in the terminal.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    from matrixctl.handlers.media_cache import MediaCacheConfig  # noqa: PLC0415
+    from matrixctl.handlers.media_cache import media_cache  # noqa: PLC0415
+
+    media_cache.configure(
+        MediaCacheConfig(
+            memory_max_bytes=int(
+                yaml.get("ui", "image", "cache", "memory_max_bytes")
+            ),
+            memory_max_entries=int(
+                yaml.get("ui", "image", "cache", "memory_max_entries")
+            ),
+            disk_max_bytes=int(
+                yaml.get("ui", "image", "cache", "disk_max_bytes")
+            ),
+        )
+    )
+
+
+def setup_terminal_cell_size_cache(yaml: YAML) -> None:
+    """Use this function to configure the cache of the terminal cell size.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    from matrixctl.terminal import terminal_cell_size_cache  # noqa: PLC0415
+
+    if not yaml.get("ui", "image", "enabled"):
+        return
+    terminal_cell_size_cache.persist = bool(
+        yaml.get("ui", "image", "persist_cell_size")
+    )
+    terminal_cell_size_cache.install_sigwinch_handler()
+
+
+# The handlers are only configured, when the addon uses them, so a command
+# does not import the handlers of other commands (e.g. the database driver
+# and the SSH tunnel).
+HANDLER_SETUPS: tuple[tuple[str, Callable[[YAML], None]], ...] = (
+    ("matrixctl.handlers.api", setup_client_pool),
+    ("matrixctl.handlers.cache", setup_response_cache),
+    ("matrixctl.handlers.db", setup_db_pool),
+    ("matrixctl.handlers.media_cache", setup_media_cache),
+    ("matrixctl.terminal", setup_terminal_cell_size_cache),
+)
+
+
+def setup_handlers(yaml: YAML) -> None:
+    """Use this function to configure the handlers imported by the addon.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    None
+
+    """
+    for module, setup in HANDLER_SETUPS:
+        if module in sys.modules:
+            setup(yaml)
+
+
 def main() -> int:
     """Use the ``main`` function as entrypoint to run the application.
 
@@ -154,7 +334,6 @@ def main() -> int:
         None if args.config is None else (args.config,),
         args.server,
     )
-
     try:
         addon_module_import: str = f"{addon_module}.{args.addon}.addon"
     except AttributeError as e:
@@ -170,6 +349,7 @@ def main() -> int:
 
     logger.debug("addon_module_import: %s", addon_module_import)
     addon: ModuleType = import_module(addon_module_import)
+    setup_handlers(yaml)
 
     if args.debug:
         logger.debug("Disabing help on AttributeError")  # may not be needed
@@ -193,8 +373,6 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    import sys
-
     sys.exit(main())
 
 # vim: set ft=python :
@@ -16,6 +16,8 @@ import dateparser
 
 from dateutil.tz import tzlocal
 
+from matrixctl.handlers.cache import CacheMode
+
 
 # https://docs.python.org/3/library/argparse.html#action-classes
 class ArgparseActionEnum(Action):
@@ -135,3 +137,44 @@ class ArgparseActionDateParser(Action):
                     raise ValueError(err_msg)
 
         setattr(namespace, self.dest, dt)
+
+
+def add_cache_arguments(parser: ArgumentParser) -> None:
+    """Add the arguments, which select the mode of the response cache.
+
+    The mode is stored in ``cache``. It is ``None``, if no argument was
+    given, so the default from the config file is used (see
+    ``ResponseCache.resolve()``).
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser of a command, which lists data.
+
+    Returns
+    -------
+    None
+
+    """
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--cache",
+        action="store_const",
+        const=CacheMode.USE,
+        dest="cache",
+        help="Use cached responses, if they are not expired",
+    )
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_const",
+        const=CacheMode.BYPASS,
+        dest="cache",
+        help="Neither use nor update the response cache",
+    )
+    cache_group.add_argument(
+        "--refresh",
+        action="store_const",
+        const=CacheMode.REFRESH,
+        dest="cache",
+        help="Ignore cached responses, but update the cache",
+    )
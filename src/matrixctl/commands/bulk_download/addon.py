@@ -0,0 +1,384 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to add the ``bulk-download`` subcommand to ``matrixctl``."""
+
+from __future__ import annotations
+
+import asyncio
+import glob
+import logging
+import sys
+import time
+import typing as t
+import urllib.parse
+
+from argparse import Namespace
+from collections.abc import Callable
+from collections.abc import Iterable
+from pathlib import Path
+
+import httpx
+import rich.filesize
+import rich.progress
+
+from attrs import define
+
+from matrixctl.errors import InternalResponseError
+from matrixctl.errors import MediaTooLargeError
+from matrixctl.errors import ParserError
+from matrixctl.errors import QWorkerExit
+from matrixctl.handlers.api import PartialDownload
+from matrixctl.handlers.api import RequestBuilder
+from matrixctl.handlers.api import astreamed_download
+from matrixctl.handlers.api import client_pool
+from matrixctl.handlers.api import paginate
+from matrixctl.handlers.api import request
+from matrixctl.handlers.yaml import YAML
+from matrixctl.parse import Mxc
+from matrixctl.parse import parse_mxc_uri
+from matrixctl.records import MediaRecord
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+DEFAULT_LIMIT: int = 100
+
+logger = logging.getLogger(__name__)
+
+
+@define(slots=True)
+class DownloadSummary:
+    """Count the outcome of a bulk download."""
+
+    downloaded: int = 0
+    skipped: int = 0
+    failed: int = 0
+    transferred: int = 0  # bytes
+
+
+def addon(arg: Namespace, yaml: YAML) -> int:
+    """Download many media files from the matrix instance concurrently.
+
+    Parameters
+    ----------
+    arg : argparse.Namespace
+        The ``Namespace`` object of argparse's ``parse_args()``.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    directory: Path = Path(arg.directory).absolute()
+    parallel: int = max(
+        1,
+        arg.parallel or int(yaml.get("server", "api", "concurrent_limit")),
+    )
+
+    try:
+        if arg.user:
+            uris: list[str] = list(user_media_uris(yaml, arg.user))
+        elif arg.room:
+            uris = room_media_uris(yaml, arg.room)
+        elif arg.input == "-":
+            uris = list(read_mxc_uris(sys.stdin))
+        else:
+            with Path(arg.input).open(encoding="utf-8") as fp:
+                uris = list(read_mxc_uris(fp))
+    except FileNotFoundError:
+        logger.critical("No such file found. Please check your filepath.")
+        return 1
+    except (InternalResponseError, QWorkerExit):
+        logger.critical("Could not get the list of media.")
+        return 1
+
+    media: list[Mxc] = []
+    for uri in uris:
+        try:
+            media.append(parse_mxc_uri(uri))
+        except ParserError:
+            logger.warning("Skip invalid Matrix content URI: %s", uri)
+
+    def make_request(mxc: Mxc) -> RequestBuilder:
+        return RequestBuilder(
+            token=yaml.get_api_token(),
+            domain=yaml.get("server", "api", "domain"),
+            path=(
+                "/_matrix/client/v1/media/download/"
+                f"{mxc.homeserver}/{mxc.media_id}"
+            ),
+            method="GET",
+            params={"allow_redirect": "true"},
+            timeout=30,
+        )
+
+    start: float = time.monotonic()
+    summary: DownloadSummary = asyncio.run(
+        download_all(
+            media,
+            directory,
+            make_request,
+            parallel=parallel,
+            max_size=yaml.get("server", "api", "media", "max_size"),
+        ),
+    )
+    duration: float = max(time.monotonic() - start, 1e-9)
+
+    print(
+        f"Downloaded {summary.downloaded} files "
+        f"({rich.filesize.decimal(summary.transferred)}) in {duration:.1f} s "
+        f"({rich.filesize.decimal(int(summary.transferred / duration))}/s), "
+        f"skipped {summary.skipped} already present, "
+        f"failed {summary.failed}.",
+    )
+    return 1 if summary.failed else 0
+
+
+def read_mxc_uris(lines: Iterable[str]) -> t.Generator[str, None, None]:
+    """Read Matrix content URIs line by line.
+
+    Empty lines and lines starting with ``#`` are ignored.
+
+    Parameters
+    ----------
+    lines : collections.abc.Iterable of str
+        The lines, e.g. an open file.
+
+    Yields
+    ------
+    uri : str
+        A Matrix content URI.
+
+    """
+    for line in lines:
+        uri: str = line.strip()
+        if uri and not uri.startswith("#"):
+            yield uri
+
+
+def user_media_uris(yaml: YAML, user_id: str) -> t.Generator[str, None, None]:
+    """Get the Matrix content URIs of the media uploaded by a user.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+    user_id : str
+        The user ID, e.g. ``@user:domain.tld``.
+
+    Yields
+    ------
+    uri : str
+        A Matrix content URI.
+
+    """
+    domain: str = yaml.get("server", "api", "domain")
+    req: RequestBuilder = RequestBuilder(
+        token=yaml.get_api_token(),
+        domain=domain,
+        path=(
+            "/_synapse/admin/v1/users/"
+            f"{urllib.parse.quote(user_id, safe='')}/media"
+        ),
+        params={"from": 0, "limit": DEFAULT_LIMIT},
+        concurrent_limit=yaml.get("server", "api", "concurrent_limit"),
+    )
+    for record in map(MediaRecord.from_json, paginate(req, "media")):
+        yield f"mxc://{domain}/{record.media_id}"
+
+
+def room_media_uris(yaml: YAML, room_id: str) -> list[str]:
+    """Get the Matrix content URIs of the media in a room.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+    room_id : str
+        The room ID, e.g. ``!room:domain.tld``.
+
+    Returns
+    -------
+    uris : list of str
+        The local and remote Matrix content URIs.
+
+    """
+    req: RequestBuilder = RequestBuilder(
+        token=yaml.get_api_token(),
+        domain=yaml.get("server", "api", "domain"),
+        path=(
+            "/_synapse/admin/v1/room/"
+            f"{urllib.parse.quote(room_id, safe='')}/media"
+        ),
+        timeout=30,
+    )
+    response: httpx.Response = request(req)
+    response_json: dict[str, list[str]] = response.json()
+    return response_json.get("local", []) + response_json.get("remote", [])
+
+
+def is_present(download_path: Path) -> bool:
+    """Check, if a media was already downloaded.
+
+    The file extension of a downloaded file depends on its content type, so
+    every file with the same stem counts.
+
+    Parameters
+    ----------
+    download_path : pathlib.Path
+        The path to download the media to, without the extension.
+
+    Returns
+    -------
+    is_present : bool
+        ``True``, if the media is already present, otherwise ``False``.
+
+    """
+    return any(
+        path.stem == download_path.name and path.suffix != ".part"
+        for path in download_path.parent.glob(
+            f"{glob.escape(download_path.name)}*",
+        )
+    )
+
+
+def file_size(path: Path) -> int:
+    """Get the size of a file.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path to the file.
+
+    Returns
+    -------
+    size : int
+        The size of the file in bytes or ``0``, if it does not exist.
+
+    """
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+async def download_all(
+    media: list[Mxc],
+    directory: Path,
+    make_request: Callable[[Mxc], RequestBuilder],
+    *,
+    parallel: int,
+    max_size: int | None = None,
+) -> DownloadSummary:
+    """Download media concurrently.
+
+    Every media is downloaded to ``<directory>/<homeserver>/<media_id>``
+    with the extension matching its content type. Media, which is already
+    present, is skipped. Interrupted downloads are resumed.
+
+    Parameters
+    ----------
+    media : list of matrixctl.parse.Mxc
+        The media to download.
+    directory : pathlib.Path
+        The directory to download the media to.
+    make_request : collections.abc.Callable
+        Creates the request to download a media.
+    parallel : int
+        The maximum number of concurrent downloads.
+    max_size : int, optional
+        The maximum size of a media in bytes.
+
+    Returns
+    -------
+    summary : matrixctl.commands.bulk_download.addon.DownloadSummary
+        The outcome of the downloads.
+
+    """
+    summary: DownloadSummary = DownloadSummary()
+    queue: asyncio.Queue[Mxc] = asyncio.Queue()
+    for mxc in media:
+        queue.put_nowait(mxc)
+
+    async def worker(
+        client: httpx.AsyncClient,
+        progress: rich.progress.Progress,
+        task: rich.progress.TaskID,
+    ) -> None:
+        while not queue.empty():
+            mxc: Mxc = queue.get_nowait()
+            download_path: Path = directory / mxc.homeserver / mxc.media_id
+            try:
+                if is_present(download_path):
+                    summary.skipped += 1
+                    continue
+                download_path.parent.mkdir(parents=True, exist_ok=True)
+                resumed_at: int = file_size(
+                    PartialDownload(download_path).part_path,
+                )
+                path: Path = await astreamed_download(
+                    make_request(mxc),
+                    download_path,
+                    client,
+                    max_size=max_size,
+                )
+                summary.transferred += file_size(path) - resumed_at
+                summary.downloaded += 1
+            except (
+                InternalResponseError,
+                MediaTooLargeError,
+                OSError,
+                QWorkerExit,
+            ) as err:
+                logger.error(  # noqa: TRY400
+                    "Could not download mxc://%s/%s: %s",
+                    mxc.homeserver,
+                    mxc.media_id,
+                    getattr(err, "message", None) or err,
+                )
+                summary.failed += 1
+            finally:
+                progress.advance(task)
+
+    client: httpx.AsyncClient = client_pool.get_async_client()
+    try:
+        with rich.progress.Progress(
+            "[progress.percentage]{task.percentage:>3.0f}%",
+            rich.progress.BarColumn(bar_width=None),
+            rich.progress.MofNCompleteColumn(),
+            rich.progress.TimeRemainingColumn(),
+        ) as progress:
+            task: rich.progress.TaskID = progress.add_task(
+                "Download",
+                total=len(media),
+            )
+            await asyncio.gather(
+                *(
+                    worker(client, progress, task)
+                    for _ in range(min(parallel, len(media)))
+                ),
+            )
+    finally:
+        await client_pool.aclose()
+    return summary
+
+
+# vim: set ft=python :
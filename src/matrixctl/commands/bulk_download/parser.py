@@ -0,0 +1,100 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to add the ``bulk-download`` subcommand to ``matrixctl``."""
+
+from __future__ import annotations
+
+import typing as t
+
+from argparse import ArgumentParser
+from argparse import _SubParsersAction
+
+from matrixctl.command import SubCommand
+from matrixctl.command import subparser
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+@subparser(SubCommand.MEDIA)
+def subparser_bulk_download(
+    subparsers: _SubParsersAction[t.Any],
+    common_parser: ArgumentParser,
+) -> None:
+    """Create a subparser for the ``matrixctl bulk-download`` command.
+
+    Parameters
+    ----------
+    subparsers : argparse._SubParsersAction of typing.Any
+        The object which is returned by ``parser.add_subparsers()``.
+
+    Returns
+    -------
+    None
+
+    """
+    parser: ArgumentParser = subparsers.add_parser(
+        "bulk-download",
+        help=(
+            "Download many media files from your homeserver to your local "
+            "machine"
+        ),
+        parents=[common_parser],
+    )
+    parser.add_argument(
+        "directory",
+        help=(
+            "The directory where the downloaded files should be saved. Every "
+            "file is saved as <directory>/<homeserver>/<media_id>.<extension>"
+        ),
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "-i",
+        "--input",
+        help=(
+            'A file with one Matrix content URI per line. Use "-" to read '
+            "from stdin"
+        ),
+    )
+    source.add_argument(
+        "-u",
+        "--user",
+        help=(
+            "Download all media uploaded by this user (e.g. @user:domain.tld)"
+        ),
+    )
+    source.add_argument(
+        "-r",
+        "--room",
+        help="Download all media of this room (e.g. !room:domain.tld)",
+    )
+    parser.add_argument(
+        "-p",
+        "--parallel",
+        type=int,
+        default=None,
+        help=(
+            "The number of concurrent downloads (default: the concurrent_limit"
+            " of the config file)"
+        ),
+    )
+    parser.set_defaults(addon="bulk_download")
+
+
+# vim: set ft=python :
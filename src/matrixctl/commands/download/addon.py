@@ -24,6 +24,7 @@ from argparse import Namespace
 from pathlib import Path
 
 from matrixctl.errors import InternalResponseError
+from matrixctl.errors import MediaTooLargeError
 from matrixctl.handlers.api import RequestBuilder
 from matrixctl.handlers.api import streamed_download
 from matrixctl.handlers.yaml import YAML
@@ -73,10 +74,17 @@ def addon(arg: Namespace, yaml: YAML) -> int:
     # https://matrix.michaelsasser.org/_matrix/media/v3/download/matrix.org/rFzCZiffizZGTyWXWONCVjXw?allow_redirect=true
 
     try:
-        streamed_download(req, file_path)
+        streamed_download(
+            req,
+            file_path,
+            max_size=yaml.get("server", "api", "media", "max_size"),
+        )
     except InternalResponseError:
         logger.exception("The file was not downloaded.")
         return 1
+    except MediaTooLargeError as err:
+        logger.error("The file was not downloaded. %s", err)  # noqa: TRY400
+        return 1
     except FileExistsError as err:
         if hasattr(err, "__repr__"):
             logger.error(repr(err))  # noqa: TRY400
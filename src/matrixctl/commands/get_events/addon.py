@@ -19,26 +19,45 @@
 from __future__ import annotations
 
 import datetime
+import gzip
 import json
 import logging
 import typing as t
 
 from argparse import Namespace
-from copy import deepcopy
-from enum import Enum
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
 from sys import stdout
 
-from psycopg.cursor import Cursor
+import psycopg
+import rich.progress
+
 from psycopg.rows import TupleRow
 from rich.console import Console
 from rich.text import Text
 
 from .parser import OutputType
 
-from matrixctl.handlers.db import db_connect
+from matrixctl.handlers.db import QueryBuilder
+from matrixctl.handlers.db import copy_chunks
+from matrixctl.handlers.db import db_pool
+from matrixctl.handlers.db import fetch_batches
+from matrixctl.handlers.db import parallel_scan
+from matrixctl.handlers.db import time_buckets
+from matrixctl.handlers.mirror import EventMirror
 from matrixctl.handlers.rows import Ctx
+from matrixctl.handlers.rows import Event
+from matrixctl.handlers.rows import RowWriter
+from matrixctl.handlers.rows import image_references
 from matrixctl.handlers.rows import to_row_context
 from matrixctl.handlers.yaml import YAML
+from matrixctl.print_helpers import image_prefetcher
 from matrixctl.sanitizers import EventType
 from matrixctl.sanitizers import sanitize_event_type
 from matrixctl.sanitizers import sanitize_room_identifier
@@ -53,46 +72,153 @@ __email__: str = "Michael@MichaelSasser.org"
 logger = logging.getLogger(__name__)
 
 WARN_FOR_EVENTS_OLDER_THAN: float = 30.0
+EXPORT_COMPRESSLEVEL: int = 6
+BUCKETS_PER_CONNECTION: int = 4
+MAX_TIMESTAMP: int = 2**63 - 1  # bigint
+
+ROW_COLUMNS: str = (
+    "event_json.event_id, event_json.json, evs.origin_server_ts, "
+    "evs.received_ts"
+)
+
+# The columns and ``COPY`` options of the export output formats. The events
+# are exported with the CSV format of ``COPY``, because the text format
+# escapes the backslashes in the JSON. For ndjson, delimiter and quote are
+# control characters, which never appear unescaped in JSON, so the events
+# are written unquoted, as they are stored.
+# The header is written once, before the events of the first time bucket.
+EXPORT_FORMATS: dict[OutputType, tuple[str, str, bytes]] = {
+    OutputType.NDJSON: (
+        "event_json.json",
+        "FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01'",
+        b"",
+    ),
+    OutputType.CSV: (
+        (
+            "evs.event_id, evs.origin_server_ts, evs.received_ts, "
+            "evs.room_id, evs.sender, evs.type, event_json.json"
+        ),
+        "FORMAT csv",
+        b"event_id,origin_server_ts,received_ts,room_id,sender,type,json\n",
+    ),
+}
+
+
+def resolve_output_format(
+    output_format: OutputType | None,
+    export: Path | None,
+) -> OutputType:
+    """Get the output format, if it was not given on the command line.
 
+    Parameters
+    ----------
+    output_format : matrixctl.commands.get_events.parser.OutputType, optional
+        The output format from the command line.
+    export : pathlib.Path, optional
+        The file to export the events to.
 
-def add_tuple_to_query_workaround(
-    query: str,
-    values: list[str | int | tuple[str | int, ...]],
-    args: tuple[str | Enum, ...] | t.Literal[False] | None,
-    token: str | Enum,
-) -> tuple[str, list[str | int | tuple[str | int, ...]]]:
-    """Use this function as a workaround for adding a tuple to the query."""
-    query_: str = deepcopy(query)
-    values_: list[str | int | tuple[str | int, ...]] = deepcopy(values)
-    if args:  # One element
-        if len(args) == 1:
-            query_ += f" AND {token} = (%s)"
-            if isinstance(args[0], Enum):
-                values_.append(args[0].value)
-            else:
-                values_.append(args[0])
-        else:  # Multiple elements
-            # TODO: `foo = ANY(%s)` does not seem work. Something not getting
-            #       escaped properly?
-            query_ += f" AND {token} IN ("
-            for i, arg in enumerate(args):
-                if i > 0:
-                    query_ += ", "
-                query_ += "(%s)"
-                if isinstance(arg, Enum):
-                    values_.append(arg.value)
-                else:
-                    values_.append(arg)
-            query_ += ")"
-    return query_, values_
-
-
-def addon(arg: Namespace, yaml: YAML) -> int:
+    Returns
+    -------
+    output_format : matrixctl.commands.get_events.parser.OutputType
+        The output format. Without an export, it is ``rows``. Exports to
+        files ending with ``.csv`` or ``.csv.gz`` are ``csv``, all other
+        exports are ``ndjson``.
+
+    """
+    if output_format is not None:
+        return output_format
+    if export is None:
+        return OutputType.ROWS
+    if export.name.removesuffix(".gz").endswith(".csv"):
+        return OutputType.CSV
+    return OutputType.NDJSON
+
+
+def events_query(columns: str, condition: str) -> str:
+    """Build the query of the events in a time range.
+
+    The first two placeholders of the query are the start (inclusive) and
+    the end (exclusive) of the time range in milliseconds, followed by the
+    placeholders of the condition.
+
+    Parameters
+    ----------
+    columns : str
+        The selected columns of ``evs`` (from ``events``) and ``event_json``.
+    condition : str
+        The condition, which is added to the time range, e.g. from
+        ``matrixctl.handlers.db.QueryBuilder``.
+
+    Returns
+    -------
+    query : str
+        The query, ordered by ``origin_server_ts``.
+
+    """
+    # The columns and the condition are not user input.
+    return (
+        "WITH evs AS ("  # noqa: S608
+        "SELECT event_id, origin_server_ts, received_ts, room_id, sender, "
+        "type "
+        "FROM events "
+        "WHERE origin_server_ts >= (%s) AND origin_server_ts < (%s) "
+        f"AND {condition}"
+        ") "
+        f"SELECT {columns} "
+        "FROM "
+        "event_json INNER JOIN evs ON event_json.event_id = evs.event_id "
+        "ORDER BY evs.origin_server_ts ASC"
+    )
+
+
+def event_time_buckets(
+    since: int,
+    until: int,
+    count: int,
+) -> list[tuple[int, int]]:
+    """Split the time range of the events into buckets.
+
+    The buckets only cover the time from the oldest to the newest event in
+    the range, so no connection scans a time without events.
+
+    Parameters
+    ----------
+    since : int
+        The start of the time range in milliseconds (inclusive).
+    until : int
+        The end of the time range in milliseconds (exclusive).
+    count : int
+        The maximum number of buckets.
+
+    Returns
+    -------
+    buckets : list of tuple of int and int
+        The ordered ``(start, stop)`` pairs of the buckets.
+
+    """
+    with db_pool.connection() as conn:
+        row: TupleRow | None = conn.execute(
+            "SELECT min(origin_server_ts), max(origin_server_ts) "
+            "FROM events "
+            "WHERE origin_server_ts >= (%s) AND origin_server_ts < (%s)",
+            (since, until),
+        ).fetchone()
+    if row is None or row[0] is None:
+        return []
+    return time_buckets(int(row[0]), int(row[1]) + 1, count)
+
+
+def addon(arg: Namespace, yaml: YAML) -> int:  # noqa: C901 PLR0911
     """Get Events from the Server.
 
     It connects via paramiko to the server and runs the psql command provided
     by the synapse playbook to run a query on the Database.
 
+    With ``--parallel N``, the time range is split into buckets, which are
+    scanned concurrently on ``N`` connections of the connection pool, which
+    share one SSH tunnel. The
+    events are output in order, like with one connection.
+
     Parameters
     ----------
     arg : argparse.Namespace
@@ -126,122 +252,229 @@ def addon(arg: Namespace, yaml: YAML) -> int:
     ):
         return 1  # sanitation failed
 
-    since: datetime.datetime = arg.since or datetime.datetime(
-        1970, 1, 1, tzinfo=datetime.timezone.utc
+    output_format: OutputType = resolve_output_format(
+        arg.output_format, arg.export
     )
-    until: datetime.datetime | None = arg.until
+    export: bool = arg.export is not None or output_format == OutputType.CSV
+    if export and output_format not in EXPORT_FORMATS:
+        logger.error("Only the output formats ndjson and csv can be exported.")
+        return 1
+    if arg.parallel < 1:
+        logger.error("The number of connections must be at least 1.")
+        return 1
 
-    query: str = (
-        "WITH evs AS ("
-        "SELECT event_id, origin_server_ts, received_ts "
-        "FROM events WHERE origin_server_ts >= (%s)"
+    since: datetime.datetime = arg.since or datetime.datetime(
+        1970, 1, 1, tzinfo=datetime.timezone.utc
     )
-    values: list[str | int | tuple[str | int, ...]] = [
-        int(since.timestamp() * 1000)
-    ]
-
-    # Add until to the query
-    if until:
-        query += " AND origin_server_ts < (%s)"
-        values.append(int(until.timestamp() * 1000))
-
-    # Add user identifier to the query
-    query, values = add_tuple_to_query_workaround(
-        query, values, user_identifiers, "sender"
+    since_ts: int = int(since.timestamp() * 1000)
+    until_ts: int = (
+        MAX_TIMESTAMP
+        if arg.until is None
+        else int(arg.until.timestamp() * 1000)
     )
 
-    # Add room identifier to the query
-    query, values = add_tuple_to_query_workaround(
-        query, values, room_identifiers, "room_id"
-    )
+    if arg.local:
+        if export or arg.parallel > 1:
+            logger.error(
+                "The mirror can not be exported or scanned in parallel."
+            )
+            return 1
+        return output_local_events(
+            output_format,
+            EventMirror.default_path(yaml.server),
+            yaml,
+            since=since_ts,
+            until=until_ts,
+            users=user_identifiers or None,
+            room_ids=room_identifiers or None,
+            event_types=event_types or None,
+        )
 
-    # Add message type to the query
-    query, values = add_tuple_to_query_workaround(
-        query, values, event_types, "type"
+    filters: QueryBuilder = (
+        QueryBuilder()
+        .where_any("sender", user_identifiers)
+        .where_any("room_id", room_identifiers)
+        .where_any("type", event_types)
     )
 
-    query += ") "
+    scan: Callable[[psycopg.Connection, tuple[int, int]], Iterable[t.Any]]
+    if export:
+        columns, options, header = EXPORT_FORMATS[output_format]
+        query: str = events_query(columns, filters.condition)
+        statement: str = f"COPY ({query}) TO STDOUT ({options})"
+
+        def scan(
+            conn: psycopg.Connection, bucket: tuple[int, int]
+        ) -> Iterable[bytes]:
+            return copy_chunks(conn, statement, (*bucket, *filters.params))
+
+    else:
+        query = events_query(ROW_COLUMNS, filters.condition)
+        itersize: int = int(yaml.get("server", "database", "itersize"))
+
+        def scan(
+            conn: psycopg.Connection, bucket: tuple[int, int]
+        ) -> Iterable[list[TupleRow]]:
+            return fetch_batches(
+                conn, query, (*bucket, *filters.params), itersize
+            )
 
-    query += (
-        "SELECT "
-        "event_json.event_id, "
-        "event_json.json, "
-        "evs.origin_server_ts, "
-        "evs.received_ts "
-        "FROM "
-        "event_json INNER JOIN evs ON event_json.event_id = evs.event_id "
-        "ORDER BY evs.origin_server_ts ASC"
-    )
+    try:
+        buckets: list[tuple[int, int]] = (
+            event_time_buckets(
+                since_ts, until_ts, arg.parallel * BUCKETS_PER_CONNECTION
+            )
+            if arg.parallel > 1
+            else [(since_ts, until_ts)]
+        )
+        results: Iterator[t.Any] = parallel_scan(
+            db_pool.connection, buckets, scan, workers=arg.parallel
+        )
+        if export:
+            with open_export(arg.export) as out:
+                return export_events(
+                    results,
+                    out,
+                    header=header,
+                    show_progress=arg.export is not None,
+                )
+        return output_events(output_format, chain.from_iterable(results), yaml)
+    except psycopg.Error:
+        logger.exception("Unable to query the events from the database.")
+        return 1
 
-    with db_connect(yaml) as conn, conn.cursor() as cur:
-        cur.execute(query, tuple(values))
-        if arg.output_format == OutputType.ROWS:
-            return output_as_rows(cur, yaml)
-        if arg.output_format == OutputType.JSON:
-            return output_as_json(cur)
-    return 0
 
+def output_local_events(
+    output_format: OutputType,
+    path: Path,
+    yaml: YAML,
+    **filters: t.Any,
+) -> int:
+    """Output the events from the local mirror.
 
-def output_as_rows(cur: Cursor[TupleRow], yaml: YAML) -> int:
-    """Output the events as rows."""
-    try:
-        for event in cur:
-            event_id = event[0]
-            ev = json.loads(event[1])
+    Parameters
+    ----------
+    output_format : matrixctl.commands.get_events.parser.OutputType
+        The output format.
+    path : pathlib.Path
+        The path to the mirror.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+    **filters : typing.Any
+        The filters of ``matrixctl.handlers.mirror.EventMirror.events()``.
 
-            origin_server_ts_ = int(event[2])
-            received_ts_ = int(event[3])
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
 
-            origin_server_ts = datetime.datetime.fromtimestamp(
-                origin_server_ts_ / 1000.0, tz=datetime.timezone.utc
-            )
-            received_ts = datetime.datetime.fromtimestamp(
-                received_ts_ / 1000.0, tz=datetime.timezone.utc
-            )
+    """
+    if not path.exists():
+        logger.error(
+            "There is no local mirror yet. Create it with "
+            '"matrixctl room sync-events ROOM_ID".'
+        )
+        return 1
+    with EventMirror(path) as mirror:
+        mirrored: set[str] = set(mirror.rooms())
+        for room_id in filters.get("room_ids") or ():
+            if room_id not in mirrored:
+                logger.warning(
+                    "The room %s is not in the mirror. Add it with "
+                    '"matrixctl room sync-events %s".',
+                    room_id,
+                    room_id,
+                )
+        return output_events(output_format, mirror.events(**filters), yaml)
+
+
+def output_events(
+    output_format: OutputType,
+    rows: Iterable[TupleRow],
+    yaml: YAML,
+) -> int:
+    """Output the events in an output format.
 
-            tdelta: datetime.timedelta = received_ts.replace(
-                microsecond=0
-            ) - origin_server_ts.replace(microsecond=0)
+    Parameters
+    ----------
+    output_format : matrixctl.commands.get_events.parser.OutputType
+        The output format.
+    rows : collections.abc.Iterable of psycopg.rows.TupleRow
+        The event ID, event JSON, ``origin_server_ts`` and ``received_ts``
+        of the events.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
 
-            ts_str = (
-                origin_server_ts.replace(microsecond=0)
-                .isoformat()
-                .replace("+00:00", "")
-            )
-            room_id = ev.get("room_id")
-
-            sender = ev.get("sender")
-
-            kind: str = ev.get("type")
-
-            ctx: Ctx = to_row_context(ev, yaml)
-
-            console = Console()
-            text = Text()
-            text.append(ts_str, style="blue bold")
-            text.append(" | ", style="bright_black")
-            text.append(room_id, style="bright_yellow")
-            text.append(" | ", style="bright_black")
-            text.append(sender, style="bright_magenta")
-            text.append(" | ", style="bright_black")
-            text.append(kind, style="steel_blue1")
-            text.append(" | ", style="bright_black")
-            text.append(event_id, style="purple3")
-            text.append(" | ", style="bright_black")
-            text.append_text(ctx.text)
-            if tdelta.total_seconds() > WARN_FOR_EVENTS_OLDER_THAN:
-                text.append(" | ", style="bright_black")
-                text.append(f"Δt = {tdelta}", style="red bold")
-            console.print(
-                text,
-                soft_wrap=True,
-            )
-            if len(ctx.post_buf) > 0:
-                stdout.buffer.write(ctx.post_buf)
-                stdout.flush()
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    if output_format == OutputType.ROWS:
+        return output_as_rows(rows, yaml)
+    if output_format == OutputType.JSON:
+        return output_as_json(rows)
+    if output_format == OutputType.JSON_COMPACT:
+        return output_as_compact_json(rows, stdout.buffer)
+    if output_format == OutputType.NDJSON:
+        return output_as_ndjson(rows, stdout.buffer)
+    return 0
+
+
+def prefetch_images(
+    cur: Iterable[TupleRow],
+    yaml: YAML,
+) -> Generator[tuple[TupleRow, Event], None, None]:
+    """Decode the events and download their images ahead of time.
 
-            print()
+    The events are read ``ui.image.prefetch`` rows ahead of the row, which
+    is rendered. The images of those rows are downloaded in the background,
+    while the current row is rendered.
 
+    Parameters
+    ----------
+    cur : collections.abc.Iterable of psycopg.rows.TupleRow
+        The rows of the query.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Yields
+    ------
+    row : tuple of psycopg.rows.TupleRow and matrixctl.handlers.rows.Event
+        The row of the query and the decoded event.
+
+    """
+    lookahead: int = (
+        int(yaml.get("ui", "image", "prefetch"))
+        if yaml.get("ui", "image", "enabled")
+        else 0
+    )
+    if lookahead <= 0:
+        for row in cur:
+            yield row, json.loads(row[1])
+        return
+
+    window: deque[tuple[TupleRow, Event]] = deque()
+    with image_prefetcher:
+        for row in cur:
+            ev: Event = json.loads(row[1])
+            for uri, width, height in image_references(ev):
+                image_prefetcher.submit(uri, width, height, yaml)
+            window.append((row, ev))
+            if len(window) > lookahead:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+
+def output_as_rows(cur: Iterable[TupleRow], yaml: YAML) -> int:
+    """Output the events as rows."""
+    try:
+        with RowWriter(stdout.buffer) as writer:
+            for event, ev in prefetch_images(cur, yaml):
+                ctx: Ctx = to_row_context(ev, yaml)
+                writer.write(format_row(event, ev, ctx), ctx)
     except json.decoder.JSONDecodeError:
         logger.exception(
             "Unable to process the response data to JSON.",
@@ -250,7 +483,54 @@ def output_as_rows(cur: Cursor[TupleRow], yaml: YAML) -> int:
     return 0
 
 
-def output_as_json(cur: Cursor[TupleRow]) -> int:
+def format_row(event: TupleRow, ev: Event, ctx: Ctx) -> Text:
+    """Format an event as row."""
+    event_id = event[0]
+
+    origin_server_ts_ = int(event[2])
+    received_ts_ = int(event[3])
+
+    origin_server_ts = datetime.datetime.fromtimestamp(
+        origin_server_ts_ / 1000.0, tz=datetime.timezone.utc
+    )
+    received_ts = datetime.datetime.fromtimestamp(
+        received_ts_ / 1000.0, tz=datetime.timezone.utc
+    )
+
+    tdelta: datetime.timedelta = received_ts.replace(
+        microsecond=0
+    ) - origin_server_ts.replace(microsecond=0)
+
+    ts_str = (
+        origin_server_ts.replace(microsecond=0)
+        .isoformat()
+        .replace("+00:00", "")
+    )
+    room_id = ev.get("room_id")
+
+    sender = ev.get("sender")
+
+    kind: str = ev.get("type")
+
+    text = Text()
+    text.append(ts_str, style="blue bold")
+    text.append(" | ", style="bright_black")
+    text.append(room_id, style="bright_yellow")
+    text.append(" | ", style="bright_black")
+    text.append(sender, style="bright_magenta")
+    text.append(" | ", style="bright_black")
+    text.append(kind, style="steel_blue1")
+    text.append(" | ", style="bright_black")
+    text.append(event_id, style="purple3")
+    text.append(" | ", style="bright_black")
+    text.append_text(ctx.text)
+    if tdelta.total_seconds() > WARN_FOR_EVENTS_OLDER_THAN:
+        text.append(" | ", style="bright_black")
+        text.append(f"Δt = {tdelta}", style="red bold")
+    return text
+
+
+def output_as_json(cur: Iterable[TupleRow]) -> int:
     """Output the events as JSON."""
     try:
         print("[", end="")
@@ -273,4 +553,138 @@ def output_as_json(cur: Cursor[TupleRow]) -> int:
     return 0
 
 
+def output_as_ndjson(cur: Iterable[TupleRow], out: t.BinaryIO) -> int:
+    """Output the events as newline delimited JSON.
+
+    The events are written as they are stored in the database, without
+    decoding them. Synapse stores the events as compact JSON, so every
+    event is on its own line.
+
+    Parameters
+    ----------
+    cur : collections.abc.Iterable of psycopg.rows.TupleRow
+        The rows of the query.
+    out : typing.BinaryIO
+        The stream to write to, e.g. ``sys.stdout.buffer``.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    out.writelines(f"{event[1]}\n".encode() for event in cur)
+    out.flush()
+    return 0
+
+
+def output_as_compact_json(cur: Iterable[TupleRow], out: t.BinaryIO) -> int:
+    """Output the events as compact JSON array.
+
+    Like ``output_as_ndjson()``, the events are written as they are stored
+    in the database, without decoding them.
+
+    Parameters
+    ----------
+    cur : collections.abc.Iterable of psycopg.rows.TupleRow
+        The rows of the query.
+    out : typing.BinaryIO
+        The stream to write to, e.g. ``sys.stdout.buffer``.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    separator: bytes = b"["
+    for event in cur:
+        out.write(separator + event[1].encode())
+        separator = b","
+    out.write(b"]\n" if separator == b"," else b"[]\n")
+    out.flush()
+    return 0
+
+
+@contextmanager
+def open_export(path: Path | None) -> Iterator[t.BinaryIO]:
+    """Open the file, the events are exported to.
+
+    Parameters
+    ----------
+    path : pathlib.Path, optional
+        The path to the file. If it ends with ``.gz``, the file is gzip
+        compressed. If it is ``None``, the events are written to stdout.
+
+    Yields
+    ------
+    out : typing.BinaryIO
+        The opened file.
+
+    """
+    if path is None:
+        yield stdout.buffer
+        stdout.buffer.flush()
+    elif path.suffix == ".gz":
+        with gzip.open(path, "wb", compresslevel=EXPORT_COMPRESSLEVEL) as out:
+            yield t.cast(t.BinaryIO, out)
+    else:
+        with path.open("wb") as out:
+            yield out
+
+
+def export_events(
+    chunks: Iterable[bytes],
+    out: t.BinaryIO,
+    *,
+    header: bytes = b"",
+    show_progress: bool = False,
+) -> int:
+    """Export the events, which were copied with ``COPY ... TO STDOUT``.
+
+    The data is streamed from the database to the file in the chunks, the
+    server sends, without creating a Python object for every event.
+
+    Parameters
+    ----------
+    chunks : collections.abc.Iterable of bytes
+        The data of ``COPY``, e.g. from
+        ``matrixctl.handlers.db.copy_chunks()``.
+    out : typing.BinaryIO
+        The stream to write to.
+    header : bytes, default: b""
+        The header, which is written before the events.
+    show_progress : bool, default: False
+        ``True``, if a progress bar should be shown on stderr, otherwise
+        ``False``.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    events: int = 0
+    progress: rich.progress.Progress = rich.progress.Progress(
+        rich.progress.SpinnerColumn(),
+        rich.progress.TextColumn("{task.fields[events]} events"),
+        rich.progress.DownloadColumn(),
+        rich.progress.TransferSpeedColumn(),
+        rich.progress.TimeElapsedColumn(),
+        console=Console(stderr=True),
+        disable=not show_progress,
+    )
+    with progress:
+        task: rich.progress.TaskID = progress.add_task(
+            "Export", total=None, events=0
+        )
+        out.write(header)
+        for chunk in chunks:
+            out.write(chunk)
+            events += chunk.count(b"\n")
+            progress.update(task, advance=len(chunk), events=events)
+    logger.info("Exported %d events.", events)
+    return 0
+
+
 # vim: set ft=python :
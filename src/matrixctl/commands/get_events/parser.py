@@ -24,6 +24,7 @@ from argparse import ArgumentParser
 from argparse import _SubParsersAction
 from enum import Enum
 from enum import unique
+from pathlib import Path
 
 from matrixctl.argparse_action import ArgparseActionDateParser
 from matrixctl.argparse_action import ArgparseActionEnum
@@ -42,17 +43,26 @@ class OutputType(Enum):
 
     Supported output types are:
 
-    =========== ===================================================
-    Output Type Description
-    =========== ===================================================
-    rows        Output raw JSON.
-    json        Output only a summary as row.
-    =========== ===================================================
+    ============ ==================================================
+    Output Type  Description
+    ============ ==================================================
+    rows         Output a summary of every event as row.
+    json         Output the events as indented JSON array.
+    json-compact Output the events as compact JSON array.
+    ndjson       Output the events as stored, one event per line.
+    csv          Output the events and their metadata as CSV.
+    ============ ==================================================
+
+    The output formats ``ndjson`` and ``csv`` can be exported to a file
+    with ``--export``.
 
     """
 
     ROWS = "rows"
     JSON = "json"
+    JSON_COMPACT = "json-compact"
+    NDJSON = "ndjson"
+    CSV = "csv"
 
 
 @subparser(SubCommand.ROOM)
@@ -97,8 +107,43 @@ def subparser_get_events(
         "--output-format",
         type=OutputType,
         action=ArgparseActionEnum,
-        default=OutputType.ROWS,
-        help="The Output format (default: 'rows')",
+        default=None,
+        help=(
+            "The Output format (default: 'rows', or with --export 'csv' for "
+            "files ending with '.csv' or '.csv.gz' and 'ndjson' otherwise)"
+        ),
+    )
+    parser.add_argument(
+        "-x",
+        "--export",
+        type=Path,
+        metavar="FILE",
+        help=(
+            "Export the events to a file in the ndjson or csv output format. "
+            "The format is taken from the file name, unless it is given with "
+            "--output-format. The file is gzip compressed, if it ends with "
+            "'.gz'"
+        ),
+    )
+    parser.add_argument(
+        "-l",
+        "--local",
+        action="store_true",
+        help=(
+            "Query the local mirror instead of the database. Rooms are added "
+            "to and updated in the mirror with 'matrixctl room sync-events'"
+        ),
+    )
+    parser.add_argument(
+        "-p",
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "Split the time range into buckets and scan them concurrently on "
+            "N database connections (default: 1)"
+        ),
     )
     parser.add_argument(
         "-s",
@@ -29,6 +29,7 @@ from matrixctl.errors import InternalResponseError
 from matrixctl.handlers.api import RequestBuilder
 from matrixctl.handlers.api import Response
 from matrixctl.handlers.api import request
+from matrixctl.handlers.cache import response_cache
 from matrixctl.handlers.yaml import YAML
 from matrixctl.typehints import JsonDict
 
@@ -62,6 +63,7 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         token=yaml.get_api_token(),
         domain=yaml.get("server", "api", "domain"),
         path="/_synapse/admin/v1/statistics/database/rooms",
+        cache=response_cache.resolve(arg.cache),
     )
 
     try:
@@ -23,6 +23,7 @@ import typing as t
 from argparse import ArgumentParser
 from argparse import _SubParsersAction
 
+from matrixctl.argparse_action import add_cache_arguments
 from matrixctl.command import SubCommand
 from matrixctl.command import subparser
 
@@ -59,6 +60,7 @@ def subparser_rooms(
         action="store_true",
         help="Change the output format to JSON",
     )
+    add_cache_arguments(parser)
     parser.set_defaults(addon="largest_rooms")
 
 
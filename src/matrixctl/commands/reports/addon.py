@@ -18,20 +18,20 @@
 
 from __future__ import annotations
 
-import json
 import logging
 
 from argparse import Namespace
-from contextlib import suppress
+from collections.abc import Generator
 
 from .to_table import to_table
 
 from matrixctl.errors import InternalResponseError
+from matrixctl.errors import QWorkerExit
 from matrixctl.handlers.api import RequestBuilder
-from matrixctl.handlers.api import Response
-from matrixctl.handlers.api import generate_worker_configs
-from matrixctl.handlers.api import request
+from matrixctl.handlers.api import paginate
 from matrixctl.handlers.yaml import YAML
+from matrixctl.print_helpers import print_json_array
+from matrixctl.records import EventReportRecord
 from matrixctl.typehints import JsonDict
 
 
@@ -60,10 +60,6 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         Non-zero value indicates error code, or zero on success.
 
     """
-    reports: list[JsonDict] = []
-    next_token: int | None = None
-    total: int | None = None
-
     # TODO: API bool
     req: RequestBuilder = RequestBuilder(
         token=yaml.get_api_token(),
@@ -78,37 +74,24 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         concurrent_limit=yaml.get("server", "api", "concurrent_limit"),
     )
 
+    reports: Generator[JsonDict, None, None] = paginate(
+        req,
+        "event_reports",
+        limit=arg.limit,
+    )
+
     try:
-        response: Response = request(req)
-    except InternalResponseError:
+        if arg.to_json:
+            print_json_array(reports)
+        else:
+            # The table needs all rows to determine the column width
+            for line in to_table(
+                list(map(EventReportRecord.from_json, reports))
+            ):
+                print(line)
+    except (InternalResponseError, QWorkerExit):
         logger.critical("Could not get the data do build the user table.")
         return 1
-    response_json: JsonDict = response.json()
-
-    reports += response_json["event_reports"]
-
-    with suppress(KeyError):  # Done: No more users
-        next_token = int(response_json["next_token"])
-        total = int(response_json["total"])
-        if 0 < arg.limit < total:
-            total = arg.limit
-
-    # New group to not suppress KeyError in here
-    if next_token is not None and total is not None and total > DEFAULT_LIMIT:
-        async_responses = request(
-            generate_worker_configs(req, next_token, total),
-        )
-
-        for async_response in async_responses:
-            reports_list = async_response.json()["event_reports"]
-            for report in reports_list:
-                reports.append(report)
-
-    if arg.to_json:
-        print(json.dumps(reports, indent=4))
-    else:
-        for line in to_table(reports):
-            print(line)
 
     return 0
 
@@ -21,12 +21,13 @@ from __future__ import annotations
 import logging
 
 from collections.abc import Generator
+from collections.abc import Iterable
 from shutil import get_terminal_size
 from textwrap import TextWrapper
 
 from matrixctl.handlers.table import table
 from matrixctl.print_helpers import timestamp_to_dt
-from matrixctl.typehints import JsonDict
+from matrixctl.records import EventReportRecord
 
 
 __author__: str = "Michael Sasser"
@@ -49,7 +50,9 @@ TABLE_HEADERS: tuple[str, ...] = (
 logger = logging.getLogger(__name__)
 
 
-def to_table(events_raw: list[JsonDict]) -> Generator[str, None, None]:
+def to_table(
+    events_raw: Iterable[EventReportRecord],
+) -> Generator[str, None, None]:
     """Use this function as helper to pint the events as table.
 
     Examples
@@ -85,8 +88,8 @@ def to_table(events_raw: list[JsonDict]) -> Generator[str, None, None]:
 
     Parameters
     ----------
-    events_raw : list of matrixctl.typehints.JsonDict
-        A list of events from the API.
+    events_raw : Iterable of matrixctl.records.EventReportRecord
+        The event reports from the API.
 
     Yields
     ------
@@ -105,27 +108,25 @@ def to_table(events_raw: list[JsonDict]) -> Generator[str, None, None]:
     )
 
     for event in events_raw:
-        dt: str = timestamp_to_dt(event["received_ts"], "\n")
+        dt: str = timestamp_to_dt(event.received_ts, "\n")
         canonical_alias: str = (
-            event["canonical_alias"]
-            if event["canonical_alias"] is not None
-            else "-"
+            event.canonical_alias if event.canonical_alias is not None else "-"
         )
 
         events.append(
             (
                 "\n".join(TABLE_HEADERS),
                 (
-                    f"{event['id']}\n"
+                    f"{event.id}\n"
                     f"{dt}\n"
-                    f"{event['score']}\n"
+                    f"{event.score}\n"
                     f"{canonical_alias}\n"
-                    f"{event['name'] or '-'}\n"
-                    f"{event['room_id']}\n"
-                    f"{event['event_id']}\n"
-                    f"{event['sender']}\n"
-                    f"{event['user_id']}\n"
-                    f"{wrapper_reason.fill(text=event['reason'])}"
+                    f"{event.name or '-'}\n"
+                    f"{event.room_id}\n"
+                    f"{event.event_id}\n"
+                    f"{event.sender}\n"
+                    f"{event.user_id}\n"
+                    f"{wrapper_reason.fill(text=event.reason or '')}"
                 ),
             ),
         )
@@ -18,20 +18,22 @@
 
 from __future__ import annotations
 
-import json
 import logging
 
 from argparse import Namespace
-from contextlib import suppress
+from collections.abc import Generator
+from collections.abc import Iterable
 
 from .to_table import to_table
 
 from matrixctl.errors import InternalResponseError
+from matrixctl.errors import QWorkerExit
 from matrixctl.handlers.api import RequestBuilder
-from matrixctl.handlers.api import Response
-from matrixctl.handlers.api import generate_worker_configs
-from matrixctl.handlers.api import request
+from matrixctl.handlers.api import paginate
+from matrixctl.handlers.cache import response_cache
 from matrixctl.handlers.yaml import YAML
+from matrixctl.print_helpers import print_json_array
+from matrixctl.records import RoomRecord
 from matrixctl.typehints import JsonDict
 
 
@@ -60,10 +62,6 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         Non-zero value indicates error code, or zero on success.
 
     """
-    rooms: list[JsonDict] = []
-    next_token: int | None = None
-    total: int | None = None
-
     req: RequestBuilder = RequestBuilder(
         token=yaml.get_api_token(),
         domain=yaml.get("server", "api", "domain"),
@@ -74,6 +72,7 @@ def addon(arg: Namespace, yaml: YAML) -> int:
             ),
         },
         concurrent_limit=yaml.get("server", "api", "concurrent_limit"),
+        cache=response_cache.resolve(arg.cache),
     )
 
     if arg.filter:
@@ -85,76 +84,62 @@ def addon(arg: Namespace, yaml: YAML) -> int:
     if arg.order_by_size:
         req.params["order_by"] = "size"
 
+    rooms: Generator[JsonDict, None, None] = paginate(
+        req,
+        "rooms",
+        next_token_key="next_batch",  # noqa: S106
+        total_key="total_rooms",
+        limit=arg.limit,
+    )
+
     try:
-        response: Response = request(req)
-    except InternalResponseError:
+        generate_output(
+            filter_empty_rooms(rooms) if arg.empty else rooms,
+            to_json=arg.to_json,
+        )
+    except (InternalResponseError, QWorkerExit):
         logger.critical("Could not get the user table.")
         return 1
-    response_json: JsonDict = response.json()
-
-    rooms += response_json["rooms"]
-
-    with suppress(KeyError):  # Done: No more users
-        next_token = int(response_json["next_batch"])
-        total = int(response_json["total_rooms"])
-        if 0 < arg.limit < total:
-            total = arg.limit
-
-    # New group to not suppress KeyError in here
-    if next_token is not None and total is not None and total > DEFAULT_LIMIT:
-        async_responses = request(
-            generate_worker_configs(req, next_token, total),
-        )
-
-        for async_response in async_responses:
-            users_list = async_response.json()["rooms"]
-            for room in users_list:
-                rooms.append(room)
-
-    generate_output(
-        filter_empty_rooms(rooms) if arg.empty else rooms,
-        to_json=arg.to_json,
-    )
 
     return 0
 
 
 def filter_empty_rooms(
-    rooms: list[JsonDict],
+    rooms: Iterable[JsonDict],
     *,
     local_users: bool = True,
-) -> list[JsonDict]:
+) -> Generator[JsonDict, None, None]:
     """Filter for empty rooms.
 
     Parameters
     ----------
-    rooms : list of matrixctl.typehints.JsonDict
-        A rooms list.
+    rooms : Iterable of matrixctl.typehints.JsonDict
+        The rooms.
     local_users : bool
         ``true``: Filter, if no local user is in the room.
         ``false``: Filter, if no user is in the room.
 
-    Returns
-    -------
-    rooms : list of matrixctl.typehints.JsonDict
-        The filtered list.
+    Yields
+    ------
+    room : matrixctl.typehints.JsonDict
+        The empty rooms.
 
     """
-    return [
+    return (
         room
         for room in rooms
         if room["joined_local_members" if local_users else "joined_members"]
         == 0
-    ]
+    )
 
 
-def generate_output(rooms: list[JsonDict], *, to_json: bool) -> None:
+def generate_output(rooms: Iterable[JsonDict], *, to_json: bool) -> None:
     """Use this helper to generate the output.
 
     Parameters
     ----------
-    rooms : list of matrixctl.typehints.JsonDict
-        A list of rooms from the API.
+    rooms : Iterable of matrixctl.typehints.JsonDict
+        The rooms from the API.
     to_json : bool
         ``True``, when the output should be in the JSON format.
         ``False``, when the output should be a table.
@@ -165,11 +150,13 @@ def generate_output(rooms: list[JsonDict], *, to_json: bool) -> None:
 
     """
     if to_json:
-        print(json.dumps(rooms, indent=4))
+        print_json_array(rooms)
     else:
-        for line in to_table(rooms):
+        # The table needs all rows to determine the column width
+        rooms_list: list[RoomRecord] = list(map(RoomRecord.from_json, rooms))
+        for line in to_table(rooms_list):
             print(line)
-        print(f"Total number of rooms: {len(rooms)}")
+        print(f"Total number of rooms: {len(rooms_list)}")
 
 
 # vim: set ft=python :
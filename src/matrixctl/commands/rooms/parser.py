@@ -23,6 +23,7 @@ import typing as t
 from argparse import ArgumentParser
 from argparse import _SubParsersAction
 
+from matrixctl.argparse_action import add_cache_arguments
 from matrixctl.command import SubCommand
 from matrixctl.command import subparser
 
@@ -92,6 +93,7 @@ def subparser_rooms(
         action="store_true",
         help="Output the data as JSON",
     )
+    add_cache_arguments(parser)
     parser.set_defaults(addon="rooms")
 
 
@@ -21,9 +21,10 @@ from __future__ import annotations
 import logging
 
 from collections.abc import Generator
+from collections.abc import Iterable
 
 from matrixctl.handlers.table import table
-from matrixctl.typehints import JsonDict
+from matrixctl.records import RoomRecord
 
 
 __author__: str = "Michael Sasser"
@@ -33,13 +34,13 @@ __email__: str = "Michael@MichaelSasser.org"
 logger = logging.getLogger(__name__)
 
 
-def to_table(rooms_list: list[JsonDict]) -> Generator[str, None, None]:
+def to_table(rooms_list: Iterable[RoomRecord]) -> Generator[str, None, None]:
     """Use this function as helper to pint the room table.
 
     Parameters
     ----------
-    rooms_list : list of matrixctl.typehints.JsonDict
-        A list of rooms from the API.
+    rooms_list : collections.abc.Iterable of matrixctl.records.RoomRecord
+        The rooms from the API.
 
     Yields
     ------
@@ -51,10 +52,10 @@ def to_table(rooms_list: list[JsonDict]) -> Generator[str, None, None]:
     room_list: list[tuple[str, str, str, str]] = []
 
     for room in rooms_list:
-        name = room["name"]
-        members: str = str(room["joined_members"])
-        alias: str = room["canonical_alias"]
-        room_id: str = room["room_id"]
+        name = room.name
+        members: str = str(room.joined_members)
+        alias = room.canonical_alias
+        room_id: str = room.room_id
 
         room_list.append(
             (
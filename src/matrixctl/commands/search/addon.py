@@ -0,0 +1,154 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to add the ``search`` subcommand to ``matrixctl``."""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import typing as t
+
+from argparse import Namespace
+from collections.abc import Iterator
+from pathlib import Path
+
+from psycopg.rows import TupleRow
+
+from matrixctl.commands.get_events.addon import MAX_TIMESTAMP
+from matrixctl.commands.get_events.addon import output_events
+from matrixctl.handlers.mirror import MIRROR_SEARCH_LIMIT
+from matrixctl.handlers.mirror import EventMirror
+from matrixctl.handlers.yaml import YAML
+from matrixctl.sanitizers import sanitize_room_identifier
+from matrixctl.sanitizers import sanitize_sequence
+from matrixctl.sanitizers import sanitize_user_identifier
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+# The messages of the FTS5 query parser. Not all of them start with "fts5:".
+FTS5_QUERY_ERRORS: tuple[str, ...] = (
+    "fts5:",
+    "syntax error",
+    "unterminated string",
+    "no such column",  # A column filter, e.g. "synapse:up"
+    "expected integer",  # e.g. "NEAR(a b, x)"
+)
+
+
+def addon(arg: Namespace, yaml: YAML) -> int:
+    """Search the messages in the local mirror.
+
+    New events in the mirror are added to the full-text index before the
+    search.
+
+    Examples
+    --------
+    .. code-block:: console
+
+       $ matrixctl mod search "deploy*" --users @michael:domain.tld -o ndjson
+
+    Parameters
+    ----------
+    arg : argparse.Namespace
+        The ``Namespace`` object of argparse's ``parse_args()``
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    user_identifiers: tuple[str, ...] | t.Literal[False] | None = (
+        sanitize_sequence(sanitize_user_identifier, arg.users)
+    )
+    room_identifiers: tuple[str, ...] | t.Literal[False] | None = (
+        sanitize_sequence(
+            sanitize_room_identifier,
+            arg.room_ids,
+            yaml.get_room_alias,
+        )
+    )
+    if user_identifiers is False or room_identifiers is False:
+        return 1  # sanitation failed
+    limit: int = MIRROR_SEARCH_LIMIT if arg.limit is None else arg.limit
+    if limit < 1:
+        logger.error("The limit must be at least 1.")
+        return 1
+
+    path: Path = EventMirror.default_path(yaml.server)
+    if not path.exists():
+        logger.error(
+            "There is no local mirror yet. Create it with "
+            '"matrixctl room sync-events ROOM_ID".'
+        )
+        return 1
+
+    with EventMirror(path) as mirror:
+        try:
+            mirror.index_messages()
+            rows: Iterator[TupleRow] = mirror.search(
+                arg.query,
+                since=(
+                    0
+                    if arg.since is None
+                    else int(arg.since.timestamp() * 1000)
+                ),
+                until=(
+                    MAX_TIMESTAMP
+                    if arg.until is None
+                    else int(arg.until.timestamp() * 1000)
+                ),
+                users=user_identifiers or None,
+                room_ids=room_identifiers or None,
+                limit=limit,
+            )
+        except sqlite3.OperationalError as e:
+            if is_query_error(e):
+                logger.error("The search query is invalid: %s", e)  # noqa: TRY400
+            else:  # e.g. the mirror is locked by a sync
+                logger.error("Unable to search the mirror: %s", e)  # noqa: TRY400
+            return 1
+        return output_events(arg.output_format, rows, yaml)
+
+
+def is_query_error(error: sqlite3.OperationalError) -> bool:
+    """Check, if an error was caused by an invalid FTS5 query.
+
+    Parameters
+    ----------
+    error : sqlite3.OperationalError
+        The error.
+
+    Returns
+    -------
+    is_query_error : bool
+        ``True``, if the query is invalid, otherwise ``False``, e.g. when
+        the mirror is locked.
+
+    """
+    message: str = str(error)
+    return any(query_error in message for query_error in FTS5_QUERY_ERRORS)
+
+
+# vim: set ft=python :
@@ -0,0 +1,120 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to add the ``search`` subcommand to ``matrixctl``."""
+
+from __future__ import annotations
+
+import typing as t
+
+from argparse import ArgumentParser
+from argparse import _SubParsersAction
+
+from matrixctl.argparse_action import ArgparseActionDateParser
+from matrixctl.argparse_action import ArgparseActionEnum
+from matrixctl.argparse_action import TimeDirection
+from matrixctl.command import SubCommand
+from matrixctl.command import subparser
+from matrixctl.commands.get_events.parser import OutputType
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+@subparser(SubCommand.MOD)
+def subparser_search(
+    subparsers: _SubParsersAction[t.Any],
+    common_parser: ArgumentParser,
+) -> None:
+    """Create a subparser for the ``matrixctl search`` command.
+
+    Parameters
+    ----------
+    subparsers : argparse._SubParsersAction of typing.Any
+        The object which is returned by ``parser.add_subparsers()``.
+
+    Returns
+    -------
+    None
+
+    """
+    parser: ArgumentParser = subparsers.add_parser(
+        "search",
+        help=(
+            "Search the messages in the local mirror, which is created with "
+            "'matrixctl room sync-events'"
+        ),
+        parents=[common_parser],
+    )
+    parser.add_argument(
+        "query",
+        help=(
+            "The full-text query in the SQLite FTS5 syntax "
+            "(e.g. 'deploy AND synapse*')"
+        ),
+    )
+    parser.add_argument(
+        "--users",
+        nargs="+",
+        help="Filter by senders (e.g. @michael:foo.bar @dwight:foo.bar)",
+    )
+    parser.add_argument(
+        "-r",
+        "--room_ids",
+        nargs="+",
+        help="Filter by rooms using the room identifiers",
+    )
+    parser.add_argument(
+        "-s",
+        "--since",
+        action=ArgparseActionDateParser,
+        time_direction=TimeDirection.PAST,
+        help="Search messages on or newer than the specified date and time.",
+    )
+    parser.add_argument(
+        "-u",
+        "--until",
+        action=ArgparseActionDateParser,
+        time_direction=TimeDirection.PAST,
+        help="Search messages on or older than the specified date.",
+    )
+    parser.add_argument(
+        "-l",
+        "--limit",
+        type=int,
+        help=(
+            "The maximum number of messages, the best matches first "
+            "(default: 50)"
+        ),
+    )
+    parser.add_argument(
+        "-o",
+        "--output-format",
+        type=OutputType,
+        action=ArgparseActionEnum,
+        choices=tuple(
+            output_type.value
+            for output_type in OutputType
+            if output_type != OutputType.CSV
+        ),
+        default=OutputType.ROWS,
+        help="The Output format (default: 'rows')",
+    )
+    parser.set_defaults(addon="search")
+
+
+# vim: set ft=python :
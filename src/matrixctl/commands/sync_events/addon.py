@@ -0,0 +1,83 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to mirror the events of rooms into a local database."""
+
+from __future__ import annotations
+
+import logging
+import typing as t
+
+from argparse import Namespace
+
+from matrixctl.handlers.db import db_connect
+from matrixctl.handlers.mirror import EventMirror
+from matrixctl.handlers.yaml import YAML
+from matrixctl.sanitizers import sanitize_room_identifier
+from matrixctl.sanitizers import sanitize_sequence
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+
+def addon(arg: Namespace, yaml: YAML) -> int:
+    """Copy the new events of rooms into the local mirror.
+
+    Parameters
+    ----------
+    arg : argparse.Namespace
+        The ``Namespace`` object of argparse's ``parse_args()``
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    err_code : int
+        Non-zero value indicates error code, or zero on success.
+
+    """
+    room_identifiers: tuple[str, ...] | t.Literal[False] | None = (
+        sanitize_sequence(
+            sanitize_room_identifier,
+            arg.room_ids,
+            yaml.get_room_alias,
+        )
+    )
+    if room_identifiers is False:
+        return 1  # sanitation failed
+
+    itersize: int = int(yaml.get("server", "database", "itersize"))
+    with EventMirror(EventMirror.default_path(yaml.server)) as mirror:
+        rooms: t.Sequence[str] = room_identifiers or mirror.rooms()
+        if not rooms:
+            logger.error(
+                "There are no rooms in the mirror yet. Add rooms with "
+                '"matrixctl room sync-events ROOM_ID".'
+            )
+            return 1
+        with db_connect(yaml) as conn:
+            for room_id in rooms:
+                new_events: int = mirror.sync_room(conn, room_id, itersize)
+                print(f"{room_id}: {new_events} new events")
+        mirror.index_messages()
+    return 0
+
+
+# vim: set ft=python :
@@ -0,0 +1,71 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to mirror the events of rooms into a local database."""
+
+from __future__ import annotations
+
+import typing as t
+
+from argparse import ArgumentParser
+from argparse import _SubParsersAction
+
+from matrixctl.command import SubCommand
+from matrixctl.command import subparser
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+@subparser(SubCommand.ROOM)
+def subparser_sync_events(
+    subparsers: _SubParsersAction[t.Any],
+    common_parser: ArgumentParser,
+) -> None:
+    """Create a subparser for the ``matrixctl sync-events`` command.
+
+    Parameters
+    ----------
+    subparsers : argparse._SubParsersAction of typing.Any
+        The object which is returned by
+        ``parser.add_subparsers()``.
+
+    Returns
+    -------
+    None
+
+    """
+    parser: ArgumentParser = subparsers.add_parser(
+        "sync-events",
+        help=(
+            "Copy the new events of rooms from the database into a local "
+            "mirror, which can be queried with get-events --local"
+        ),
+        parents=[common_parser],
+    )
+    parser.add_argument(
+        "room_ids",
+        nargs="*",
+        help=(
+            "The room identifiers or aliases of the rooms (default: all "
+            "rooms in the mirror)"
+        ),
+    )
+    parser.set_defaults(addon="sync_events")
+
+
+# vim: set ft=python :
@@ -26,7 +26,7 @@ from pathlib import Path
 
 from matrixctl.errors import InternalResponseError
 from matrixctl.handlers.api import RequestBuilder
-from matrixctl.handlers.api import request
+from matrixctl.handlers.api import streamed_upload
 from matrixctl.handlers.yaml import YAML
 from matrixctl.typehints import JsonDict
 
@@ -58,12 +58,6 @@ def addon(arg: Namespace, yaml: YAML) -> int:
     mime_types: MimeTypes = MimeTypes()
     file_type: str = str(mime_types.guess_type(file_path.name)[0])
     logger.debug("upload file_type: %s", file_type)
-    try:
-        with file_path.open("rb") as fp:
-            file: bytes = fp.read()
-    except FileNotFoundError:
-        print("No such file found. Please check your filepath.")
-        return 1
 
     req: RequestBuilder = RequestBuilder(
         token=yaml.get_api_token(),
@@ -71,10 +65,13 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         path="/_matrix/media/r0/upload/",
         method="POST",
         headers={"Content-Type": file_type},
-        content=file,
+        timeout=60,  # The server processes the file before it responds
     )
     try:
-        response: JsonDict = request(req).json()
+        response: JsonDict = streamed_upload(req, file_path).json()
+    except FileNotFoundError:
+        print("No such file found. Please check your filepath.")
+        return 1
     except InternalResponseError:
         logger.exception("The file was not uploaded.")
         return 1
@@ -18,20 +18,21 @@
 
 from __future__ import annotations
 
-import json
 import logging
 
 from argparse import Namespace
-from contextlib import suppress
+from collections.abc import Generator
 
 from .to_table import to_table
 
 from matrixctl.errors import InternalResponseError
+from matrixctl.errors import QWorkerExit
 from matrixctl.handlers.api import RequestBuilder
-from matrixctl.handlers.api import Response
-from matrixctl.handlers.api import generate_worker_configs
-from matrixctl.handlers.api import request
+from matrixctl.handlers.api import paginate
+from matrixctl.handlers.cache import response_cache
 from matrixctl.handlers.yaml import YAML
+from matrixctl.print_helpers import print_json_array
+from matrixctl.records import UserRecord
 from matrixctl.typehints import JsonDict
 
 
@@ -75,9 +76,6 @@ def addon(arg: Namespace, yaml: YAML) -> int:
 
     """
     len_domain = len(yaml.get("server", "api", "domain")) + 1  # 1 for :
-    users: list[JsonDict] = []
-    next_token: int | None = None
-    total: int | None = None
 
     # TODO: API bool
     req: RequestBuilder = RequestBuilder(
@@ -97,40 +95,29 @@ def addon(arg: Namespace, yaml: YAML) -> int:
         },
         timeout=10,
         concurrent_limit=yaml.get("server", "api", "concurrent_limit"),
+        cache=response_cache.resolve(arg.cache),
+    )
+
+    users: Generator[JsonDict, None, None] = paginate(
+        req,
+        "users",
+        limit=arg.limit,
     )
 
     try:
-        response: Response = request(req)
-    except InternalResponseError:
+        if arg.to_json:
+            print_json_array(users)
+        else:
+            # The table needs all rows to determine the column width
+            users_list: list[UserRecord] = list(
+                map(UserRecord.from_json, users)
+            )
+            for line in to_table(users_list, len_domain):
+                print(line)
+            print(f"Total number of users: {len(users_list)}")
+    except (InternalResponseError, QWorkerExit):
         logger.critical("Could not get the data do build the user table.")
         return 1
-    response_json: JsonDict = response.json()
-
-    users += response_json["users"]
-
-    with suppress(KeyError):  # Done: No more users
-        next_token = int(response_json["next_token"])
-        total = int(response_json["total"])
-        if 0 < arg.limit < total:
-            total = arg.limit
-
-    # New group to not suppress KeyError in here
-    if next_token is not None and total is not None and total > DEFAULT_LIMIT:
-        async_responses = request(
-            generate_worker_configs(req, next_token, total),
-        )
-
-        for async_response in async_responses:
-            users_list = async_response.json()["users"]
-            for user in users_list:
-                users.append(user)
-
-    if arg.to_json:
-        print(json.dumps(users, indent=4))
-    else:
-        for line in to_table(users, len_domain):
-            print(line)
-        print(f"Total number of users: {len(users)}")
 
     return 0
 
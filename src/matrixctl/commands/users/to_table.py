@@ -21,10 +21,11 @@ from __future__ import annotations
 import logging
 
 from collections.abc import Generator
+from collections.abc import Iterable
 
 from matrixctl.handlers.table import table
 from matrixctl.print_helpers import human_readable_bool
-from matrixctl.typehints import JsonDict
+from matrixctl.records import UserRecord
 
 
 __author__: str = "Michael Sasser"
@@ -35,7 +36,7 @@ logger = logging.getLogger(__name__)
 
 
 def to_table(
-    users_list: list[JsonDict],
+    users_list: Iterable[UserRecord],
     len_domain: int,
 ) -> Generator[str, None, None]:
     """Use this function as helper to pint the users table.
@@ -63,8 +64,8 @@ def to_table(
 
     Parameters
     ----------
-    users_list : list of matrixctl.typehints.JsonDict
-        A list of rooms from the API.
+    users_list : collections.abc.Iterable of matrixctl.records.UserRecord
+        The users from the API.
     len_domain : int
         The length of the homeservers domain.
 
@@ -78,12 +79,12 @@ def to_table(
     user_list: list[tuple[str, str, str, str, str, str]] = []
 
     for user in users_list:
-        name = user["name"][1:-len_domain]
-        deactivated: str = human_readable_bool(user["deactivated"])
-        shadow_banned: str = human_readable_bool(user["shadow_banned"])
-        admin: str = human_readable_bool(user["admin"])
-        guest: str = human_readable_bool(user["is_guest"])
-        display_name = user["displayname"]
+        name = user.name[1:-len_domain]
+        deactivated: str = human_readable_bool(user.deactivated)
+        shadow_banned: str = human_readable_bool(user.shadow_banned)
+        admin: str = human_readable_bool(user.admin)
+        guest: str = human_readable_bool(user.is_guest)
+        display_name = user.displayname
 
         user_list.append(
             (
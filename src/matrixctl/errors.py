@@ -78,6 +78,14 @@ class QWorkerExit(Exception):  # noqa: N818
     """Use this exception when you want to exit an Queue worker."""
 
 
+class MediaTooLargeError(Exception):
+    """Use this exception, when a media exceeds the configured maximum size.
+
+    This is not a bug, so the exception does not derive from ``Error``.
+
+    """
+
+
 class ConfigFileError(Error):
     """Use this exception class for everything related to the config file."""
 
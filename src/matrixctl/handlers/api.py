@@ -19,18 +19,28 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
 import logging
 import math
-import shutil
+import random
 import sys
-import tempfile
+import threading
+import time
 import typing as t
 import urllib.parse
 
+from collections import deque
+from collections.abc import AsyncGenerator
+from collections.abc import Callable
 from collections.abc import Generator
 from collections.abc import Iterable
+from contextlib import nullcontext
 from contextlib import suppress
 from copy import deepcopy
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
 from mimetypes import MimeTypes
 from pathlib import Path
 
@@ -38,13 +48,23 @@ import httpx
 import rich.progress
 
 from attrs import define
+from attrs import evolve
 from attrs import field
+from typing_extensions import Self
 
 from matrixctl import __version__
 from matrixctl.errors import InternalResponseError
+from matrixctl.errors import MediaTooLargeError
 from matrixctl.errors import QWorkerExit
+from matrixctl.errors import ShouldNeverHappenError
+from matrixctl.handlers.cache import CACHEABLE_METHODS
+from matrixctl.handlers.cache import CacheMode
+from matrixctl.handlers.cache import response_cache
+from matrixctl.handlers.media import DEFAULT_SPOOL_THRESHOLD
+from matrixctl.handlers.media import MediaBuffer
 from matrixctl.parse import Mxc
 from matrixctl.parse import parse_mxc_uri
+from matrixctl.typehints import JsonDict
 
 
 __author__: str = "Michael Sasser"
@@ -52,6 +72,12 @@ __email__: str = "Michael@MichaelSasser.org"
 
 HTTP_RETURN_CODE_302: int = 302
 HTTP_RETURN_CODE_404: int = 404
+HTTP_RETURN_CODE_429: int = 429
+HTTP_RETURN_CODE_206: int = 206
+HTTP_RETURN_CODE_416: int = 416
+HTTP_RETURN_CODE_500: int = 500
+SAFE_METHODS: frozenset[str] = frozenset({"GET", "HEAD", "OPTIONS"})
+UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes
 DEFAULT_SUCCESS_CODES: tuple[int, ...] = (
     200,
     201,
@@ -75,6 +101,156 @@ OutputQueueType = asyncio.Queue[
 ]
 
 
+class ConnectionPoolLimits(t.NamedTuple):
+    """Use this NamedTuple to configure the limits of the connection pool.
+
+    The values are taken from ``server.api.connection_pool`` in the config
+    file.
+
+    """
+
+    max_connections: int = 10
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+
+    def to_httpx(self) -> httpx.Limits:
+        """Get the limits as ``httpx.Limits``.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        limits : httpx.Limits
+            The limits, which can be passed to a httpx client.
+
+        """
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class RetryPolicy(t.NamedTuple):
+    """Use this NamedTuple to describe, when and how requests are retried.
+
+    A request is retried, when the server answered with one of the
+    ``retry_status_codes`` or the connection failed. The delay between two
+    attempts grows exponentially with "full jitter", unless the server tells
+    us how long to wait, either with the ``Retry-After`` header or with
+    ``retry_after_ms`` in the body of an ``M_LIMIT_EXCEEDED`` error.
+
+    Notes
+    -----
+    A rate limited request (``429``) was not processed by the server, which
+    is why it is retried regardless of the HTTP method. All other failures
+    are only retried for idempotent requests (see
+    ``RequestBuilder.is_idempotent``), because the server may have
+    processed the request already.
+
+    """
+
+    max_attempts: int = 4  # Including the first attempt
+    backoff_base: float = 0.5  # seconds
+    backoff_max: float = 30.0  # seconds
+    max_retry_after: float = 300.0  # seconds
+    retry_status_codes: frozenset[int] = frozenset({429, 502, 503, 504})
+
+    def backoff(self, attempt: int) -> float:
+        """Get a randomized exponential backoff delay.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of the attempt, which failed (starting with ``1``).
+
+        Returns
+        -------
+        delay : float
+            The delay in seconds.
+
+        """
+        ceiling: float = min(
+            self.backoff_max,
+            self.backoff_base * 2 ** max(attempt - 1, 0),
+        )
+        return random.uniform(0, ceiling)  # noqa: S311
+
+    @staticmethod
+    def retry_after(response: httpx.Response) -> float | None:
+        """Get the delay the server asked for.
+
+        Parameters
+        ----------
+        response : httpx.Response
+            The response of the failed request.
+
+        Returns
+        -------
+        delay : float or None
+            The delay in seconds or ``None``, when the server did not ask for
+            a specific delay.
+
+        """
+        header: str | None = response.headers.get("Retry-After")
+        if header is not None:
+            with suppress(ValueError):
+                return max(float(header), 0.0)
+            with suppress(TypeError, ValueError):
+                date: datetime = parsedate_to_datetime(header)
+                return max(
+                    (date - datetime.now(tz=timezone.utc)).total_seconds(),
+                    0.0,
+                )
+        with suppress(Exception):
+            return max(float(response.json()["retry_after_ms"]) / 1000, 0.0)
+        return None
+
+    def get_delay(
+        self,
+        request_config: RequestBuilder,
+        attempt: int,
+        response: httpx.Response | None = None,
+    ) -> float | None:
+        """Get the delay before the next attempt.
+
+        Parameters
+        ----------
+        request_config : matrixctl.handlers.api.RequestBuilder
+            The request, which was sent.
+        attempt : int
+            The number of the attempt, which failed (starting with ``1``).
+        response : httpx.Response, optional
+            The response or ``None``, when the connection failed.
+
+        Returns
+        -------
+        delay : float or None
+            The delay in seconds or ``None``, when the request must not be
+            retried.
+
+        """
+        if attempt >= self.max_attempts or not request_config.is_replayable:
+            return None
+        if response is None:
+            return (
+                self.backoff(attempt) if request_config.is_idempotent else None
+            )
+        if response.status_code not in self.retry_status_codes:
+            return None
+        if (
+            response.status_code != HTTP_RETURN_CODE_429
+            and not request_config.is_idempotent
+        ):
+            return None
+        delay: float | None = self.retry_after(response)
+        if delay is None:
+            return self.backoff(attempt)
+        return delay if delay <= self.max_retry_after else None
+
+
 class RequestStrategy(t.NamedTuple):
     """Use this NamedTuple as request strategy data.
 
@@ -110,6 +286,47 @@ class RequestBuilder:
     concurrent_limit: int = field(default=4, converter=int)
     timeout: float = field(default=5.0, converter=float)  # seconds
     success_codes: tuple[int, ...] = field(default=DEFAULT_SUCCESS_CODES)
+    retry: RetryPolicy = field(factory=RetryPolicy)
+    # None: Derive it from the method
+    idempotent: bool | None = field(default=None)
+    # Commands, which list data, opt in with ResponseCache.resolve()
+    cache: CacheMode = field(default=CacheMode.BYPASS)
+
+    @property
+    def is_idempotent(self) -> bool:
+        """Check, if sending the request multiple times is safe.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        is_idempotent : bool
+            ``True``, if the request is idempotent, otherwise ``False``.
+
+        """
+        if self.idempotent is not None:
+            return self.idempotent
+        return self.method.upper() in SAFE_METHODS
+
+    @property
+    def is_replayable(self) -> bool:
+        """Check, if the body of the request can be sent again.
+
+        A stream (e.g. a generator) can only be consumed once.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        is_replayable : bool
+            ``True``, if the request can be sent again, otherwise ``False``.
+
+        """
+        return self.content is None or isinstance(self.content, str | bytes)
 
     @property
     def headers_with_auth(self) -> dict[str, str]:
@@ -182,6 +399,340 @@ class RequestBuilder:
         )
 
 
+class ClientPool:
+    """Share the connections to the homeserver across the whole process.
+
+    Opening a new client for every request means a new TCP + TLS + HTTP/2
+    handshake for every request. Instead, the pool keeps one synchronous
+    client for the lifetime of the process and one asynchronous client per
+    event loop.
+
+    Notes
+    -----
+    An ``httpx.AsyncClient`` is bound to the event loop it was used in.
+    ``request()`` runs every asynchronous request in a new event loop, which
+    is why the asynchronous client needs to be closed with ``aclose()``
+    before the event loop is closed.
+
+    """
+
+    __slots__ = ("_async_client", "_async_loop", "_client", "_lock", "limits")
+
+    def __init__(self, limits: ConnectionPoolLimits | None = None) -> None:
+        self.limits: ConnectionPoolLimits = limits or ConnectionPoolLimits()
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def configure(self, limits: ConnectionPoolLimits) -> None:
+        """Change the limits of the pool.
+
+        An already open synchronous client will be closed, so the next
+        request uses the new limits.
+
+        Parameters
+        ----------
+        limits : matrixctl.handlers.api.ConnectionPoolLimits
+            The new limits.
+
+        Returns
+        -------
+        None
+
+        """
+        if limits == self.limits:
+            return
+        logger.debug("Configure connection pool: %s", limits)
+        self.close()
+        self.limits = limits
+
+    def get_client(self) -> httpx.Client:
+        """Get the shared synchronous client.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        client : httpx.Client
+            The shared client.
+
+        """
+        with self._lock:  # The client is shared with other threads
+            if self._client is None or self._client.is_closed:
+                logger.debug("Open new synchronous client.")
+                self._client = httpx.Client(
+                    http2=True,
+                    limits=self.limits.to_httpx(),
+                )
+            return self._client
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """Get the shared asynchronous client of the running event loop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        client : httpx.AsyncClient
+            The shared client of the running event loop.
+
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if (
+            self._async_client is None
+            or self._async_client.is_closed
+            or self._async_loop is not loop
+        ):
+            logger.debug("Open new asynchronous client.")
+            self._async_client = httpx.AsyncClient(
+                http2=True,
+                limits=self.limits.to_httpx(),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """Close the asynchronous client of the running event loop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            logger.debug("Asynchronous client closed.")
+        self._async_client = None
+        self._async_loop = None
+
+    def close(self) -> None:
+        """Close the synchronous client.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._client is not None:
+            self._client.close()
+            logger.debug("Synchronous client closed.")
+        self._client = None
+
+
+client_pool: ClientPool = ClientPool()
+atexit.register(client_pool.close)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limit the number of concurrent requests adaptively.
+
+    The limiter uses an additive increase, multiplicative decrease (AIMD)
+    strategy, like TCP congestion control does. While the server answers
+    quickly, the limit grows (doubling per round trip at first, by one per
+    round trip afterwards) up to ``ceiling``. When the server answers with
+    ``429 Too Many Requests``, a ``5xx`` error, the connection fails or the
+    p95 latency of the recent requests rises above ``latency_tolerance``
+    times the baseline, the limit is multiplied by ``backoff_factor``.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       limiter = AdaptiveConcurrencyLimiter(ceiling=10)
+
+       async with limiter:
+           start = time.monotonic()
+           response = await client.get(url)
+           limiter.observe(time.monotonic() - start, response.status_code)
+
+    Parameters
+    ----------
+    ceiling : int
+        The maximum number of concurrent requests. This is usually the
+        ``concurrent_limit`` from the config file.
+    floor : int, default=1
+        The minimum number of concurrent requests.
+    initial : int, optional
+        The initial number of concurrent requests. By default, it is half of
+        the ``ceiling``.
+    backoff_factor : float, default=0.5
+        The factor, the limit is multiplied with, when backing off.
+    latency_tolerance : float, default=2.0
+        The factor, the p95 latency may rise above the baseline before the
+        limiter backs off.
+    window : int, default=32
+        The number of recent latencies, which are used for the p95 latency.
+
+    """
+
+    MIN_SAMPLES: t.ClassVar[int] = 5
+    BASELINE_DRIFT: t.ClassVar[float] = 0.01
+
+    __slots__ = (
+        "_baseline",
+        "_condition",
+        "_last_backoff",
+        "_latencies",
+        "_slow_start",
+        "backoff_factor",
+        "ceiling",
+        "floor",
+        "in_flight",
+        "latency_tolerance",
+        "limit",
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        ceiling: int,
+        *,
+        floor: int = 1,
+        initial: int | None = None,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        window: int = 32,
+    ) -> None:
+        self.ceiling: int = max(1, ceiling)
+        self.floor: int = min(max(1, floor), self.ceiling)
+        self.limit: float = float(
+            min(max(initial or self.ceiling // 2, self.floor), self.ceiling)
+        )
+        self.backoff_factor: float = backoff_factor
+        self.latency_tolerance: float = latency_tolerance
+        self.in_flight: int = 0
+        self._condition: asyncio.Condition = asyncio.Condition()
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._baseline: float | None = None
+        self._slow_start: bool = True
+        self._last_backoff: float = 0.0
+
+    async def __aenter__(self) -> Self:
+        """Wait for a free slot."""
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.in_flight < int(self.limit)
+            )
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Release the slot."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @property
+    def p95(self) -> float | None:
+        """Get the p95 latency of the recent requests.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        p95 : float, optional
+            The p95 latency in seconds or ``None``, if there are not enough
+            samples yet.
+
+        """
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return None
+        latencies: list[float] = sorted(self._latencies)
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    def observe(self, latency: float, status_code: int | None) -> None:
+        """Adapt the limit to the outcome of a request.
+
+        Parameters
+        ----------
+        latency : float
+            The time the request took in seconds.
+        status_code : int, optional
+            The status code of the response or ``None``, if the request
+            failed without a response.
+
+        Returns
+        -------
+        None
+
+        """
+        if (
+            status_code is None
+            or status_code == HTTP_RETURN_CODE_429
+            or status_code >= HTTP_RETURN_CODE_500
+        ):
+            self._backoff(f"status_code={status_code}")
+            return
+
+        self._latencies.append(latency)
+        p95: float | None = self.p95
+        if p95 is not None:
+            if self._baseline is None:
+                self._baseline = p95
+            elif p95 > self._baseline * self.latency_tolerance:
+                self._backoff(f"p95={p95:.3f}s baseline={self._baseline:.3f}s")
+                # The old samples would trigger the next back off right away
+                self._latencies.clear()
+                return
+            else:
+                # Let the baseline follow a server, which got slower for good
+                self._baseline = min(
+                    p95,
+                    self._baseline * (1.0 + self.BASELINE_DRIFT),
+                )
+
+        if self._slow_start:
+            self.limit = min(self.limit + 1.0, float(self.ceiling))
+        else:
+            self.limit = min(
+                self.limit + 1.0 / self.limit, float(self.ceiling)
+            )
+
+    def _backoff(self, reason: str) -> None:
+        """Multiplicatively decrease the limit.
+
+        Only back off once per round trip. The requests, which were already
+        on their way, when the limit was decreased, report the same
+        congestion.
+
+        Parameters
+        ----------
+        reason : str
+            The reason for the log message.
+
+        Returns
+        -------
+        None
+
+        """
+        now: float = time.monotonic()
+        round_trip: float = max(self._latencies, default=0.0)
+        self._slow_start = False
+        if now - self._last_backoff < round_trip:
+            return
+        self._last_backoff = now
+        self.limit = max(self.limit * self.backoff_factor, float(self.floor))
+        logger.debug(
+            "Back off to a concurrent limit of %d (%s)",
+            int(self.limit),
+            reason,
+        )
+
+
 def preplan_request_strategy(
     limit: int,
     concurrent_limit: float,
@@ -251,7 +802,7 @@ def preplan_request_strategy(
     return RequestStrategy(
         new_limit,
         new_step_size,
-        new_limit,
+        new_workers,
         offset,
         new_iterations,
     )
@@ -309,17 +860,18 @@ def generate_worker_configs(
     # overwrite the concurrent limit
     request_config.concurrent_limit = strategy.concurrent_limit
     # reapply next_token to get the full range back for i
+    # The next_token is the offset of the first entry of the next page.
     logger.debug(
         "for loop (generator):"
-        "next_token + 1 = %s , strategy.limit + next_token + 1 = %s, "
+        "next_token = %s , strategy.limit + next_token = %s, "
         "strategy.step_size = %s",
-        next_token + 1,
-        strategy.limit + next_token + 1,
+        next_token,
+        strategy.limit + next_token,
         strategy.step_size,
     )
     for i in range(
-        next_token + 1,
-        strategy.limit + next_token + 1,
+        next_token,
+        strategy.limit + next_token,
         strategy.step_size,
     ):
         worker_config = deepcopy(request_config)  # deepcopy needed
@@ -330,6 +882,7 @@ def generate_worker_configs(
 async def async_worker(
     input_queue: InputQueueType,
     output_queue: OutputQueueType,
+    limiter: AdaptiveConcurrencyLimiter | None = None,
 ) -> None:
     """Use this coro as worker to make (a)synchronous request.
 
@@ -339,6 +892,9 @@ async def async_worker(
         The input queue, which provides the ``RequestBuilder``.
     output_queue : asyncio.Queue
         The output queue, which gets the responses of there requests.
+    limiter : matrixctl.handlers.api.AdaptiveConcurrencyLimiter, optional
+        The limiter, which is shared between the workers. If it is
+        ``None``, the requests are not limited.
 
 
     See Also
@@ -354,7 +910,7 @@ async def async_worker(
     while not input_queue.empty():
         idx, item, client = await input_queue.get()
         try:
-            output = await _arequest(item, client)
+            output = await _arequest(item, client, limiter)
             await output_queue.put((idx, output))
 
         # Capture all exceptions and put them into the output queue
@@ -437,7 +993,7 @@ async def exec_async_request(
 
     """
     concurrent_limit: int = 1
-    client: httpx.AsyncClient = httpx.AsyncClient(http2=True)
+    client: httpx.AsyncClient = client_pool.get_async_client()
 
     input_queue: InputQueueType = asyncio.Queue()
 
@@ -459,18 +1015,22 @@ async def exec_async_request(
     input_size = input_queue.qsize()
 
     # Generate task pool, and start collecting data.
+    # The concurrent_limit is the ceiling. The limiter adapts the number of
+    # concurrent requests to the load of the server.
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        concurrent_limit,
+    )
     output_queue: OutputQueueType = asyncio.Queue()
     result_task = asyncio.create_task(
         group_async_results(input_size, output_queue),
     )
     tasks = [
-        asyncio.create_task(async_worker(input_queue, output_queue))
-        for _ in range(concurrent_limit)
+        asyncio.create_task(async_worker(input_queue, output_queue, limiter))
+        for _ in range(min(concurrent_limit, input_size))
     ]
 
     # Wait for tasks complete
     await asyncio.gather(*tasks)
-    await client.aclose()  # close the client
 
     # Wait for result fetching
     results = await result_task
@@ -533,7 +1093,11 @@ def request(
         nonlocal request_config
         # cast because mypy doesn't recognize the return type of
         # exec_async_request
-        return await exec_async_request(request_config)
+        try:
+            return await exec_async_request(request_config)
+        finally:
+            # The client can't outlive the event loop
+            await client_pool.aclose()
 
     # This is needed because here is decided, if the request was meant to be
     # async or sync. Even though a request was meant to be async, it may
@@ -545,6 +1109,191 @@ def request(
     return asyncio.run(gen_async_request())
 
 
+async def apaginate(  # noqa: PLR0913
+    request_config: RequestBuilder,
+    records_key: str,
+    *,
+    next_token_key: str = "next_token",  # noqa: S107
+    total_key: str = "total",
+    limit: int = -1,
+    reorder_window: int | None = None,
+) -> AsyncGenerator[JsonDict, None]:
+    """Use this async generator to stream the records of a paginated endpoint.
+
+    The first page is requested on its own, to get the total number of
+    records. The remaining pages are requested concurrently. The records
+    are yielded in order, as soon as the next page has arrived. Only pages
+    inside the reorder window are requested ahead of time. This way, the
+    memory usage stays flat, no matter how many records there are.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       async for user in apaginate(req, "users"):
+           print(user["name"])
+
+    Parameters
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        The ``RequestBuilder`` of the first page.
+    records_key : str
+        The key of the response, which contains the list of records.
+        For example ``users``.
+    next_token_key : str, default="next_token"
+        The key of the response, which contains the start of the next page.
+    total_key : str, default="total"
+        The key of the response, which contains the number of records.
+    limit : int, default=-1
+        The maximum number of records to yield. If the value is not
+        positive, all records will be yielded.
+    reorder_window : int, optional
+        The maximum number of pages, which are requested ahead of the page,
+        which is yielded next. By default, it is twice the
+        ``concurrent_limit`` of ``request_config``.
+
+    Yields
+    ------
+    record : matrixctl.typehints.JsonDict
+        The decoded records.
+
+    """
+    client: httpx.AsyncClient = client_pool.get_async_client()
+
+    response: httpx.Response = await _arequest(request_config, client)
+    response_json: JsonDict = response.json()
+    del response
+
+    yielded: int = 0
+    for record in response_json[records_key]:
+        if 0 < limit <= yielded:
+            return
+        yield record
+        yielded += 1
+
+    try:  # Done: No more records
+        next_token: int = int(response_json[next_token_key])
+        total: int = int(response_json[total_key])
+    except KeyError:
+        return
+    del response_json
+
+    if 0 < limit < total:
+        total = limit
+    if next_token >= total:
+        return
+
+    concurrent_limit: int = max(1, request_config.concurrent_limit)
+    window: int = max(reorder_window or 2 * concurrent_limit, 1)
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        concurrent_limit,
+    )
+
+    async def fetch_page(page_config: RequestBuilder) -> list[JsonDict]:
+        """Request a single page and decode it."""
+        page_response: httpx.Response = await _arequest(
+            page_config,
+            client,
+            limiter,
+        )
+        return t.cast(list[JsonDict], page_response.json()[records_key])
+
+    page_configs: Generator[RequestBuilder, None, None] = (
+        generate_worker_configs(request_config, next_token, total)
+    )
+    pending: deque[asyncio.Task[list[JsonDict]]] = deque(
+        asyncio.create_task(fetch_page(page_config))
+        for page_config in islice(page_configs, window)
+    )
+    try:
+        while pending:
+            page: list[JsonDict] = await pending.popleft()
+
+            # Keep the window filled, before handing over the records
+            for page_config in islice(page_configs, 1):
+                pending.append(asyncio.create_task(fetch_page(page_config)))
+
+            for record in page:
+                if yielded >= total:
+                    return
+                yield record
+                yielded += 1
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def paginate(  # noqa: PLR0913
+    request_config: RequestBuilder,
+    records_key: str,
+    *,
+    next_token_key: str = "next_token",  # noqa: S107
+    total_key: str = "total",
+    limit: int = -1,
+    reorder_window: int | None = None,
+) -> Generator[JsonDict, None, None]:
+    """Use this generator to stream the records of a paginated endpoint.
+
+    This is the synchronous counterpart of ``apaginate()``. The event loop
+    runs, while the next record is awaited.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       for user in paginate(req, "users"):
+           print(user["name"])
+
+    Parameters
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        The ``RequestBuilder`` of the first page.
+    records_key : str
+        The key of the response, which contains the list of records.
+        For example ``users``.
+    next_token_key : str, default="next_token"
+        The key of the response, which contains the start of the next page.
+    total_key : str, default="total"
+        The key of the response, which contains the number of records.
+    limit : int, default=-1
+        The maximum number of records to yield. If the value is not
+        positive, all records will be yielded.
+    reorder_window : int, optional
+        The maximum number of pages, which are requested ahead of the page,
+        which is yielded next.
+
+    See Also
+    --------
+    apaginate : matrixctl.handlers.api.apaginate
+
+    Yields
+    ------
+    record : matrixctl.typehints.JsonDict
+        The decoded records.
+
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    records: AsyncGenerator[JsonDict, None] = apaginate(
+        request_config,
+        records_key,
+        next_token_key=next_token_key,
+        total_key=total_key,
+        limit=limit,
+        reorder_window=reorder_window,
+    )
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(records))
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(records.aclose())
+        loop.run_until_complete(client_pool.aclose())
+        loop.close()
+
+
 def handle_sync_response_status_code(
     response: httpx.Response,
     success_codes: tuple[int, ...] | None = None,
@@ -590,10 +1339,12 @@ def handle_sync_response_status_code(
         )
         sys.exit(1)
 
-    try:
-        logger.debug("JSON response: %s", response.json())
-    except httpx.ResponseNotRead:
-        logger.debug("Response: %s", response.read())
+    # Decoding the body only for the log is expensive for large responses
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            logger.debug("JSON response: %s", response.json())
+        except httpx.ResponseNotRead:
+            logger.debug("Response: %s", response.read())
 
     logger.debug("Response Status Code: %d", response.status_code)
     if response.status_code not in success_codes:
@@ -609,12 +1360,118 @@ def handle_sync_response_status_code(
         raise InternalResponseError(payload=response)
 
 
-def _request(request_config: RequestBuilder) -> httpx.Response:
-    """Send an synchronous request to the synapse API and receive a response.
+def _get_cached_response(
+    request_config: RequestBuilder,
+) -> httpx.Response | None:
+    """Get the cached response of a request.
+
+    A request with a mutating method invalidates the cached responses of the
+    server, because it may have changed any of them.
 
     Attributes
     ----------
-    req : matrixctl.handlers.api.RequestBuilder
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an RequestBuilder
+
+    Returns
+    -------
+    response : httpx.Response or None
+        The cached response or ``None``, if it was not cached.
+
+    """
+    if request_config.method.upper() not in CACHEABLE_METHODS:
+        if request_config.method.upper() not in SAFE_METHODS:
+            response_cache.invalidate(request_config.domain)
+        return None
+    if request_config.cache is not CacheMode.USE:
+        return None
+    return response_cache.get(
+        request_config.domain,
+        response_cache.key(
+            request_config.method,
+            str(request_config),
+            request_config.params,
+        ),
+    )
+
+
+def _cache_response(
+    request_config: RequestBuilder,
+    response: httpx.Response,
+) -> None:
+    """Add the response of a successful request to the cache.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an RequestBuilder
+    response : httpx.Response
+        The response.
+
+    Returns
+    -------
+    None
+
+    """
+    if (
+        request_config.method.upper() not in CACHEABLE_METHODS
+        or request_config.cache is CacheMode.BYPASS
+    ):
+        return
+    response_cache.put(
+        request_config.domain,
+        response_cache.key(
+            request_config.method,
+            str(request_config),
+            request_config.params,
+        ),
+        response,
+    )
+
+
+def _log_retry(
+    request_config: RequestBuilder,
+    attempt: int,
+    delay: float,
+    reason: str,
+) -> None:
+    """Tell the user, that a request will be retried.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        The request, which failed.
+    attempt : int
+        The number of the attempt, which failed (starting with ``1``).
+    delay : float
+        The delay in seconds until the next attempt.
+    reason : str
+        Why the request failed.
+
+    Returns
+    -------
+    None
+
+    """
+    logger.warning(
+        "%s %s failed (%s). Retrying in %.1f s (attempt %d of %d).",
+        request_config.method,
+        request_config.path,
+        reason,
+        delay,
+        attempt + 1,
+        request_config.retry.max_attempts,
+    )
+
+
+def _request(request_config: RequestBuilder) -> httpx.Response:
+    """Send an synchronous request to the synapse API and receive a response.
+
+    Failed requests are retried according to ``request_config.retry``.
+
+    Attributes
+    ----------
+    req : matrixctl.handlers.api.RequestBuilder
         An instance of an RequestBuilder
 
     Returns
@@ -626,33 +1483,120 @@ def _request(request_config: RequestBuilder) -> httpx.Response:
 
     logger.debug("repr: %s", repr(request_config))
 
-    # There is some weird stuff going on in httpx. It is set to None by default
-    with httpx.Client(http2=True, timeout=request_config.timeout) as client:
-        response: httpx.Response = client.request(
-            method=request_config.method,
-            data=request_config.data,  # type: ignore # noqa: PGH003
-            json=request_config.json,
-            content=request_config.content,  # type: ignore # noqa: PGH003
-            url=str(request_config),
-            params=request_config.params,
-            headers=request_config.headers_with_auth,
-            follow_redirects=False,
+    cached: httpx.Response | None = _get_cached_response(request_config)
+    if cached is not None:
+        return cached
+
+    delay: float | None
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            # There is some weird stuff going on in httpx. It is set to None
+            # by default
+            response: httpx.Response = client_pool.get_client().request(
+                method=request_config.method,
+                data=request_config.data,  # type: ignore # noqa: PGH003
+                json=request_config.json,
+                content=request_config.content,  # type: ignore # noqa: PGH003
+                url=str(request_config),
+                params=request_config.params,
+                headers=request_config.headers_with_auth,
+                timeout=request_config.timeout,
+                follow_redirects=False,
+            )
+        except httpx.TransportError as err:
+            delay = request_config.retry.get_delay(request_config, attempt)
+            if delay is None:
+                raise
+            _log_retry(request_config, attempt, delay, repr(err))
+            time.sleep(delay)
+            continue
+
+        delay = request_config.retry.get_delay(
+            request_config,
+            attempt,
+            response,
         )
+        if delay is None:
+            break
+        _log_retry(request_config, attempt, delay, str(response.status_code))
+        time.sleep(delay)
+
     handle_sync_response_status_code(response, request_config.success_codes)
+    _cache_response(request_config, response)
+
+    return response
+
+
+async def _asend(
+    request_config: RequestBuilder,
+    client: httpx.AsyncClient,
+    limiter: AdaptiveConcurrencyLimiter | None = None,
+) -> httpx.Response:
+    """Send a single asynchronous request.
+
+    When a limiter is given, the request waits for a free slot and the
+    outcome of the request is reported back to the limiter.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an RequestBuilder
+    client : httpx.AsyncClient
+        The client to send the request with.
+    limiter : matrixctl.handlers.api.AdaptiveConcurrencyLimiter, optional
+        The shared limiter.
+
+    Returns
+    -------
+    response : httpx.Response
+        Returns the response
 
+    """
+    async with limiter or nullcontext():
+        start: float = time.monotonic()
+        try:
+            # There is some weird stuff going on in httpx. It is set to None
+            # by default
+            response: httpx.Response = await client.request(
+                method=request_config.method,
+                data=request_config.data,  # type: ignore # noqa: PGH003
+                json=request_config.json,
+                content=request_config.content,  # type: ignore # noqa: PGH003
+                url=str(request_config),
+                params=request_config.params,
+                headers=request_config.headers_with_auth,
+                timeout=request_config.timeout,
+                follow_redirects=False,
+            )
+        except httpx.TransportError:
+            if limiter is not None:
+                limiter.observe(time.monotonic() - start, None)
+            raise
+        if limiter is not None:
+            limiter.observe(time.monotonic() - start, response.status_code)
     return response
 
 
 async def _arequest(
     request_config: RequestBuilder,
     client: httpx.AsyncClient,
+    limiter: AdaptiveConcurrencyLimiter | None = None,
 ) -> httpx.Response:
     """Send an asynchronous request to the synapse API and receive a response.
 
+    Failed requests are retried according to ``request_config.retry``.
+    While waiting for the next attempt, the slot of the limiter is released.
+
     Attributes
     ----------
-    req : matrixctl.handlers.api.RequestBuilder
+    request_config : matrixctl.handlers.api.RequestBuilder
         An instance of an RequestBuilder
+    client : httpx.AsyncClient
+        The client to send the request with.
+    limiter : matrixctl.handlers.api.AdaptiveConcurrencyLimiter, optional
+        The shared limiter.
 
     Returns
     -------
@@ -663,18 +1607,37 @@ async def _arequest(
 
     logger.debug("repr: %s", repr(request_config))
 
-    # There is some weird stuff going on in httpx. It is set to None by default
-    response: httpx.Response = await client.request(
-        method=request_config.method,
-        data=request_config.data,  # type: ignore # noqa: PGH003
-        json=request_config.json,
-        content=request_config.content,  # type: ignore # noqa: PGH003
-        url=str(request_config),
-        params=request_config.params,
-        headers=request_config.headers_with_auth,
-        timeout=request_config.timeout,
-        follow_redirects=False,
-    )
+    cached: httpx.Response | None = _get_cached_response(request_config)
+    if cached is not None:
+        return cached
+
+    delay: float | None
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            response: httpx.Response = await _asend(
+                request_config,
+                client,
+                limiter,
+            )
+        except httpx.TransportError as err:
+            delay = request_config.retry.get_delay(request_config, attempt)
+            if delay is None:
+                raise
+            _log_retry(request_config, attempt, delay, repr(err))
+            await asyncio.sleep(delay)
+            continue
+
+        delay = request_config.retry.get_delay(
+            request_config,
+            attempt,
+            response,
+        )
+        if delay is None:
+            break
+        _log_retry(request_config, attempt, delay, str(response.status_code))
+        await asyncio.sleep(delay)
 
     if response.status_code == HTTP_RETURN_CODE_302:
         logger.critical(
@@ -699,7 +1662,9 @@ async def _arequest(
         )
         raise QWorkerExit
 
-    logger.debug("JSON response: %s", response.json())
+    # Decoding the body only for the log is expensive for large responses
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("JSON response: %s", response.json())
 
     logger.debug("Response Status Code: %d", response.status_code)
     if response.status_code not in request_config.success_codes:
@@ -713,134 +1678,765 @@ async def _arequest(
                 )
                 raise QWorkerExit
         raise InternalResponseError(payload=response)
+    _cache_response(request_config, response)
     return response
 
 
-def streamed_download(
+def fetch_media(
     request_config: RequestBuilder,
-    download_path: Path,
-) -> None:
-    """Make a (a)synchronous request to the synapse API and receive a response.
+    *,
+    spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    max_size: int | None = None,
+    follow_redirects: bool = True,
+) -> MediaBuffer:
+    """Download a media into a ``MediaBuffer``.
+
+    The buffer is preallocated from the ``Content-Length`` of the response.
+    Media larger than ``spool_threshold`` is written to a temporary file.
 
     Attributes
     ----------
-    request_config : RequestBuilder or Generator [RequestBuilder, None, None]
-        An instance of an ``RequestBuilder`` or a list of ``RequestBuilder``.
-        If the function gets a ``RequestBuilder``, the request will be
-        synchronous.
-        If it gets a Generator, the request will be asynchronous.
-    concurrent_limit : int
-        The maximum of concurrent workers. (This information must be pulled
-        from the config.)
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``.
+    spool_threshold : int, default: DEFAULT_SPOOL_THRESHOLD
+        The size in bytes, from which on the media is written to a temporary
+        file.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+    follow_redirects : bool, default: True
+        ``True``, if redirects should be followed, otherwise ``False``.
+
+    Raises
+    ------
+    matrixctl.errors.MediaTooLargeError
+        When the media is larger than ``max_size``.
 
     See Also
     --------
-    RequestBuilder : matrixctl.handlers.api.RequestBuilder
+    MediaBuffer : matrixctl.handlers.media.MediaBuffer
 
     Returns
     -------
-    response : httpx.Response
-        Returns the response
+    buffer : matrixctl.handlers.media.MediaBuffer
+        The buffer containing the media. Close it, when it is no longer
+        needed.
 
     """
-    with tempfile.NamedTemporaryFile(
-        mode="wb",
-        delete=False,
-    ) as download_file:
-        path_download_file: Path = Path(download_file.name)
-        logger.debug("Temporary file: %s", path_download_file)
-        extension: str | None = None
-        content_length: int | None = None
-        try:
-            with httpx.stream(
-                method=request_config.method,
-                data=request_config.data,  # type: ignore # noqa: PGH003
-                json=request_config.json,
-                content=request_config.content,  # type: ignore # noqa: PGH003
-                url=str(request_config),
-                params=request_config.params,
-                headers=request_config.headers_with_auth,
-                timeout=request_config.timeout,
-                follow_redirects=False,
-            ) as response:
-                handle_sync_response_status_code(
-                    response,
-                    request_config.success_codes,
+    logger.debug("repr: %s", repr(request_config))
+
+    try:
+        with client_pool.get_client().stream(
+            method=request_config.method,
+            data=request_config.data,  # type: ignore # noqa: PGH003
+            json=request_config.json,
+            content=request_config.content,  # type: ignore # noqa: PGH003
+            url=str(request_config),
+            params=request_config.params,
+            headers=request_config.headers_with_auth,
+            timeout=request_config.timeout,
+            follow_redirects=follow_redirects,
+        ) as response:
+            if response.status_code == HTTP_RETURN_CODE_404:
+                # The media repository answers with "M_NOT_FOUND" for unknown
+                # media and media without a thumbnail. Unlike on the admin
+                # API, this is no sign of a misconfiguration.
+                raise InternalResponseError(payload=response)
+            handle_sync_response_status_code(
+                response,
+                request_config.success_codes,
+            )
+            content_length: int | None = None
+            try:
+                content_length = int(response.headers["Content-Length"])
+                logger.debug("Content-Length: %s", content_length)
+            except (KeyError, ValueError) as err:
+                logger.debug(
+                    "Response did not include Content-Length. Error: %s",
+                    err,
                 )
-                try:
-                    content_length = int(response.headers["Content-Length"])
-                    logger.debug("Content-Length: %s", content_length)
-                except KeyError as err:
-                    logger.warning(
-                        "Response did not include Content-Length. Error: %s",
-                        err,
-                    )
-                try:
-                    content_type: str = response.headers["Content-Type"]
-                    if content_type:
-                        mime_types: MimeTypes = MimeTypes()
-                        extension = mime_types.guess_extension(
-                            content_type,
-                            strict=True,
-                        )
-                except IndexError as err:
-                    logger.debug(
-                        "Response did not include Content-Type. Error: %s",
-                        err,
-                    )
-                if content_length is None:
-                    for chunk in response.iter_bytes():
-                        download_file.write(chunk)
-                else:
-                    with rich.progress.Progress(
-                        "[progress.percentage]{task.percentage:>3.0f}%",
-                        rich.progress.BarColumn(bar_width=None),
-                        rich.progress.DownloadColumn(),
-                        rich.progress.TransferSpeedColumn(),
-                    ) as progress:
-                        download_task: rich.progress.TaskID = (
-                            progress.add_task(
-                                "Download",
-                                total=content_length,
-                            )
-                        )
-                        for chunk in response.iter_bytes():
-                            download_file.write(chunk)
-                            progress.update(
-                                download_task,
-                                completed=response.num_bytes_downloaded,
-                            )
-
-        except Exception as err:  # skipcq: PYL-W0703
-            raise InternalResponseError(payload=response) from err
-
-    if extension:
-        download_path = download_path.with_suffix(extension)
-        logger.debug("Found extension: %s.", extension)
-        logger.debug("New Download path: %s", download_path)
-    else:
+
+            buf: MediaBuffer = MediaBuffer(
+                content_length,
+                spool_threshold=spool_threshold,
+                max_size=max_size,
+            )
+            buf.content_type = response.headers.get("Content-Type")
+            try:
+                for chunk in response.iter_bytes():
+                    buf.write(chunk)
+            except BaseException:
+                buf.close()
+                raise
+    except httpx.HTTPError as err:
+        raise InternalResponseError(payload=err) from err
+
+    return buf
+
+
+def _parse_content_range(value: str | None) -> tuple[int, int | None] | None:
+    """Parse the ``Content-Range`` header of a partial response.
+
+    Attributes
+    ----------
+    value : str, optional
+        The value of the header, e.g. ``bytes 100-999/1000``.
+
+    Returns
+    -------
+    content_range : tuple of int and int or None, optional
+        The first byte and the total size (``None``, if it is unknown) or
+        ``None``, if the header is missing or invalid.
+
+    """
+    if value is None:
+        return None
+    unit, _, rest = value.strip().partition(" ")
+    byte_range, _, total = rest.partition("/")
+    first, _, _ = byte_range.partition("-")
+    if unit != "bytes":
+        return None
+    try:
+        return int(first), None if total == "*" else int(total)
+    except ValueError:
+        return None
+
+
+class _RestartDownloadError(Exception):
+    """The partial file was discarded, the download needs to start over."""
+
+
+class PartialDownload:
+    """Keep track of a resumable download into a partial file.
+
+    The media is written to ``<download_path>.part``. When the partial file
+    already exists, only the missing bytes are requested with a ``Range``
+    header. When the download is complete, ``finish()`` renames the partial
+    file.
+
+    Parameters
+    ----------
+    download_path : pathlib.Path
+        The path to download the media to.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+
+    """
+
+    __slots__ = (
+        "_fp",
+        "download_path",
+        "max_size",
+        "offset",
+        "part_path",
+        "status_code",
+        "total",
+    )
+
+    def __init__(
+        self,
+        download_path: Path,
+        max_size: int | None = None,
+    ) -> None:
+        self.download_path: Path = download_path
+        self.part_path: Path = download_path.with_name(
+            f"{download_path.name}.part",
+        )
+        self.max_size: int | None = max_size or None
+        self.offset: int = 0
+        self.total: int | None = None
+        self.status_code: int | None = None
+        self._fp: t.BinaryIO | None = None
+
+    def headers(self, request_config: RequestBuilder) -> dict[str, str]:
+        """Get the headers for the next attempt.
+
+        Parameters
+        ----------
+        request_config : matrixctl.handlers.api.RequestBuilder
+            An instance of an ``RequestBuilder``.
+
+        Returns
+        -------
+        headers : dict [str, str]
+            The headers of the request.
+
+        """
+        self.offset = (
+            self.part_path.stat().st_size if self.part_path.exists() else 0
+        )
+        headers: dict[str, str] = request_config.headers_with_auth | {
+            # A range refers to the encoded body, so it must not be encoded
+            "Accept-Encoding": "identity",
+        }
+        if self.offset:
+            headers["Range"] = f"bytes={self.offset}-"
+            logger.debug("Resume download at byte %d", self.offset)
+        return headers
+
+    def open(self, response: httpx.Response) -> bool:
+        """Check the response and open the partial file.
+
+        Parameters
+        ----------
+        response : httpx.Response
+            The (streamed) response.
+
+        Raises
+        ------
+        FileExistsError
+            When the file already exists. It is checked, before the body of
+            the response is read.
+        matrixctl.errors.MediaTooLargeError
+            When the media is larger than ``max_size``.
+
+        Returns
+        -------
+        is_media : bool
+            ``True``, if the body of the response is (a part of) the media
+            and needs to be written with ``write()``, otherwise ``False``.
+            In the first case, ``status_code`` is set to the checked status
+            code of the response.
+
+        """
+        self.status_code = None
+        if response.status_code == HTTP_RETURN_CODE_416 and self.offset:
+            logger.debug("The partial file is invalid. Start over.")
+            self.part_path.unlink()
+            raise _RestartDownloadError
+        if response.status_code not in {200, HTTP_RETURN_CODE_206}:
+            return False
+
+        self.total = None
+        if response.status_code == HTTP_RETURN_CODE_206:
+            content_range: tuple[int, int | None] | None = (
+                _parse_content_range(response.headers.get("Content-Range"))
+            )
+            if content_range is None or content_range[0] != self.offset:
+                logger.debug("The server sent an unexpected range.")
+                self.part_path.unlink(missing_ok=True)
+                raise _RestartDownloadError
+            self.total = content_range[1]
+        else:  # The server ignored the range
+            self.offset = 0
+            with suppress(KeyError, ValueError):
+                self.total = int(response.headers["Content-Length"])
+
+        self._check_exists(
+            self.final_path(response.headers.get("Content-Type"))
+        )
+        if self.total is not None:
+            self._check_size(self.total)
+        self._fp = self.part_path.open("ab" if self.offset else "wb")
+        self.status_code = response.status_code
+        return True
+
+    def _check_size(self, size: int) -> None:
+        if self.max_size is not None and size > self.max_size:
+            # The partial file must not be resumed by the next run
+            self.close()
+            self.part_path.unlink(missing_ok=True)
+            msg: str = (
+                f"The media is larger than {self.max_size} bytes "
+                f"({size} bytes)."
+            )
+            raise MediaTooLargeError(msg)
+
+    @staticmethod
+    def _check_exists(download_path: Path) -> None:
+        if download_path.exists():
+            error_message: str = (
+                f"The file {download_path} already exists. "
+                "Please make sure, that the file does not exist."
+            )
+            raise FileExistsError(error_message)
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk to the partial file.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk.
+
+        Raises
+        ------
+        matrixctl.errors.MediaTooLargeError
+            When the media is larger than ``max_size``.
+
+        Returns
+        -------
+        None
+
+        """
+        if self._fp is None:
+            msg: str = "The partial file is not open."
+            raise ShouldNeverHappenError(msg)
+        self._fp.write(chunk)
+        self.offset += len(chunk)
+        self._check_size(self.offset)
+
+    def close(self) -> None:
+        """Close the partial file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def final_path(self, content_type: str | None) -> Path:
+        """Get the path of the downloaded file.
+
+        The file extension of the ``download_path`` is replaced with the one
+        matching the ``content_type``.
+
+        Parameters
+        ----------
+        content_type : str, optional
+            The ``Content-Type`` of the media.
+
+        Returns
+        -------
+        path : pathlib.Path
+            The path of the downloaded file.
+
+        """
+        extension: str | None = None
+        if content_type:
+            extension = MimeTypes().guess_extension(content_type, strict=True)
+        if extension:
+            logger.debug("Found extension: %s.", extension)
+            return self.download_path.with_suffix(extension)
         logger.debug(
             "Exception was %s. Not renaming file extension.",
             extension,
         )
+        return self.download_path
+
+    def finish(self, content_type: str | None) -> Path:
+        """Rename the complete partial file.
+
+        The file extension of the ``download_path`` is replaced with the one
+        matching the ``content_type``.
+
+        Parameters
+        ----------
+        content_type : str, optional
+            The ``Content-Type`` of the media.
+
+        Raises
+        ------
+        FileExistsError
+            When the file already exists.
+
+        Returns
+        -------
+        path : pathlib.Path
+            The path of the downloaded file.
+
+        """
+        download_path: Path = self.final_path(content_type)
+        logger.debug("New Download path: %s", download_path)
+        # The file may have been created during the download
+        self._check_exists(download_path)
+        self.part_path.replace(download_path)
+        return download_path
+
+
+def _download_to_part(
+    request_config: RequestBuilder,
+    download: PartialDownload,
+    on_progress: Callable[[PartialDownload], None] | None,
+) -> httpx.Response:
+    """Download (the rest of) a media into a partial file.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``.
+    download : matrixctl.handlers.api.PartialDownload
+        The state of the download.
+    on_progress : collections.abc.Callable, optional
+        Called after every chunk.
+
+    Returns
+    -------
+    response : httpx.Response
+        The response. Its body is already consumed.
+
+    """
+    with client_pool.get_client().stream(
+        method=request_config.method,
+        url=str(request_config),
+        params=request_config.params,
+        headers=download.headers(request_config),
+        timeout=request_config.timeout,
+        follow_redirects=False,
+    ) as response:
+        if not download.open(response):
+            response.read()
+            return response
+        try:
+            for chunk in response.iter_bytes():
+                download.write(chunk)
+                if on_progress is not None:
+                    on_progress(download)
+        finally:
+            download.close()
+    return response
+
+
+async def _adownload_to_part(
+    request_config: RequestBuilder,
+    client: httpx.AsyncClient,
+    download: PartialDownload,
+    on_progress: Callable[[PartialDownload], None] | None,
+) -> httpx.Response:
+    """Download (the rest of) a media into a partial file asynchronously.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``.
+    client : httpx.AsyncClient
+        The client to send the request with.
+    download : matrixctl.handlers.api.PartialDownload
+        The state of the download.
+    on_progress : collections.abc.Callable, optional
+        Called after every chunk.
+
+    Returns
+    -------
+    response : httpx.Response
+        The response. Its body is already consumed.
+
+    """
+    async with client.stream(
+        method=request_config.method,
+        url=str(request_config),
+        params=request_config.params,
+        headers=download.headers(request_config),
+        timeout=request_config.timeout,
+        follow_redirects=False,
+    ) as response:
+        if not download.open(response):
+            await response.aread()
+            return response
+        try:
+            async for chunk in response.aiter_bytes():
+                download.write(chunk)
+                if on_progress is not None:
+                    on_progress(download)
+        finally:
+            download.close()
+    return response
+
+
+def streamed_download(
+    request_config: RequestBuilder,
+    download_path: Path,
+    *,
+    max_size: int | None = None,
+) -> Path:
+    """Download a media from the synapse API into a file.
+
+    The media is written to ``<download_path>.part`` first. When the download
+    is interrupted, it is resumed from the partial file with a ``Range``
+    request, either on the next attempt of the retry policy of the request or
+    when the function is called again. When the download is complete, the
+    partial file is renamed. The file extension of ``download_path`` is
+    replaced with the one matching the ``Content-Type`` of the response.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``.
+    download_path : pathlib.Path
+        The path to download the media to.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+
+    Raises
+    ------
+    FileExistsError
+        When the file already exists.
+    matrixctl.errors.MediaTooLargeError
+        When the media is larger than ``max_size``.
+
+    See Also
+    --------
+    PartialDownload : matrixctl.handlers.api.PartialDownload
+
+    Returns
+    -------
+    path : pathlib.Path
+        The path of the downloaded file.
+
+    """
+    download: PartialDownload = PartialDownload(download_path, max_size)
+    logger.debug("Partial file: %s", download.part_path)
+
+    delay: float | None
+    attempt: int = 0
+    with rich.progress.Progress(
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        rich.progress.BarColumn(bar_width=None),
+        rich.progress.DownloadColumn(),
+        rich.progress.TransferSpeedColumn(),
+    ) as progress:
+        download_task: rich.progress.TaskID = progress.add_task(
+            "Download",
+            total=None,
+        )
+
+        def on_progress(state: PartialDownload) -> None:
+            progress.update(
+                download_task,
+                total=state.total,
+                completed=state.offset,
+            )
+
+        while True:
+            attempt += 1
+            try:
+                response: httpx.Response = _download_to_part(
+                    request_config,
+                    download,
+                    on_progress,
+                )
+            except _RestartDownloadError as err:
+                if attempt >= request_config.retry.max_attempts:
+                    msg: str = (
+                        "The server did not respect the requested range."
+                    )
+                    raise InternalResponseError(msg) from err
+                logger.debug("Restart the download.")
+                continue
+            except httpx.TransportError as err:
+                delay = request_config.retry.get_delay(request_config, attempt)
+                if delay is None:
+                    raise InternalResponseError(payload=err) from err
+                _log_retry(request_config, attempt, delay, repr(err))
+                time.sleep(delay)
+                continue
+
+            delay = request_config.retry.get_delay(
+                request_config,
+                attempt,
+                response,
+            )
+            if delay is None:
+                break
+            _log_retry(
+                request_config,
+                attempt,
+                delay,
+                str(response.status_code),
+            )
+            time.sleep(delay)
+
+    # The status of a media response was checked, before its body was
+    # streamed. Only other responses are read and need to be handled.
+    if download.status_code is None:
+        handle_sync_response_status_code(
+            response,
+            request_config.success_codes,
+        )
+    return download.finish(response.headers.get("Content-Type"))
+
+
+async def astreamed_download(
+    request_config: RequestBuilder,
+    download_path: Path,
+    client: httpx.AsyncClient,
+    *,
+    max_size: int | None = None,
+    on_progress: Callable[[PartialDownload], None] | None = None,
+) -> Path:
+    """Download a media from the synapse API into a file asynchronously.
+
+    This is the asynchronous variant of ``streamed_download()``. It does not
+    show a progress bar, but calls ``on_progress`` after every chunk.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``.
+    download_path : pathlib.Path
+        The path to download the media to.
+    client : httpx.AsyncClient
+        The client to send the request with.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+    on_progress : collections.abc.Callable, optional
+        Called after every chunk.
+
+    Raises
+    ------
+    FileExistsError
+        When the file already exists.
+    matrixctl.errors.InternalResponseError
+        When the media could not be downloaded.
+    matrixctl.errors.MediaTooLargeError
+        When the media is larger than ``max_size``.
+
+    See Also
+    --------
+    streamed_download : matrixctl.handlers.api.streamed_download
+
+    Returns
+    -------
+    path : pathlib.Path
+        The path of the downloaded file.
+
+    """
+    download: PartialDownload = PartialDownload(download_path, max_size)
 
-    if download_path.exists():
-        error_message = (
-            f"The file {download_path} already exists. "
-            "Please make sure, that the file does not exist.",
+    delay: float | None
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            response: httpx.Response = await _adownload_to_part(
+                request_config,
+                client,
+                download,
+                on_progress,
+            )
+        except _RestartDownloadError as err:
+            if attempt >= request_config.retry.max_attempts:
+                msg: str = "The server did not respect the requested range."
+                raise InternalResponseError(msg) from err
+            logger.debug("Restart the download.")
+            continue
+        except httpx.TransportError as err:
+            delay = request_config.retry.get_delay(request_config, attempt)
+            if delay is None:
+                raise InternalResponseError(payload=err) from err
+            _log_retry(request_config, attempt, delay, repr(err))
+            await asyncio.sleep(delay)
+            continue
+
+        delay = request_config.retry.get_delay(
+            request_config,
+            attempt,
+            response,
         )
-        raise FileExistsError(error_message)
+        if delay is None:
+            break
+        _log_retry(request_config, attempt, delay, str(response.status_code))
+        await asyncio.sleep(delay)
+
+    if download.status_code is None:
+        raise InternalResponseError(payload=response)
+    return download.finish(response.headers.get("Content-Type"))
 
-    shutil.copy(path_download_file, download_path)
 
-    path_download_file.unlink()
+def _read_chunks(
+    fp: t.BinaryIO,
+    chunk_size: int,
+    progress: rich.progress.Progress,
+    task: rich.progress.TaskID,
+) -> Generator[bytes, None, None]:
+    """Read a file chunk by chunk and update the progress bar.
+
+    Attributes
+    ----------
+    fp : typing.BinaryIO
+        The file to read from.
+    chunk_size : int
+        The maximum size of a chunk in bytes.
+    progress : rich.progress.Progress
+        The progress bar.
+    task : rich.progress.TaskID
+        The task of the progress bar.
+
+    Yields
+    ------
+    chunk : bytes
+        The next chunk of the file.
+
+    """
+    while chunk := fp.read(chunk_size):
+        yield chunk
+        progress.advance(task, len(chunk))
+
+
+def streamed_upload(
+    request_config: RequestBuilder,
+    upload_path: Path,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> httpx.Response:
+    """Upload a file to the synapse API without loading it into memory.
+
+    The file is sent in chunks of ``chunk_size`` bytes. The
+    ``Content-Length`` is taken from the file system, so the request is not
+    sent with chunked transfer encoding.
+
+    Attributes
+    ----------
+    request_config : matrixctl.handlers.api.RequestBuilder
+        An instance of an ``RequestBuilder``. Its ``content`` is replaced by
+        the content of the file.
+    upload_path : pathlib.Path
+        The path to the file to upload.
+    chunk_size : int, default: UPLOAD_CHUNK_SIZE
+        The maximum size of a chunk in bytes.
+
+    See Also
+    --------
+    RequestBuilder : matrixctl.handlers.api.RequestBuilder
+
+    Returns
+    -------
+    response : httpx.Response
+        Returns the response
+
+    """
+    size: int = upload_path.stat().st_size
+    logger.debug("Upload %s (%d bytes)", upload_path, size)
+
+    with (
+        upload_path.open("rb") as fp,
+        rich.progress.Progress(
+            "[progress.percentage]{task.percentage:>3.0f}%",
+            rich.progress.BarColumn(bar_width=None),
+            rich.progress.DownloadColumn(),
+            rich.progress.TransferSpeedColumn(),
+        ) as progress,
+    ):
+        upload_task: rich.progress.TaskID = progress.add_task(
+            "Upload",
+            total=size,
+        )
+        return _request(
+            evolve(
+                request_config,
+                headers=request_config.headers | {"Content-Length": str(size)},
+                content=_read_chunks(fp, chunk_size, progress, upload_task),
+            ),
+        )
 
 
 def download_media_to_buf(
     token: str,
     domain: str,
     media_id: str,
-) -> bytes:
+    *,
+    spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    max_size: int | None = None,
+) -> MediaBuffer:
     """Make a (a)synchronous request to the synapse API and receive a response.
 
     Attributes
@@ -851,6 +2447,17 @@ def download_media_to_buf(
         The domain of the homeserver.
     media_id : str
         The media ID
+    spool_threshold : int, default: DEFAULT_SPOOL_THRESHOLD
+        The size in bytes, from which on the media is written to a temporary
+        file while it is downloaded.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+
+    Raises
+    ------
+    matrixctl.errors.MediaTooLargeError
+        When the media is larger than ``max_size``.
 
     See Also
     --------
@@ -858,8 +2465,9 @@ def download_media_to_buf(
 
     Returns
     -------
-    buf : bytes
-        A buffer containing the raw media data.
+    buf : matrixctl.handlers.media.MediaBuffer
+        A buffer containing the raw media data. Close it, when it is no
+        longer needed.
 
     """
 
@@ -876,30 +2484,93 @@ def download_media_to_buf(
         params={"allow_redirect": "true"},
     )
 
-    buf: bytes = b""
-    try:
-        with httpx.stream(
-            method=request_config.method,
-            data=request_config.data,  # type: ignore # noqa: PGH003
-            json=request_config.json,
-            content=request_config.content,  # type: ignore # noqa: PGH003
-            url=str(request_config),
-            params=request_config.params,
-            headers=request_config.headers_with_auth,
-            timeout=request_config.timeout,
-            follow_redirects=True,
-        ) as response:
-            handle_sync_response_status_code(
-                response,
-                request_config.success_codes,
-            )
-            for chunk in response.iter_bytes():
-                buf += chunk
+    return fetch_media(
+        request_config,
+        spool_threshold=spool_threshold,
+        max_size=max_size,
+    )
 
-    except Exception as err:  # skipcq: PYL-W0703
-        raise InternalResponseError(payload=response) from err
 
-    return buf
+def download_thumbnail_to_buf(  # noqa: PLR0913
+    token: str,
+    domain: str,
+    media_id: str,
+    *,
+    width: int,
+    height: int,
+    method: t.Literal["crop", "scale"] = "scale",
+    spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    max_size: int | None = None,
+) -> MediaBuffer:
+    """Download a thumbnail of a media from the homeserver.
+
+    The homeserver returns the thumbnail, which is closest to, but not
+    smaller than the requested size.
+
+    Attributes
+    ----------
+    token : str
+        The token to authenticate against the homeserver's API.
+    domain : str
+        The domain of the homeserver.
+    media_id : str
+        The media ID
+    width : int
+        The desired width of the thumbnail in pixels.
+    height : int
+        The desired height of the thumbnail in pixels.
+    method : {"crop", "scale"}, default: "scale"
+        ``"scale"`` preserves the aspect ratio of the media, ``"crop"`` fills
+        the requested size exactly.
+    spool_threshold : int, default: DEFAULT_SPOOL_THRESHOLD
+        The size in bytes, from which on the thumbnail is written to a
+        temporary file while it is downloaded.
+    max_size : int, optional
+        The maximum size of the thumbnail in bytes. ``None`` or ``0`` means
+        unlimited.
+
+    Raises
+    ------
+    matrixctl.errors.InternalResponseError
+        When the homeserver is unable to create a thumbnail.
+    matrixctl.errors.MediaTooLargeError
+        When the thumbnail is larger than ``max_size``.
+
+    See Also
+    --------
+    download_media_to_buf : matrixctl.handlers.api.download_media_to_buf
+
+    Returns
+    -------
+    buf : matrixctl.handlers.media.MediaBuffer
+        A buffer containing the raw thumbnail data. Close it, when it is no
+        longer needed.
+
+    """
+
+    mxc: Mxc = parse_mxc_uri(media_id)
+
+    request_config: RequestBuilder = RequestBuilder(
+        token=token,
+        domain=domain,
+        path=(
+            "/_matrix/client/v1/media/thumbnail/"
+            f"{mxc.homeserver}/{mxc.media_id}"
+        ),
+        method="GET",
+        params={
+            "width": width,
+            "height": height,
+            "method": method,
+            "allow_redirect": "true",
+        },
+    )
+
+    return fetch_media(
+        request_config,
+        spool_threshold=spool_threshold,
+        max_size=max_size,
+    )
 
 
 # vim: set ft=python :
@@ -0,0 +1,370 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache responses of read-only API requests on disk."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import typing as t
+
+from contextlib import suppress
+from enum import Enum
+from enum import unique
+from pathlib import Path
+
+from xdg_base_dirs import xdg_cache_home
+
+
+if t.TYPE_CHECKING:
+    # The parsers import this module for ``CacheMode``, so httpx is only
+    # imported, when a response is read from the cache.
+    import httpx
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_METHODS: frozenset[str] = frozenset({"GET"})
+
+# After an eviction, the cache is shrunk to this fraction of its limit, so
+# the entries do not need to be scanned on every insert near the limit.
+EVICTION_TARGET: float = 0.9
+
+
+@unique
+class CacheMode(Enum):
+    """Use this enum to select, how a request uses the response cache."""
+
+    USE = "use"  # Use a cached response, or cache the new response
+    REFRESH = "refresh"  # Always request, but cache the new response
+    BYPASS = "bypass"  # Neither read nor write the cache
+
+
+class ResponseCacheConfig(t.NamedTuple):
+    """Use this NamedTuple to configure the response cache.
+
+    The values are taken from ``server.api.response_cache`` in the config
+    file.
+
+    """
+
+    enabled: bool = False
+    ttl: float = 300.0  # seconds
+    max_bytes: int = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """Store responses of read-only API requests on disk.
+
+    Every entry is a single file named after the hash of the method, URL and
+    query parameters in a directory per server. The first line of the file
+    contains the metadata as JSON, the rest is the unmodified body of the
+    response.
+
+    Entries expire after ``ttl`` seconds. When the cache grows beyond
+    ``max_bytes``, the least recently used entries are evicted.
+
+    The total size of the entries is kept in the file ``size``, so adding an
+    entry does not need to look at the other entries. Only when the total
+    exceeds the limit, the entries are scanned and the least recently used
+    ones are removed. Processes, which write concurrently, may miscount the
+    total. It is corrected by every scan.
+
+    """
+
+    __slots__ = ("_lock", "config", "directory")
+
+    def __init__(
+        self,
+        config: ResponseCacheConfig | None = None,
+        directory: Path | None = None,
+    ) -> None:
+        self.config: ResponseCacheConfig = config or ResponseCacheConfig()
+        self.directory: Path = (
+            directory or xdg_cache_home() / "matrixctl" / "responses"
+        )
+        self._lock: threading.Lock = threading.Lock()
+
+    def configure(self, config: ResponseCacheConfig) -> None:
+        """Change the configuration of the cache.
+
+        Parameters
+        ----------
+        config : matrixctl.handlers.cache.ResponseCacheConfig
+            The new configuration.
+
+        Returns
+        -------
+        None
+
+        """
+        self.config = config
+
+    def resolve(self, mode: CacheMode | None) -> CacheMode:
+        """Get the mode to use for a request, which may be cached.
+
+        Requests do not use the cache, unless they opt in with the mode
+        returned by this method. Only requests, which list data, should opt
+        in. Requests, which poll a status, must never be cached.
+
+        Parameters
+        ----------
+        mode : matrixctl.handlers.cache.CacheMode, optional
+            The mode selected on the command line or ``None``, to use the
+            default from the config file.
+
+        Returns
+        -------
+        mode : matrixctl.handlers.cache.CacheMode
+            The mode to use.
+
+        """
+        if mode is not None:
+            return mode
+        return CacheMode.USE if self.config.enabled else CacheMode.BYPASS
+
+    @staticmethod
+    def key(
+        method: str,
+        url: str,
+        params: t.Mapping[str, str | int] | None = None,
+    ) -> str:
+        """Get the key of an entry.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method.
+        url : str
+            The URL without query parameters.
+        params : collections.abc.Mapping of str and str or int, optional
+            The query parameters.
+
+        Returns
+        -------
+        key : str
+            The key.
+
+        """
+        raw: str = json.dumps(
+            [method.upper(), url, sorted((params or {}).items())],
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _server_directory(self, server: str) -> Path:
+        return self.directory / hashlib.sha256(server.encode()).hexdigest()
+
+    def get(self, server: str, key: str) -> httpx.Response | None:
+        """Get a response from the cache.
+
+        Parameters
+        ----------
+        server : str
+            The domain of the server.
+        key : str
+            The key of the entry (see ``ResponseCache.key()``).
+
+        Returns
+        -------
+        response : httpx.Response or None
+            The cached response or ``None``, if there is no valid entry.
+
+        """
+        path: Path = self._server_directory(server) / key
+        try:
+            with path.open("rb") as fp:
+                meta: dict[str, t.Any] = json.loads(fp.readline())
+                content: bytes = fp.read()
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - float(meta["created"]) > self.config.ttl:
+            logger.debug("Cached response expired: %s", meta["url"])
+            self._remove([path])
+            return None
+
+        with suppress(OSError):  # Mark as recently used
+            os.utime(path)
+
+        import httpx  # noqa: PLC0415
+
+        logger.debug("Use cached response: %s", meta["url"])
+        return httpx.Response(
+            meta["status_code"],
+            headers=meta["headers"],
+            content=content,
+            request=httpx.Request(meta["method"], meta["url"]),
+        )
+
+    def put(self, server: str, key: str, response: httpx.Response) -> None:
+        """Add a response to the cache.
+
+        Parameters
+        ----------
+        server : str
+            The domain of the server.
+        key : str
+            The key of the entry (see ``ResponseCache.key()``).
+        response : httpx.Response
+            The response. Its body must already be read.
+
+        Returns
+        -------
+        None
+
+        """
+        if len(response.content) > self.config.max_bytes:
+            return
+
+        directory: Path = self._server_directory(server)
+        path: Path = directory / key
+        meta: dict[str, t.Any] = {
+            "created": time.time(),
+            "method": response.request.method,
+            "url": str(response.request.url),
+            "status_code": response.status_code,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() == "content-type"
+            },
+        }
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so a reader never sees a
+            # partial entry.
+            with tempfile.NamedTemporaryFile(
+                dir=directory,
+                prefix=".",
+                delete=False,
+            ) as fp:
+                fp.write(json.dumps(meta).encode("utf-8") + b"\n")
+                fp.write(response.content)
+            entry_size: int = Path(fp.name).stat().st_size
+            with self._lock:
+                size: int = self._read_size()
+                with suppress(OSError):  # Replace an existing entry
+                    size -= path.stat().st_size
+                Path(fp.name).replace(path)
+                size += entry_size
+                if size <= self.config.max_bytes:
+                    self._write_size(size)
+        except OSError as err:
+            logger.debug("Unable to cache the response: %s", err)
+            return
+
+        if size > self.config.max_bytes:
+            self.evict()
+
+    def invalidate(self, server: str) -> None:
+        """Remove all entries of a server.
+
+        Parameters
+        ----------
+        server : str
+            The domain of the server.
+
+        Returns
+        -------
+        None
+
+        """
+        directory: Path = self._server_directory(server)
+        if not directory.is_dir():
+            return
+        logger.debug("Invalidate the response cache of %s", server)
+        self._remove(directory.glob("[!.]*"))
+
+    def _remove(self, paths: t.Iterable[Path]) -> None:
+        with self._lock:
+            size: int = self._read_size()
+            for path in paths:
+                with suppress(OSError):  # Removed by another process
+                    entry_size: int = path.stat().st_size
+                    path.unlink()
+                    size -= entry_size
+            self._write_size(size)
+
+    def _scan_entries(self) -> list[tuple[float, int, Path]]:
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*/[!.]*"):
+            with suppress(OSError):  # Removed by another process
+                stat: os.stat_result = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _read_size(self) -> int:
+        try:
+            return int(
+                (self.directory / "size").read_text(encoding="ascii").strip()
+            )
+        except (OSError, ValueError):
+            # Created by an older version or removed
+            return sum(entry[1] for entry in self._scan_entries())
+
+    def _write_size(self, size: int) -> None:
+        with suppress(OSError):
+            # Write to a temporary file first, so a reader never sees a
+            # partial total.
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory,
+                prefix=".",
+                delete=False,
+            ) as fp:
+                fp.write(str(max(size, 0)).encode("ascii"))
+            Path(fp.name).replace(self.directory / "size")
+
+    def evict(self) -> None:
+        """Remove the least recently used entries, until the cache fits.
+
+        The cache is shrunk to ``EVICTION_TARGET`` of its limit.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        target: int = int(self.config.max_bytes * EVICTION_TARGET)
+        with self._lock:
+            entries: list[tuple[float, int, Path]] = self._scan_entries()
+            size: int = sum(entry[1] for entry in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= target:
+                    break
+                path.unlink(missing_ok=True)
+                size -= entry_size
+            self._write_size(size)
+
+
+response_cache: ResponseCache = ResponseCache()
+
+
+# vim: set ft=python :
@@ -18,17 +18,32 @@
 
 from __future__ import annotations
 
+import atexit
 import logging
+import queue
 import sys
+import threading
+import time
 import typing as t
 import urllib.parse
 
+from collections.abc import Callable
+from collections.abc import Iterable
 from collections.abc import Iterator
+from collections.abc import Sequence
+from contextlib import AbstractContextManager
+from contextlib import ExitStack
 from contextlib import contextmanager
+from contextlib import suppress
+from enum import Enum
+from uuid import uuid4
 
 import psycopg
 import sshtunnel
 
+from psycopg.rows import TupleRow
+from typing_extensions import Self
+
 from .yaml import YAML
 
 
@@ -38,6 +53,13 @@ __email__: str = "Michael@MichaelSasser.org"
 
 logger = logging.getLogger(__name__)
 
+DB_CURSOR_ITERSIZE: int = 2000
+DB_COPY_CHUNK_SIZE: int = 64 * 1024
+DB_SCAN_QUEUE_SIZE: int = 16  # items per time bucket
+
+T = t.TypeVar("T")
+B = t.TypeVar("B")
+
 
 class DBConnectionBuilder(t.NamedTuple):
     """Build the URL for an API request."""
@@ -72,6 +94,126 @@ class DBConnectionBuilder(t.NamedTuple):
         return urllib.parse.urlparse(url).geturl()
 
 
+class QueryBuilder:
+    """Build the conditions of a query and collect their parameters.
+
+    A filter of many values is added as a single array parameter with
+    ``column = ANY(%s::type[])``. The text of the query does not depend on
+    the number of values, so the server can reuse a prepared statement and
+    its plan for every filter.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       query: QueryBuilder = (
+           QueryBuilder()
+           .where("origin_server_ts >= %s", 0)
+           .where_any("sender", ["@alice:example.com", "@bob:example.com"])
+       )
+       cur.execute(
+           f"SELECT event_id FROM events WHERE {query.condition}",
+           query.params,
+           prepare=True,
+       )
+
+    """
+
+    __slots__ = ("_conditions", "_params")
+
+    def __init__(self) -> None:
+        self._conditions: list[str] = []
+        self._params: list[t.Any] = []
+
+    def where(self, condition: str, *params: t.Any) -> Self:
+        """Add a condition.
+
+        Parameters
+        ----------
+        condition : str
+            The condition with a ``%s`` placeholder for every parameter.
+        *params : typing.Any
+            The parameters of the condition.
+
+        Returns
+        -------
+        query : matrixctl.handlers.db.QueryBuilder
+            The builder itself.
+
+        """
+        self._conditions.append(condition)
+        self._params.extend(params)
+        return self
+
+    def where_any(
+        self,
+        column: str,
+        values: Iterable[t.Any] | t.Literal[False] | None,
+        sql_type: str = "text",
+    ) -> Self:
+        """Add a condition, which matches any of the values.
+
+        Nothing is added, when there are no values.
+
+        Parameters
+        ----------
+        column : str
+            The column.
+        values : collections.abc.Iterable of typing.Any, optional
+            The values. The values of ``Enum`` members are used.
+        sql_type : str, default: "text"
+            The SQL type of the values.
+
+        Returns
+        -------
+        query : matrixctl.handlers.db.QueryBuilder
+            The builder itself.
+
+        """
+        if values:
+            # psycopg adapts lists, but not tuples, to arrays.
+            self._conditions.append(f"{column} = ANY(%s::{sql_type}[])")
+            self._params.append(
+                [
+                    value.value if isinstance(value, Enum) else value
+                    for value in values
+                ]
+            )
+        return self
+
+    @property
+    def condition(self) -> str:
+        """Get the conditions joined with ``AND``.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        condition : str
+            The condition, or ``TRUE``, when there are no conditions.
+
+        """
+        return " AND ".join(self._conditions) or "TRUE"
+
+    @property
+    def params(self) -> tuple[t.Any, ...]:
+        """Get the parameters in the order of their placeholders.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        params : tuple of typing.Any
+            The parameters.
+
+        """
+        return tuple(self._params)
+
+
 @contextmanager
 def ssh_tunnel(
     host: str,
@@ -119,6 +261,47 @@ def ssh_tunnel(
     None : None
         Yields none, when the tunnel is disabled (``enabled = False``).
 
+    """
+    with ssh_forwarder(
+        host, username, remote_port, port, enabled=enabled
+    ) as tun:
+        yield None if tun is None else tun.local_bind_port
+
+
+@contextmanager
+def ssh_forwarder(
+    host: str,
+    username: str,
+    remote_port: int,
+    port: int = 22,
+    *,
+    enabled: bool = True,
+) -> Iterator[sshtunnel.SSHTunnelForwarder | None]:
+    """Create an SSH tunnel and yield its forwarder.
+
+    Unlike ``ssh_tunnel()``, the forwarder can be used to check, if the
+    tunnel is still up (``is_active``).
+
+    Parameters
+    ----------
+    host : str
+        The remote host e.g. ``127.0.0.1`` or ``host.domain.tld``.
+    username : str
+        The username of the user.
+    remote_port : int
+        The port of the application, which should be tunneled.
+    port : int, default: 22
+        The ssh port
+    enabled : bool, default: True
+        ``True`` if the tunnel should be enabled or ``False`` if not.
+
+    Yields
+    ------
+    tun : sshtunnel.SSHTunnelForwarder
+        The forwarder of the started tunnel.
+    None : None
+        Yields none, when the tunnel is disabled (``enabled = False``).
+
     """
     if enabled:
         tun = sshtunnel.SSHTunnelForwarder(
@@ -135,7 +318,7 @@ def ssh_tunnel(
                 "SSH tunnel created using port: %s",
                 tun.local_bind_port,
             )
-            yield tun.local_bind_port
+            yield tun
         finally:
             tun.stop()
             logger.debug("SSH tunnel closed")
@@ -143,9 +326,34 @@ def ssh_tunnel(
     yield None
 
 
+class DBTunnel(t.NamedTuple):
+    """Use this NamedTuple to hold the URI of the database and its tunnel."""
+
+    connection_uri: str
+    forwarder: sshtunnel.SSHTunnelForwarder | None = None  # None: disabled
+
+    @property
+    def is_active(self) -> bool:
+        """Check, if the tunnel is up.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        is_active : bool
+            ``True``, if the tunnel is up or disabled, otherwise ``False``.
+
+        """
+        return self.forwarder is None or bool(self.forwarder.is_active)
+
+
 @contextmanager
-def db_connect(yaml: YAML) -> Iterator[psycopg.Connection]:
-    """Connect to a PostgreSQL database.
+def db_tunnel(yaml: YAML) -> Iterator[DBTunnel]:
+    """Open the SSH tunnel to the database, if it is enabled.
+
+    All connections to the URI of the yielded tunnel share the tunnel.
 
     Parameters
     ----------
@@ -154,44 +362,659 @@ def db_connect(yaml: YAML) -> Iterator[psycopg.Connection]:
 
     Yields
     ------
-    conn : psycopg.Connection
-        A new ``Connection`` instance.
+    tunnel : matrixctl.handlers.db.DBTunnel
+        The URI to connect to the database and the tunnel.
 
     """
-    with ssh_tunnel(
+    with ssh_forwarder(
         host=yaml.get("server", "ssh", "address"),
         port=int(yaml.get("server", "ssh", "port")),
         username=yaml.get("server", "ssh", "user"),
         remote_port=yaml.get("server", "database", "port"),
         enabled=yaml.get("server", "database", "tunnel"),
         # skipcq PY-W0069
-    ) as local_bind_port:
-        connection_uri = DBConnectionBuilder(
-            host=(
-                "127.0.0.1"
-                if yaml.get("server", "database", "tunnel")
-                else yaml.get("server", "ssh", "address")
+    ) as forwarder:
+        yield DBTunnel(
+            str(
+                DBConnectionBuilder(
+                    host=(
+                        "127.0.0.1"
+                        if forwarder is not None
+                        else yaml.get("server", "ssh", "address")
+                    ),
+                    port=int(
+                        yaml.get("server", "database", "port")
+                        if forwarder is None
+                        else forwarder.local_bind_port
+                    ),
+                    username=yaml.get("server", "database", "synapse_user"),
+                    password=yaml.get(
+                        "server", "database", "synapse_password"
+                    ),
+                    database=yaml.get(
+                        "server", "database", "synapse_database"
+                    ),
+                )
             ),
-            port=int(
-                local_bind_port or yaml.get("server", "database", "port"),
-            ),
-            username=yaml.get("server", "database", "synapse_user"),
-            password=yaml.get("server", "database", "synapse_password"),
-            database=yaml.get("server", "database", "synapse_database"),
+            forwarder,
         )
-        conn = psycopg.connect(str(connection_uri))
+
+
+class DBPoolLimits(t.NamedTuple):
+    """Use this NamedTuple to configure the database connection pool.
+
+    The values are taken from ``server.database`` in the config file.
+
+    """
+
+    pool_size: int = 4
+    health_check_after: float = 30.0  # seconds
+
+
+class DBConnectionPool:
+    """Share the SSH tunnel and the database connections across the process.
+
+    Opening a new connection for every query means a new SSH handshake and
+    a new authentication with PostgreSQL. Instead, the pool opens the SSH
+    tunnel with the first connection and keeps it open for the lifetime of
+    the process. Returned connections are kept open for the next query, up
+    to ``pool_size`` idle connections.
+
+    When more connections are needed at the same time, than are idle, new
+    connections are opened, so the pool never blocks. Connections, which
+    were idle for more than ``health_check_after`` seconds, are checked with
+    ``SELECT 1``, before they are reused. If a new connection can not be
+    established, because the tunnel is down, the tunnel is reopened once.
+    This only happens, when no other connection is borrowed or being opened,
+    because they use the same tunnel.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       db_pool.configure(yaml)
+       with db_pool.connection() as conn:
+           conn.execute("SELECT 1")
+
+    """
+
+    __slots__ = (
+        "_borrowed",
+        "_idle",
+        "_lock",
+        "_stack",
+        "_tunnel",
+        "_yaml",
+        "limits",
+    )
+
+    def __init__(self, limits: DBPoolLimits | None = None) -> None:
+        self.limits: DBPoolLimits = limits or DBPoolLimits()
+        self._yaml: YAML | None = None
+        self._tunnel: DBTunnel | None = None
+        self._borrowed: int = 0
+        self._stack: ExitStack = ExitStack()
+        self._idle: list[tuple[psycopg.Connection, float]] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def configure(
+        self,
+        yaml: YAML,
+        limits: DBPoolLimits | None = None,
+    ) -> None:
+        """Set the configuration and the limits of the pool.
+
+        Nothing is opened, until the first connection is requested. When
+        the configuration changes, the open connections and the tunnel are
+        closed.
+
+        Parameters
+        ----------
+        yaml : matrixctl.handlers.yaml.YAML
+            The configuration file handler.
+        limits : matrixctl.handlers.db.DBPoolLimits, optional
+            The new limits. By default, the limits are not changed.
+
+        Returns
+        -------
+        None
+
+        """
+        if yaml is not self._yaml:
+            self.close()
+            self._yaml = yaml
+        if limits is not None and limits != self.limits:
+            logger.debug("Configure database connection pool: %s", limits)
+            self.limits = limits
+
+    @property
+    def connection_uri(self) -> str:
+        """Get the URI of the database and open the tunnel, if needed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        connection_uri : str
+            The URI of the database.
+
+        """
+        return self._open_tunnel().connection_uri
+
+    def _open_tunnel(self) -> DBTunnel:
+        """Get the tunnel and open it, if needed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        tunnel : matrixctl.handlers.db.DBTunnel
+            The tunnel.
+
+        """
+        with self._lock:
+            if self._tunnel is None:
+                if self._yaml is None:
+                    err_msg = "The database connection pool is not configured."
+                    raise RuntimeError(err_msg)
+                self._tunnel = self._stack.enter_context(db_tunnel(self._yaml))
+            return self._tunnel
+
+    def _reopen_tunnel(self, tunnel: DBTunnel) -> bool:
+        """Reopen the tunnel, if it is down and no other connection uses it.
+
+        The check and the reopening happen while the lock is held, so no
+        other thread can borrow a connection through the old tunnel in
+        between. The caller counts as borrower.
+
+        Parameters
+        ----------
+        tunnel : matrixctl.handlers.db.DBTunnel
+            The tunnel, the connection failed with.
+
+        Returns
+        -------
+        reopened : bool
+            ``True``, if the tunnel was reopened, also by another thread,
+            otherwise ``False``.
+
+        """
+        with self._lock:
+            if self._tunnel is not tunnel:  # Reopened by another thread
+                return True
+            if tunnel.is_active or self._borrowed > 1:
+                return False
+            logger.debug("Reopen the SSH tunnel.")
+            idle, self._idle = self._idle, []
+            self._tunnel = None
+            self._stack.close()
+            if self._yaml is not None:
+                self._tunnel = self._stack.enter_context(db_tunnel(self._yaml))
+        for conn, _ in idle:
+            conn.close()
+        return True
+
+    def _healthy(self, conn: psycopg.Connection, last_used: float) -> bool:
+        """Check, if an idle connection can be reused.
+
+        Parameters
+        ----------
+        conn : psycopg.Connection
+            The idle connection.
+        last_used : float
+            The time (``time.monotonic()``) the connection was returned.
+
+        Returns
+        -------
+        healthy : bool
+            ``True``, if the connection can be reused, otherwise ``False``.
+
+        """
+        if conn.closed or conn.broken:
+            return False
+        if time.monotonic() - last_used < self.limits.health_check_after:
+            return True
         try:
-            yield conn
-        except BaseException:  # skipcq: PYL-W0703
-            logger.exception("Rollback initiated.")
+            conn.execute("SELECT 1")
             conn.rollback()
-            sys.exit(1)
+        except psycopg.Error:
+            logger.debug("Idle connection failed the health check.")
+            return False
+        return True
+
+    def _checkout(self) -> psycopg.Connection:
+        """Get an idle connection or open a new one.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        conn : psycopg.Connection
+            The connection.
+
+        """
+        # Count the connection as borrowed, before it is opened, so the
+        # tunnel is not reopened meanwhile.
+        with self._lock:
+            self._borrowed += 1
+        conn: psycopg.Connection | None = None
+        try:
+            while conn is None:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, last_used = self._idle.pop()
+                if not self._healthy(conn, last_used):
+                    conn.close()
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+        except BaseException:
+            with self._lock:
+                self._borrowed -= 1
+            raise
+        return conn
+
+    def _connect(self) -> psycopg.Connection:
+        """Open a new connection and reopen the tunnel, if it is down.
+
+        Parameters
+        ----------
+        None
+
+        Raises
+        ------
+        psycopg.OperationalError
+            If the connection fails for another reason than a closed tunnel,
+            e.g. wrong credentials or too many clients.
+
+        Returns
+        -------
+        conn : psycopg.Connection
+            The connection.
+
+        """
+        tunnel: DBTunnel = self._open_tunnel()
+        try:
+            return psycopg.connect(tunnel.connection_uri)
+        except psycopg.OperationalError:
+            if not self._reopen_tunnel(tunnel):
+                raise
+            return psycopg.connect(self.connection_uri)
+
+    def _checkin(self, conn: psycopg.Connection) -> None:
+        """Return a connection to the pool or close it.
+
+        Parameters
+        ----------
+        conn : psycopg.Connection
+            The connection.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self._borrowed -= 1
+        if conn.closed or conn.broken:
+            return
+        # The transaction has ended, so the next borrower gets the default
+        conn.read_only = None
+        with self._lock:
+            if len(self._idle) < self.limits.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg.Connection]:
+        """Borrow a connection from the pool.
+
+        The transaction is committed, when the block is left, or rolled
+        back, when an exception was raised.
+
+        Parameters
+        ----------
+        None
+
+        Yields
+        ------
+        conn : psycopg.Connection
+            The connection.
+
+        """
+        conn: psycopg.Connection = self._checkout()
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
         else:
             conn.commit()
-            logger.debug("successful -> commit")
         finally:
+            self._checkin(conn)
+
+    def close(self) -> None:
+        """Close the idle connections and the tunnel.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+            tunnel, self._tunnel = self._tunnel, None
+        for conn, _ in idle:
             conn.close()
-            logger.debug("Connection to the Database has been closed.")
+        if tunnel is not None:
+            self._stack.close()
+            logger.debug("Connections to the Database have been closed.")
+
+
+db_pool: DBConnectionPool = DBConnectionPool()
+atexit.register(db_pool.close)
+
+
+@contextmanager
+def db_connect(yaml: YAML) -> Iterator[psycopg.Connection]:
+    """Connect to a PostgreSQL database.
+
+    The connection is borrowed from ``db_pool``, so the SSH tunnel and the
+    connection are reused by the next query.
+
+    Parameters
+    ----------
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Yields
+    ------
+    conn : psycopg.Connection
+        A ``Connection`` instance.
+
+    """
+    db_pool.configure(yaml)
+    try:
+        with db_pool.connection() as conn:
+            yield conn
+    except BaseException:  # skipcq: PYL-W0703
+        logger.exception("Rollback initiated.")
+        sys.exit(1)
+    logger.debug("successful -> commit")
+
+
+@contextmanager
+def server_cursor(
+    conn: psycopg.Connection,
+    itersize: int = DB_CURSOR_ITERSIZE,
+) -> Iterator[psycopg.ServerCursor[TupleRow]]:
+    """Create a named server-side cursor.
+
+    Unlike the default client-side cursor, which loads the whole result into
+    memory before the first row can be read, a server-side cursor keeps the
+    result on the server. It fetches ``itersize`` rows per round trip, when
+    the cursor is iterated.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       with db_connect(yaml) as conn, server_cursor(conn) as cur:
+           cur.execute("SELECT json FROM event_json")
+           for row in cur:
+               print(row[0])
+
+    Parameters
+    ----------
+    conn : psycopg.Connection
+        The connection to the database.
+    itersize : int, default: DB_CURSOR_ITERSIZE
+        The number of rows fetched per round trip.
+
+    Yields
+    ------
+    cur : psycopg.ServerCursor of psycopg.rows.TupleRow
+        The server-side cursor.
+
+    """
+    with conn.cursor(name=f"matrixctl_{uuid4().hex}") as cur:
+        cur.itersize = itersize
+        logger.debug(
+            "Server-side cursor %s with itersize %d opened.",
+            cur.name,
+            itersize,
+        )
+        yield cur
+
+
+def fetch_batches(
+    conn: psycopg.Connection,
+    query: str,
+    params: Sequence[t.Any],
+    itersize: int = DB_CURSOR_ITERSIZE,
+) -> Iterator[list[TupleRow]]:
+    """Run a query on a server-side cursor and fetch the rows in batches.
+
+    Parameters
+    ----------
+    conn : psycopg.Connection
+        The connection to the database.
+    query : str
+        The query.
+    params : collections.abc.Sequence of typing.Any
+        The values, which are bound to the placeholders of the query.
+    itersize : int, default: DB_CURSOR_ITERSIZE
+        The number of rows fetched per round trip.
+
+    Yields
+    ------
+    rows : list of psycopg.rows.TupleRow
+        The next batch of up to ``itersize`` rows.
+
+    """
+    with server_cursor(conn, itersize) as cur:
+        cur.execute(query, params)
+        while rows := cur.fetchmany(itersize):
+            yield rows
+
+
+def copy_chunks(
+    conn: psycopg.Connection,
+    statement: str,
+    params: Sequence[t.Any],
+    chunk_size: int = DB_COPY_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Run ``COPY ... TO STDOUT`` and collect the data in chunks.
+
+    The server sends every row on its own. The rows are joined to chunks of
+    at least ``chunk_size`` bytes, so the chunks can be written or passed
+    on cheaply.
+
+    Parameters
+    ----------
+    conn : psycopg.Connection
+        The connection to the database.
+    statement : str
+        The ``COPY (...) TO STDOUT`` statement.
+    params : collections.abc.Sequence of typing.Any
+        The values, which are merged into the placeholders of the
+        statement.
+    chunk_size : int, default: DB_COPY_CHUNK_SIZE
+        The minimum size of a chunk in bytes. The last chunk may be
+        smaller.
+
+    Yields
+    ------
+    chunk : bytes
+        The next chunk of data.
+
+    """
+    buf: bytearray = bytearray()
+    with conn.cursor() as cur, cur.copy(statement, params) as copy:
+        for data in copy:
+            buf += data
+            if len(buf) >= chunk_size:
+                yield bytes(buf)
+                buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def time_buckets(start: int, stop: int, count: int) -> list[tuple[int, int]]:
+    """Split a time range into buckets of equal size.
+
+    Parameters
+    ----------
+    start : int
+        The start of the range (inclusive).
+    stop : int
+        The end of the range (exclusive).
+    count : int
+        The maximum number of buckets. There are fewer buckets, when the
+        range is shorter than ``count``.
+
+    Returns
+    -------
+    buckets : list of tuple of int and int
+        The ordered, consecutive ``(start, stop)`` pairs of the buckets.
+
+    """
+    count = max(1, min(count, stop - start))
+    edges: list[int] = [
+        start + (stop - start) * i // count for i in range(count)
+    ]
+    return list(zip(edges, [*edges[1:], stop], strict=True))
+
+
+class _ScanFailed(t.NamedTuple):
+    """Pass an exception of a worker of ``parallel_scan()`` on."""
+
+    error: Exception
+
+
+_SCAN_DONE: t.Final[object] = object()
+
+
+def parallel_scan(  # noqa: C901
+    connect: Callable[[], AbstractContextManager[psycopg.Connection]],
+    tasks: Sequence[B],
+    scan: Callable[[psycopg.Connection, B], Iterable[T]],
+    *,
+    workers: int,
+    queue_size: int = DB_SCAN_QUEUE_SIZE,
+) -> Iterator[T]:
+    """Scan the tasks concurrently on multiple connections, in order.
+
+    Every worker thread borrows its own connection, makes it read-only and
+    scans the tasks one after another, in the order of ``tasks``. The
+    results of every task are passed through a bounded queue, and the queues
+    are read in the order of ``tasks``. When the tasks are consecutive time
+    buckets of an ordered query, the result is ordered, like a single query
+    over the whole time range.
+
+    While the results of a task are read, the workers scan the next tasks,
+    until the queues of those tasks are full. ``queue_size`` bounds the
+    memory used per task.
+
+    Notes
+    -----
+    Every connection sees its own snapshot of the database. Rows, which are
+    inserted while the scan is running, may or may not be in the result.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       for rows in parallel_scan(db_pool.connection, buckets, scan, workers=4):
+           print(rows)
+
+    Parameters
+    ----------
+    connect : collections.abc.Callable
+        A function, which returns a context manager of a connection, e.g.
+        ``db_pool.connection``. The connection must not be in a transaction.
+    tasks : collections.abc.Sequence of B
+        The tasks, e.g. time buckets.
+    scan : collections.abc.Callable
+        A function, which scans a task on a connection and yields the
+        results.
+    workers : int
+        The number of worker threads and connections.
+    queue_size : int, default: DB_SCAN_QUEUE_SIZE
+        The maximum number of results held back per task.
+
+    Yields
+    ------
+    result : T
+        The results of the tasks in order.
+
+    """
+    queues: list[queue.Queue[t.Any]] = [
+        queue.Queue(maxsize=queue_size) for _ in tasks
+    ]
+    pending: Iterator[int] = iter(range(len(tasks)))
+    lock: threading.Lock = threading.Lock()
+    stop: threading.Event = threading.Event()
+
+    def put(q: queue.Queue[t.Any], item: t.Any) -> bool:
+        while not stop.is_set():
+            with suppress(queue.Full):
+                q.put(item, timeout=0.1)
+                return True
+        return False
+
+    def work() -> None:
+        conn: psycopg.Connection | None = None
+        with ExitStack() as stack:
+            while not stop.is_set():
+                with lock:
+                    i: int | None = next(pending, None)
+                if i is None:
+                    return
+                try:
+                    if conn is None:
+                        conn = stack.enter_context(connect())
+                        conn.read_only = True
+                    for item in scan(conn, tasks[i]):
+                        if not put(queues[i], item):
+                            return
+                except Exception as err:  # noqa: BLE001
+                    put(queues[i], _ScanFailed(err))
+                    return
+                put(queues[i], _SCAN_DONE)
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=work, name=f"scan-{n}", daemon=True)
+        for n in range(min(workers, len(tasks)))
+    ]
+    logger.debug(
+        "Scanning %d tasks on %d connections.", len(tasks), len(threads)
+    )
+    for thread in threads:
+        thread.start()
+    try:
+        for q in queues:
+            while (item := q.get()) is not _SCAN_DONE:
+                if isinstance(item, _ScanFailed):
+                    raise item.error
+                yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
 
 
 # vim: set ft=python :
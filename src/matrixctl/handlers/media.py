@@ -0,0 +1,258 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Buffer downloaded media in memory or in a temporary file."""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+import typing as t
+
+from pathlib import Path
+from types import TracebackType
+
+from typing_extensions import Self
+
+from matrixctl.errors import MediaTooLargeError
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_THRESHOLD: int = 8 * 1024 * 1024  # bytes
+
+
+class MediaBuffer:
+    """Collect the chunks of a media download in linear time.
+
+    The buffer is preallocated, when the size of the media is known in
+    advance (e.g. from the ``Content-Length`` header), so every chunk is
+    copied exactly once. Media larger than ``spool_threshold`` is written to
+    a temporary file instead of being kept in memory.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       with MediaBuffer(expected_size=3) as buf:
+           buf.write(b"abc")
+           buf.getvalue()
+       # b'abc'
+
+    Parameters
+    ----------
+    expected_size : int, optional
+        The expected size of the media in bytes.
+    spool_threshold : int, default: DEFAULT_SPOOL_THRESHOLD
+        The size in bytes, from which on the media is written to a temporary
+        file.
+    max_size : int, optional
+        The maximum size of the media in bytes. ``None`` or ``0`` means
+        unlimited.
+
+    """
+
+    __slots__ = (
+        "_buf",
+        "_file",
+        "_size",
+        "content_type",
+        "max_size",
+        "spool_threshold",
+    )
+
+    def __init__(
+        self,
+        expected_size: int | None = None,
+        spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+        max_size: int | None = None,
+    ) -> None:
+        self.spool_threshold: int = spool_threshold
+        self.max_size: int | None = max_size or None
+        self.content_type: str | None = None
+        self._size: int = 0
+        self._file: t.IO[bytes] | None = None
+        self._buf: bytearray = bytearray()
+
+        if expected_size is not None:
+            self._check_size(expected_size)
+            if expected_size > spool_threshold:
+                self._spill()
+            else:
+                self._buf = bytearray(expected_size)
+
+    def __enter__(self) -> Self:
+        """Use the buffer as context manager.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        buffer : matrixctl.handlers.media.MediaBuffer
+            The buffer itself.
+
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Remove the temporary file, if there is one.
+
+        Parameters
+        ----------
+        exc_type : type of BaseException, optional
+            The type of the exception.
+        exc_value : BaseException, optional
+            The exception.
+        traceback : types.TracebackType, optional
+            The traceback.
+
+        Returns
+        -------
+        None
+
+        """
+        self.close()
+
+    @property
+    def size(self) -> int:
+        """Get the number of bytes written to the buffer.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        size : int
+            The size in bytes.
+
+        """
+        return self._size
+
+    @property
+    def spilled(self) -> bool:
+        """Check, if the media was written to a temporary file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        spilled : bool
+            ``True``, if the media is in a temporary file, otherwise
+            ``False``.
+
+        """
+        return self._file is not None
+
+    def _check_size(self, size: int) -> None:
+        if self.max_size is not None and size > self.max_size:
+            msg: str = (
+                f"The media is larger than {self.max_size} bytes "
+                f"({size} bytes)."
+            )
+            raise MediaTooLargeError(msg)
+
+    def _spill(self) -> None:
+        logger.debug("Spill media to a temporary file.")
+        self._file = tempfile.NamedTemporaryFile(  # noqa: SIM115
+            prefix=".matrixctl-",
+            suffix=".part",
+            delete=False,
+        )
+        self._file.write(memoryview(self._buf)[: self._size])
+        self._buf = bytearray()
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk to the buffer.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk.
+
+        Returns
+        -------
+        None
+
+        """
+        end: int = self._size + len(chunk)
+        self._check_size(end)
+        if self._file is None and end > self.spool_threshold:
+            self._spill()
+
+        if self._file is not None:
+            self._file.write(chunk)
+        elif end <= len(self._buf):  # Preallocated
+            self._buf[self._size : end] = chunk
+        else:  # Unknown size: bytearray grows amortized linear
+            del self._buf[self._size :]
+            self._buf += chunk
+        self._size = end
+
+    def getvalue(self) -> bytes:
+        """Get the content of the buffer.
+
+        The content of a spilled buffer is read back from its temporary
+        file into memory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        content : bytes
+            The content of the buffer.
+
+        """
+        if self._file is not None:
+            self._file.flush()
+            return Path(self._file.name).read_bytes()
+        return bytes(memoryview(self._buf)[: self._size])
+
+    def close(self) -> None:
+        """Release the memory and remove the temporary file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        self._buf = bytearray()
+        if self._file is not None:
+            self._file.close()
+            Path(self._file.name).unlink(missing_ok=True)
+            self._file = None
+
+
+# vim: set ft=python :
@@ -0,0 +1,359 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache media rendered in the terminal in memory and on disk."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import typing as t
+
+from collections import OrderedDict
+from contextlib import suppress
+from pathlib import Path
+
+from xdg_base_dirs import xdg_cache_home
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+# After an eviction, the disk tier is shrunk to this fraction of its limit,
+# so the blobs do not need to be scanned on every insert near the limit.
+DISK_EVICTION_TARGET: float = 0.9
+
+
+class MediaCacheConfig(t.NamedTuple):
+    """Use this NamedTuple to configure the media cache.
+
+    The values are taken from ``ui.image.cache`` in the config file. A size
+    or number of entries of ``0`` disables the tier.
+
+    """
+
+    memory_max_bytes: int = 32 * 1024 * 1024
+    memory_max_entries: int = 1024
+    disk_max_bytes: int = 256 * 1024 * 1024
+
+
+class MediaCache:
+    """Store media in memory and in the XDG cache directory.
+
+    The cache has two tiers, both bounded by bytes and evicting the least
+    recently used entries first. The memory tier is also bounded by the
+    number of entries and lives for one process, the disk tier is shared
+    across runs.
+
+    The total size of the disk tier is kept in the file ``size``, so adding
+    media does not need to look at the other blobs. Only when the total
+    exceeds the limit, the blobs are scanned and the least recently used
+    ones are removed. Processes, which write concurrently, may miscount the
+    total. It is corrected by every scan.
+
+    The disk tier is content-addressed. The media is stored once under the
+    hash of its content in ``blobs/``. The entry for a key in ``index/``
+    only contains that hash, so the same media requested with different
+    dimensions or under different URIs (e.g. the same avatar of many users)
+    is stored once.
+
+    The cache can be used from multiple threads.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       key = MediaCache.key("mxc://domain.tld/abc", 100, 100)
+       data = media_cache.get(key)
+       if data is None:
+           data = download(...)
+           media_cache.put(key, data)
+
+    """
+
+    __slots__ = (
+        "_disk_lock",
+        "_lock",
+        "_memory",
+        "_memory_size",
+        "config",
+        "directory",
+    )
+
+    def __init__(
+        self,
+        config: MediaCacheConfig | None = None,
+        directory: Path | None = None,
+    ) -> None:
+        self.config: MediaCacheConfig = config or MediaCacheConfig()
+        self.directory: Path = (
+            directory or xdg_cache_home() / "matrixctl" / "media"
+        )
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._disk_lock: threading.Lock = threading.Lock()
+
+    def configure(self, config: MediaCacheConfig) -> None:
+        """Change the configuration of the cache.
+
+        Parameters
+        ----------
+        config : matrixctl.handlers.media_cache.MediaCacheConfig
+            The new configuration.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self.config = config
+            self._shrink_memory()
+
+    @staticmethod
+    def key(uri: str, width: int | None, height: int | None) -> str:
+        """Get the key of an entry.
+
+        Parameters
+        ----------
+        uri : str
+            The mxc:// URI of the media.
+        width : int, optional
+            The requested width in pixels.
+        height : int, optional
+            The requested height in pixels.
+
+        Returns
+        -------
+        key : str
+            The key.
+
+        """
+        raw: str = f"{uri}\0{width}\0{height}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """Get media from the cache.
+
+        Media found on disk is added to the memory tier.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry (see ``MediaCache.key()``).
+
+        Returns
+        -------
+        data : bytes or None
+            The media or ``None``, if there is no entry.
+
+        """
+        with self._lock:
+            data: bytes | None = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        data = self._read(key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Add media to the cache.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry (see ``MediaCache.key()``).
+        data : bytes
+            The media.
+
+        Returns
+        -------
+        None
+
+        """
+        self._remember(key, data)
+        self._write(key, data)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if (
+            len(data) > self.config.memory_max_bytes
+            or not self.config.memory_max_entries
+        ):
+            return
+        with self._lock:
+            old: bytes | None = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            self._shrink_memory()
+
+    def _shrink_memory(self) -> None:
+        while self._memory and (
+            self._memory_size > self.config.memory_max_bytes
+            or len(self._memory) > self.config.memory_max_entries
+        ):
+            _, data = self._memory.popitem(last=False)
+            self._memory_size -= len(data)
+
+    def _read(self, key: str) -> bytes | None:
+        if not self.config.disk_max_bytes:
+            return None
+        index_path: Path = self.directory / "index" / key
+        try:
+            digest: str = index_path.read_text(encoding="ascii").strip()
+            blob_path: Path = self.directory / "blobs" / digest
+            data: bytes = blob_path.read_bytes()
+        except FileNotFoundError:
+            # The blob may have been evicted, while the index entry was kept
+            index_path.unlink(missing_ok=True)
+            return None
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        if hashlib.sha256(data).hexdigest() != digest:
+            logger.debug("Remove corrupted media from the cache: %s", digest)
+            blob_path.unlink(missing_ok=True)
+            return None
+
+        with suppress(OSError):  # Mark as recently used
+            os.utime(blob_path)
+
+        logger.debug("Use cached media: %s", digest)
+        return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        if len(data) > self.config.disk_max_bytes:
+            return
+
+        digest: str = hashlib.sha256(data).hexdigest()
+        blobs: Path = self.directory / "blobs"
+        index: Path = self.directory / "index"
+        added: bool = False
+        try:
+            blobs.mkdir(parents=True, exist_ok=True)
+            index.mkdir(parents=True, exist_ok=True)
+            blob_path: Path = blobs / digest
+            if blob_path.exists():
+                os.utime(blob_path)
+            else:
+                # Write to a temporary file first, so a reader never sees a
+                # partial entry.
+                with tempfile.NamedTemporaryFile(
+                    dir=blobs,
+                    prefix=".",
+                    delete=False,
+                ) as fp:
+                    fp.write(data)
+                with self._disk_lock:
+                    size: int = self._read_disk_size()
+                    Path(fp.name).replace(blob_path)
+                    size += len(data)
+                    if size <= self.config.disk_max_bytes:
+                        self._write_disk_size(size)
+                    added = True
+            self._write_atomic(index / key, digest.encode("ascii"))
+        except OSError as err:
+            logger.debug("Unable to cache the media: %s", err)
+            return
+
+        if added and size > self.config.disk_max_bytes:
+            self.evict()
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent,
+            prefix=".",
+            delete=False,
+        ) as fp:
+            fp.write(data)
+        Path(fp.name).replace(path)
+
+    def _scan_blobs(self) -> list[tuple[float, int, Path]]:
+        entries: list[tuple[float, int, Path]] = []
+        for path in (self.directory / "blobs").glob("[!.]*"):
+            with suppress(OSError):  # Removed by another process
+                stat: os.stat_result = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _read_disk_size(self) -> int:
+        try:
+            return int(
+                (self.directory / "size").read_text(encoding="ascii").strip()
+            )
+        except (OSError, ValueError):
+            # Created by an older version or removed
+            return sum(entry[1] for entry in self._scan_blobs())
+
+    def _write_disk_size(self, size: int) -> None:
+        with suppress(OSError):
+            self._write_atomic(
+                self.directory / "size",
+                str(max(size, 0)).encode("ascii"),
+            )
+
+    def evict(self) -> None:
+        """Remove the least recently used media, until the disk tier fits.
+
+        The disk tier is shrunk to ``DISK_EVICTION_TARGET`` of its limit.
+        The index entries of removed media are removed as well.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        target: int = int(self.config.disk_max_bytes * DISK_EVICTION_TARGET)
+        evicted: set[str] = set()
+        with self._disk_lock:
+            entries: list[tuple[float, int, Path]] = self._scan_blobs()
+            size: int = sum(entry[1] for entry in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= target:
+                    break
+                path.unlink(missing_ok=True)
+                evicted.add(path.name)
+                size -= entry_size
+            self._write_disk_size(size)
+
+        if not evicted:
+            return
+        for path in (self.directory / "index").glob("[!.]*"):
+            with suppress(OSError):
+                if path.read_text(encoding="ascii").strip() in evicted:
+                    path.unlink()
+
+
+media_cache: MediaCache = MediaCache()
+
+
+# vim: set ft=python :
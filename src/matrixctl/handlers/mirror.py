@@ -0,0 +1,576 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Mirror the events of rooms into a local SQLite database."""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import time
+
+from collections.abc import Iterable
+from collections.abc import Iterator
+from enum import Enum
+from pathlib import Path
+from types import TracebackType
+
+import psycopg
+
+from psycopg.rows import TupleRow
+from typing_extensions import Self
+from xdg_base_dirs import xdg_data_home
+
+from .db import DB_CURSOR_ITERSIZE
+from .db import fetch_batches
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+logger = logging.getLogger(__name__)
+
+# Synapse allocates stream orderings, before the events are persisted. With
+# multiple event persisters, an event can be persisted after an event with a
+# higher stream ordering. The last stream orderings before the marks are
+# read again to pick those events up.
+MIRROR_SYNC_OVERLAP: int = 100
+
+MIRROR_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    high_water_mark INTEGER NOT NULL DEFAULT 0,
+    low_water_mark INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    stream_ordering INTEGER NOT NULL,
+    room_id TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    type TEXT NOT NULL,
+    origin_server_ts INTEGER NOT NULL,
+    received_ts INTEGER,
+    json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (origin_server_ts);
+CREATE INDEX IF NOT EXISTS events_room_ts
+    ON events (room_id, origin_server_ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5 (
+    body,
+    content = '',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# The number of rows of the events table, which are indexed in one
+# transaction.
+MIRROR_INDEX_BATCH_SIZE: int = 50_000
+
+MIRROR_SEARCH_LIMIT: int = 50
+
+# The rows of the full-text index share the rowid with the rows of the events
+# table. The index is contentless, the bodies are only stored in the event
+# JSON.
+_INDEX_QUERY: str = (
+    "INSERT INTO messages (rowid, body) "
+    "SELECT rowid, json_extract(json, '$.content.body') FROM events "
+    "WHERE rowid > ? AND rowid <= ? AND type = 'm.room.message' "
+    "AND json_extract(json, '$.content.body') IS NOT NULL"
+)
+
+# The forward query reads new events, the backward query reads backfilled
+# events, which have negative stream orderings.
+_SYNC_QUERY: str = (
+    "SELECT "
+    "events.event_id, events.stream_ordering, events.room_id, "
+    "events.sender, events.type, events.origin_server_ts, "
+    "events.received_ts, event_json.json "
+    "FROM "
+    "events INNER JOIN event_json ON event_json.event_id = events.event_id "
+    "WHERE events.room_id = %s AND events.stream_ordering {} %s "
+    "ORDER BY events.stream_ordering {}"
+)
+SYNC_QUERY_FORWARD: str = _SYNC_QUERY.format(">", "ASC")
+SYNC_QUERY_BACKWARD: str = _SYNC_QUERY.format("<", "DESC")
+
+
+def _where_in(
+    **columns: Iterable[str | Enum] | None,
+) -> tuple[str, list[str]]:
+    """Build the conditions, which filter columns of the events table.
+
+    Parameters
+    ----------
+    **columns : collections.abc.Iterable of str or Enum, optional
+        The allowed values of the columns. Columns without values are not
+        filtered.
+
+    Returns
+    -------
+    condition : tuple of str and list of str
+        The conditions, which start with ``AND``, and their parameters.
+
+    """
+    condition: str = ""
+    params: list[str] = []
+    for column, values in columns.items():
+        if values:
+            # Like "= ANY(array)", the query does not depend on the
+            # number of values.
+            condition += (
+                f" AND events.{column} IN (SELECT value FROM json_each(?))"  # noqa: S608
+            )
+            params.append(
+                json.dumps(
+                    [
+                        value.value if isinstance(value, Enum) else value
+                        for value in values
+                    ]
+                )
+            )
+    return condition, params
+
+
+class EventMirror:
+    """Keep a local copy of the events of rooms in SQLite.
+
+    For every room, the mirror tracks the highest (``high_water_mark``) and
+    the lowest (``low_water_mark``) stream ordering it has copied. A sync
+    only reads the events after those marks from the database of the
+    homeserver. The marks are moved with every batch, so an interrupted
+    sync continues where it stopped.
+
+    The database uses write-ahead logging (WAL), so it can be read, while a
+    sync is running.
+
+    The bodies of ``m.room.message`` events are kept in an FTS5 full-text
+    index, which is updated incrementally with ``index_messages()`` and
+    queried with ``search()``.
+
+    Notes
+    -----
+    Events are never updated after they were copied. Redactions, which
+    Synapse applies to the stored events after the redaction retention
+    period, and purged history are not reflected in the mirror.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       with EventMirror(EventMirror.default_path(yaml.server)) as mirror:
+           with db_connect(yaml) as conn:
+               mirror.sync_room(conn, "!room:domain.tld")
+           for row in mirror.events(room_ids=["!room:domain.tld"]):
+               print(row)
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path to the SQLite database.
+
+    """
+
+    __slots__ = ("_conn", "path")
+
+    def __init__(self, path: Path) -> None:
+        self.path: Path = path
+        self._conn: sqlite3.Connection | None = None
+
+    @staticmethod
+    def default_path(server: str) -> Path:
+        """Get the path of the mirror of a server.
+
+        Parameters
+        ----------
+        server : str
+            The name of the server in the config file.
+
+        Returns
+        -------
+        path : pathlib.Path
+            The path in the XDG data directory.
+
+        """
+        return xdg_data_home() / "matrixctl" / "mirror" / f"{server}.sqlite3"
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Get the connection to the mirror and create it, if needed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        conn : sqlite3.Connection
+            The connection.
+
+        """
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(MIRROR_SCHEMA)
+            logger.debug("Event mirror opened: %s", self.path)
+        return self._conn
+
+    def close(self) -> None:
+        """Close the connection to the mirror.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> Self:
+        """Use the mirror as context manager.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        mirror : matrixctl.handlers.mirror.EventMirror
+            The mirror itself.
+
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the connection to the mirror.
+
+        Parameters
+        ----------
+        exc_type : type of BaseException, optional
+            The type of the exception.
+        exc_value : BaseException, optional
+            The exception.
+        traceback : types.TracebackType, optional
+            The traceback.
+
+        Returns
+        -------
+        None
+
+        """
+        self.close()
+
+    def rooms(self) -> list[str]:
+        """Get the rooms in the mirror.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        room_ids : list of str
+            The room identifiers.
+
+        """
+        return [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT room_id FROM rooms ORDER BY room_id"
+            )
+        ]
+
+    def marks(self, room_id: str) -> tuple[int, int]:
+        """Get the marks of a room.
+
+        Parameters
+        ----------
+        room_id : str
+            The room identifier.
+
+        Returns
+        -------
+        marks : tuple of int and int
+            The high water mark and the low water mark. Both are ``0``, if
+            the room was never synced.
+
+        """
+        row: tuple[int, int] | None = self.conn.execute(
+            "SELECT high_water_mark, low_water_mark FROM rooms "
+            "WHERE room_id = ?",
+            (room_id,),
+        ).fetchone()
+        return (0, 0) if row is None else (int(row[0]), int(row[1]))
+
+    def store(
+        self,
+        room_id: str,
+        rows: list[TupleRow],
+        *,
+        forward: bool = True,
+    ) -> int:
+        """Store a batch of events and move the mark of the room.
+
+        Parameters
+        ----------
+        room_id : str
+            The room identifier.
+        rows : list of psycopg.rows.TupleRow
+            The events, ordered like the rows of ``SYNC_QUERY_FORWARD`` or
+            ``SYNC_QUERY_BACKWARD``.
+        forward : bool, default: True
+            ``True``, if the rows move the high water mark, or ``False``, if
+            they move the low water mark.
+
+        Returns
+        -------
+        new_events : int
+            The number of events, which were not in the mirror before.
+
+        """
+        with self.conn:  # One transaction
+            self.conn.execute(
+                "INSERT OR IGNORE INTO rooms (room_id) VALUES (?)", (room_id,)
+            )
+            new_events: int = self.conn.executemany(
+                "INSERT OR IGNORE INTO events (event_id, stream_ordering, "
+                "room_id, sender, type, origin_server_ts, received_ts, json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if rows:
+                mark: str = (
+                    "high_water_mark = max(high_water_mark, ?)"
+                    if forward
+                    else "low_water_mark = min(low_water_mark, ?)"
+                )
+                self.conn.execute(
+                    f"UPDATE rooms SET {mark} WHERE room_id = ?",  # noqa: S608
+                    (rows[-1][1], room_id),
+                )
+        return new_events
+
+    def sync_room(
+        self,
+        conn: psycopg.Connection,
+        room_id: str,
+        itersize: int = DB_CURSOR_ITERSIZE,
+    ) -> int:
+        """Copy the new events of a room from the database of the homeserver.
+
+        Parameters
+        ----------
+        conn : psycopg.Connection
+            The connection to the database of the homeserver.
+        room_id : str
+            The room identifier.
+        itersize : int, default: DB_CURSOR_ITERSIZE
+            The number of events, which are read and stored at once.
+
+        Returns
+        -------
+        new_events : int
+            The number of events, which were added to the mirror.
+
+        """
+        high_water_mark, low_water_mark = self.marks(room_id)
+        new_events: int = 0
+        for forward, query, mark in (
+            (True, SYNC_QUERY_FORWARD, high_water_mark - MIRROR_SYNC_OVERLAP),
+            (False, SYNC_QUERY_BACKWARD, low_water_mark + MIRROR_SYNC_OVERLAP),
+        ):
+            for rows in fetch_batches(conn, query, (room_id, mark), itersize):
+                new_events += self.store(room_id, rows, forward=forward)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO rooms (room_id, synced_at) VALUES (?, ?) "
+                "ON CONFLICT (room_id) DO UPDATE SET synced_at = ?",
+                (room_id, time.time(), time.time()),
+            )
+        logger.debug("Synced %d new events of %s.", new_events, room_id)
+        return new_events
+
+    def events(
+        self,
+        *,
+        since: int = 0,
+        until: int = 2**63 - 1,
+        users: Iterable[str] | None = None,
+        room_ids: Iterable[str] | None = None,
+        event_types: Iterable[str | Enum] | None = None,
+    ) -> Iterator[TupleRow]:
+        """Query the events in the mirror.
+
+        The rows are the same as the rows of the query of ``get-events``.
+
+        Parameters
+        ----------
+        since : int, default: 0
+            The start of the time range in milliseconds (inclusive).
+        until : int, default: 2**63 - 1
+            The end of the time range in milliseconds (exclusive).
+        users : collections.abc.Iterable of str, optional
+            Filter by senders.
+        room_ids : collections.abc.Iterable of str, optional
+            Filter by rooms.
+        event_types : collections.abc.Iterable of str or Enum, optional
+            Filter by event types.
+
+        Yields
+        ------
+        row : psycopg.rows.TupleRow
+            The event ID, event JSON, ``origin_server_ts`` and
+            ``received_ts``, ordered by ``origin_server_ts``.
+
+        """
+        condition, params = _where_in(
+            sender=users,
+            room_id=room_ids,
+            type=event_types,
+        )
+        query: str = (
+            "SELECT event_id, json, origin_server_ts, received_ts "  # noqa: S608
+            "FROM events WHERE origin_server_ts >= ? AND origin_server_ts < ?"
+            f"{condition} ORDER BY origin_server_ts ASC"
+        )
+        yield from self.conn.execute(query, [since, until, *params])
+
+    def index_messages(
+        self,
+        batch_size: int = MIRROR_INDEX_BATCH_SIZE,
+    ) -> int:
+        """Add the bodies of new messages to the full-text index.
+
+        Only the events, which were added to the mirror after the last call,
+        are read. They are indexed in batches of ``batch_size`` rows, each
+        in its own transaction, so an interrupted run continues where it
+        stopped.
+
+        Notes
+        -----
+        Encrypted messages have no body on the homeserver and are not
+        indexed.
+
+        Parameters
+        ----------
+        batch_size : int, default: MIRROR_INDEX_BATCH_SIZE
+            The number of rows of the events table, which are read at once.
+
+        Returns
+        -------
+        indexed : int
+            The number of messages, which were added to the index.
+
+        """
+        row: tuple[int | None] = self.conn.execute(
+            "SELECT max(rowid) FROM events"
+        ).fetchone()
+        last_rowid: int = row[0] or 0
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'indexed_rowid'"
+        ).fetchone() or (0,)
+        indexed_rowid: int = row[0] or 0
+        indexed: int = 0
+        while indexed_rowid < last_rowid:
+            end: int = min(indexed_rowid + batch_size, last_rowid)
+            with self.conn:  # One transaction
+                indexed += self.conn.execute(
+                    _INDEX_QUERY, (indexed_rowid, end)
+                ).rowcount
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) "
+                    "VALUES ('indexed_rowid', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    (end,),
+                )
+            indexed_rowid = end
+        logger.debug("Indexed %d new messages.", indexed)
+        return indexed
+
+    def search(  # noqa: PLR0913
+        self,
+        query: str,
+        *,
+        since: int = 0,
+        until: int = 2**63 - 1,
+        users: Iterable[str] | None = None,
+        room_ids: Iterable[str] | None = None,
+        limit: int = MIRROR_SEARCH_LIMIT,
+    ) -> Iterator[TupleRow]:
+        """Search the bodies of the messages in the full-text index.
+
+        Call ``index_messages()`` first, to include the events, which were
+        added since the last call.
+
+        Parameters
+        ----------
+        query : str
+            The FTS5 query, e.g. ``deploy AND (synapse OR dendrite)``.
+        since : int, default: 0
+            The start of the time range in milliseconds (inclusive).
+        until : int, default: 2**63 - 1
+            The end of the time range in milliseconds (exclusive).
+        users : collections.abc.Iterable of str, optional
+            Filter by senders.
+        room_ids : collections.abc.Iterable of str, optional
+            Filter by rooms.
+        limit : int, default: MIRROR_SEARCH_LIMIT
+            The maximum number of messages.
+
+        Raises
+        ------
+        sqlite3.OperationalError
+            If the query is not a valid FTS5 query.
+
+        Returns
+        -------
+        rows : collections.abc.Iterator of psycopg.rows.TupleRow
+            The event ID, event JSON, ``origin_server_ts`` and
+            ``received_ts`` of the messages, the best matches first.
+
+        """
+        condition, params = _where_in(sender=users, room_id=room_ids)
+        # Not a generator, so invalid queries fail here.
+        return self.conn.execute(
+            "SELECT events.event_id, events.json, events.origin_server_ts, "  # noqa: S608
+            "events.received_ts "
+            "FROM messages INNER JOIN events ON events.rowid = messages.rowid "
+            "WHERE messages MATCH ? "
+            "AND events.origin_server_ts >= ? AND events.origin_server_ts < ?"
+            f"{condition} ORDER BY messages.rank LIMIT ?",
+            [query, since, until, *params, limit],
+        )
+
+
+# vim: set ft=python :
@@ -43,6 +43,27 @@ __email__: str = "Michael@MichaelSasser.org"
 logger = logging.getLogger(__name__)
 
 
+def _get_client() -> httpx.Client:
+    """Get the shared client of the API handler.
+
+    The API handler is imported on first use, because the config file
+    handler imports this module for every command.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    client : httpx.Client
+        The shared synchronous client.
+
+    """
+    from matrixctl.handlers.api import client_pool  # noqa: PLC0415
+
+    return client_pool.get_client()
+
+
 class OidcTCPServer(socketserver.TCPServer):
     """TCP server wrapper for handling OIDC authentication callbacks.
 
@@ -313,7 +334,7 @@ class TokenManager:
             err_msg = "No access token available"
             raise ValueError(err_msg)
 
-        response = httpx.get(
+        response = _get_client().get(
             self.userinfo_endpoint,
             headers={"Authorization": f"Bearer {self.access_token}"},
             timeout=10,
@@ -388,7 +409,7 @@ class TokenManager:
                 return refresh_token
 
         try:
-            response = httpx.post(
+            response = _get_client().post(
                 self.token_endpoint,
                 data={
                     "grant_type": "client_credentials",
@@ -566,7 +587,7 @@ class TokenManager:
                 raise TimeoutError(err_msg)
 
             logger.debug("Requesting access token")
-            token_response = httpx.post(
+            token_response = _get_client().post(
                 self.token_endpoint,
                 data={
                     "grant_type": "authorization_code",
@@ -618,7 +639,7 @@ class TokenManager:
             return None
 
         try:
-            response = httpx.post(
+            response = _get_client().post(
                 self.token_endpoint,
                 data={
                     "grant_type": "refresh_token",
@@ -673,7 +694,7 @@ class TokenManager:
             err_msg = "Missing authorization code"
             raise ValueError(err_msg)
 
-        response = httpx.post(
+        response = _get_client().post(
             self.token_endpoint,
             data={
                 "grant_type": "authorization_code",
@@ -711,7 +732,7 @@ def discover_oidc_endpoints(issuer_url: str) -> JsonDict:
     """
     try:
         discovery_url = issuer_url.rstrip("/")
-        response = httpx.get(discovery_url, timeout=10)
+        response = _get_client().get(discovery_url, timeout=10)
         _ = response.raise_for_status()
         oidc_config: JsonDict = t.cast(JsonDict, response.json())
     except httpx.HTTPStatusError as e:
@@ -2,10 +2,15 @@
 
 from __future__ import annotations
 
+import io
 import logging
+import time
 import typing as t
 
+from types import TracebackType
+
 from httpx import ReadTimeout
+from rich.console import Console
 from rich.text import Text
 from typing_extensions import Self
 
@@ -15,6 +20,7 @@ from matrixctl.errors import ParserError
 from matrixctl.handlers.yaml import YAML
 from matrixctl.print_helpers import render_image_from_mxc
 from matrixctl.sanitizers import EventType
+from matrixctl.terminal import ImageWriter
 
 
 __author__: str = "Michael Sasser"
@@ -25,31 +31,49 @@ logger = logging.getLogger(__name__)
 
 EventContent: t.TypeAlias = dict[str, t.Any]
 Event: t.TypeAlias = dict[str, t.Any | EventContent]
+PostBuf: t.TypeAlias = bytes | ImageWriter
+
+ROW_WRITER_FLUSH_BYTES: int = 64 * 1024
+ROW_WRITER_FLUSH_INTERVAL: float = 0.5  # seconds
 
 
 class Ctx:
-    """A container that keeps track of the text and post_buf."""
+    """A container that keeps track of the text and post_buf.
+
+    The ``post_buf`` is a list of byte strings and writers, which are
+    written to the terminal after the text. A writer (e.g. an image)
+    encodes its output, while it is written (see ``write_post_buf()``), so
+    it is never copied into one large buffer.
+    """
 
     def __init__(
-        self, text: None | Text = None, post_buf: None | bytes = None
+        self, text: None | Text = None, post_buf: None | PostBuf = None
     ) -> None:
         self.text: Text = text or Text()
-        self.post_buf: bytes = post_buf or b""
+        self.post_buf: list[PostBuf] = [] if post_buf is None else [post_buf]
 
     def append(
-        self, text: None | Text = None, post_buf: None | bytes = None
+        self, text: None | Text = None, post_buf: None | PostBuf = None
     ) -> None:
         """Append text or post_buf to the context."""
         if text is not None:
             self.text += text
         if post_buf is not None:
-            self.post_buf += post_buf
+            self.post_buf.append(post_buf)
+
+    def write_post_buf(self, out: t.BinaryIO) -> None:
+        """Write the post_buf to a stream, e.g. ``sys.stdout.buffer``."""
+        for item in self.post_buf:
+            if isinstance(item, bytes):
+                out.write(item)
+            else:
+                item(out)
 
     def __add__(self, cls: Ctx) -> Ctx:
         """Merge two contexts together, creating a new one."""
-        return Ctx(
-            text=self.text + cls.text, post_buf=self.post_buf + cls.post_buf
-        )
+        ctx: Ctx = Ctx(text=self.text + cls.text)
+        ctx.post_buf = self.post_buf + cls.post_buf
+        return ctx
 
     def __iadd__(self, cls: Ctx) -> Self:
         """Merge two contexts together, modifying the current one."""
@@ -58,6 +82,171 @@ class Ctx:
         return self
 
 
+class RowWriter:
+    """Write rows to a stream in batches.
+
+    One console renders all rows into a text buffer. The rendered rows are
+    collected and written, when ``flush_bytes`` are collected or
+    ``flush_interval`` seconds have passed since the last write. Images are
+    streamed directly to the output, after the rows before them are
+    written.
+
+    When the output is a terminal, every row is written immediately, so an
+    interactive user sees each row as soon as it is available.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       with RowWriter(sys.stdout.buffer) as writer:
+           for ev in events:
+               writer.write(Text(...), to_row_context(ev, yaml))
+
+    Parameters
+    ----------
+    out : typing.BinaryIO
+        The stream to write to, e.g. ``sys.stdout.buffer``.
+    flush_bytes : int, default: ROW_WRITER_FLUSH_BYTES
+        The size of the batches in bytes.
+    flush_interval : float, default: ROW_WRITER_FLUSH_INTERVAL
+        The maximum time in seconds, rows are held back.
+    line_buffered : bool, optional
+        ``True``, if every row should be written immediately. By default,
+        it is ``True``, if the output is a terminal.
+
+    """
+
+    __slots__ = (
+        "_buf",
+        "_last_flush",
+        "_text",
+        "console",
+        "flush_bytes",
+        "flush_interval",
+        "line_buffered",
+        "out",
+    )
+
+    def __init__(
+        self,
+        out: t.BinaryIO,
+        *,
+        flush_bytes: int = ROW_WRITER_FLUSH_BYTES,
+        flush_interval: float = ROW_WRITER_FLUSH_INTERVAL,
+        line_buffered: bool | None = None,
+    ) -> None:
+        self.out: t.BinaryIO = out
+        self.flush_bytes: int = flush_bytes
+        self.flush_interval: float = flush_interval
+        self.line_buffered: bool = (
+            out.isatty() if line_buffered is None else line_buffered
+        )
+        self._buf: bytearray = bytearray()
+        self._text: io.StringIO = io.StringIO()
+        self._last_flush: float = time.monotonic()
+
+        # Detect the capabilities of the real output once, but render into
+        # the text buffer.
+        terminal: Console = Console()
+        self.console: Console = Console(
+            file=self._text,
+            force_terminal=terminal.is_terminal,
+            color_system=terminal.color_system,  # type: ignore[arg-type]
+            width=terminal.width,
+            soft_wrap=True,
+        )
+
+    def __enter__(self) -> Self:
+        """Use the writer as context manager.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        writer : matrixctl.handlers.rows.RowWriter
+            The writer itself.
+
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Write the remaining rows.
+
+        Parameters
+        ----------
+        exc_type : type of BaseException, optional
+            The type of the exception.
+        exc_value : BaseException, optional
+            The exception.
+        traceback : types.TracebackType, optional
+            The traceback.
+
+        Returns
+        -------
+        None
+
+        """
+        self.flush()
+
+    def write(self, text: Text, ctx: Ctx | None = None) -> None:
+        """Write a row followed by an empty line.
+
+        Parameters
+        ----------
+        text : rich.text.Text
+            The row.
+        ctx : matrixctl.handlers.rows.Ctx, optional
+            The context of the row. Its ``post_buf`` is written after the
+            row.
+
+        Returns
+        -------
+        None
+
+        """
+        self.console.print(text)
+        self._buf += self._text.getvalue().encode()
+        self._text.seek(0)
+        self._text.truncate()
+
+        if ctx is not None and ctx.post_buf:
+            self.flush()
+            ctx.write_post_buf(self.out)
+        self._buf += b"\n"
+
+        if (
+            self.line_buffered
+            or len(self._buf) >= self.flush_bytes
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the collected rows to the output.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._buf:
+            self.out.write(self._buf)
+            self._buf.clear()
+        self.out.flush()
+        self._last_flush = time.monotonic()
+
+
 def get_event_type_from_event(ev: Event) -> EventType | str:
     """Get the event type from the event."""
     kind_: t.Any = ev.get("type")
@@ -246,6 +435,8 @@ def _ev_m_room_message_image(ev: Event, yaml: YAML) -> Ctx:
     url = content.get("url")
 
     info = content.get("info")
+    width: int | None = None
+    height: int | None = None
 
     ctx.append(Text("IMAGE ", "bright_black italic"))
     ctx.append(
@@ -356,7 +547,6 @@ def _ev_m_room_member(ev: Event, yaml: YAML) -> Ctx:
             )
         except (
             ReadTimeout,
-            UnboundLocalError,
             InternalResponseError,
             ParserError,
         ) as e:
@@ -376,6 +566,42 @@ def _ev_m_room_member(ev: Event, yaml: YAML) -> Ctx:
     return ctx
 
 
+def image_references(
+    ev: Event,
+) -> list[tuple[t.Any, int | None, int | None]]:
+    """Get the images, which are rendered with the row of an event.
+
+    Use it to prefetch the images of the upcoming rows.
+
+    Parameters
+    ----------
+    ev : matrixctl.handlers.rows.Event
+        The event.
+
+    Returns
+    -------
+    images : list of tuple of any and int or None and int or None
+        The mxc:// URI, width and height of the images as passed to
+        ``render_image_from_mxc()``.
+
+    """
+    try:
+        kind: EventType | str = get_event_type_from_event(ev)
+        content: EventContent = get_event_content_from_event(ev)
+    except NotAnEventError:
+        return []
+
+    if (
+        kind == EventType.M_ROOM_MESSAGE
+        and content.get("msgtype") == "m.image"
+    ):
+        info = content.get("info") or {}
+        return [(content.get("url"), info.get("w"), info.get("h"))]
+    if kind == EventType.M_ROOM_MEMBER and content.get("avatar_url"):
+        return [(content.get("avatar_url"), 100, 100)]
+    return []
+
+
 def to_row_context(ev: dict[str, t.Any], yaml: YAML) -> Ctx:
     """Create an event context from a message type and it's content."""
     ctx: Ctx
@@ -46,8 +46,13 @@ from matrixctl.structures import ConfigServerAliasRoom
 from matrixctl.structures import ConfigServerAPI
 from matrixctl.structures import ConfigServerAPIAuthOidc
 from matrixctl.structures import ConfigServerAPIAuthToken
+from matrixctl.structures import ConfigServerAPIConnectionPool
+from matrixctl.structures import ConfigServerAPIMedia
+from matrixctl.structures import ConfigServerAPIResponseCache
+from matrixctl.structures import ConfigServerDatabase
 from matrixctl.structures import ConfigUi
 from matrixctl.structures import ConfigUiImage
+from matrixctl.structures import ConfigUiImageCache
 from matrixctl.typehints import JsonDict
 
 
@@ -363,6 +368,116 @@ class YAML:
                 )
             )
 
+        # Create api.connection_pool if it does not exist
+        try:
+            config["servers"][server]["api"]["connection_pool"]
+        except KeyError:
+            config["servers"][server]["api"]["connection_pool"] = t.cast(
+                ConfigServerAPIConnectionPool, {}
+            )
+
+        # Create defaults for the connection pool
+        try:
+            config["servers"][server]["api"]["connection_pool"][
+                "max_connections"
+            ]
+        except KeyError:
+            config["servers"][server]["api"]["connection_pool"][
+                "max_connections"
+            ] = 10
+
+        try:
+            config["servers"][server]["api"]["connection_pool"][
+                "max_keepalive_connections"
+            ]
+        except KeyError:
+            config["servers"][server]["api"]["connection_pool"][
+                "max_keepalive_connections"
+            ] = 10
+
+        try:
+            config["servers"][server]["api"]["connection_pool"][
+                "keepalive_expiry"
+            ]
+        except KeyError:
+            config["servers"][server]["api"]["connection_pool"][
+                "keepalive_expiry"
+            ] = 30.0
+
+        # Create api.response_cache if it does not exist
+        try:
+            config["servers"][server]["api"]["response_cache"]
+        except KeyError:
+            config["servers"][server]["api"]["response_cache"] = t.cast(
+                ConfigServerAPIResponseCache, {}
+            )
+
+        # Create defaults for the response cache
+        try:
+            config["servers"][server]["api"]["response_cache"]["enabled"]
+        except KeyError:
+            config["servers"][server]["api"]["response_cache"]["enabled"] = (
+                False
+            )
+
+        try:
+            config["servers"][server]["api"]["response_cache"]["ttl"]
+        except KeyError:
+            config["servers"][server]["api"]["response_cache"]["ttl"] = 300.0
+
+        try:
+            config["servers"][server]["api"]["response_cache"]["max_bytes"]
+        except KeyError:
+            config["servers"][server]["api"]["response_cache"]["max_bytes"] = (
+                64 * 1024 * 1024
+            )
+
+        # Create api.media if it does not exist
+        try:
+            config["servers"][server]["api"]["media"]
+        except KeyError:
+            config["servers"][server]["api"]["media"] = t.cast(
+                ConfigServerAPIMedia, {}
+            )
+
+        # Create defaults for media downloads
+        try:
+            config["servers"][server]["api"]["media"]["spool_threshold"]
+        except KeyError:
+            config["servers"][server]["api"]["media"]["spool_threshold"] = (
+                8 * 1024 * 1024
+            )
+
+        try:
+            config["servers"][server]["api"]["media"]["max_size"]
+        except KeyError:
+            config["servers"][server]["api"]["media"]["max_size"] = 0
+
+        # Create database if it does not exist
+        try:
+            config["servers"][server]["database"]
+        except KeyError:
+            config["servers"][server]["database"] = t.cast(
+                ConfigServerDatabase, {}
+            )
+
+        # Create default for the rows fetched per round trip
+        try:
+            config["servers"][server]["database"]["itersize"]
+        except KeyError:
+            config["servers"][server]["database"]["itersize"] = 2000
+
+        # Create defaults for the connection pool
+        try:
+            config["servers"][server]["database"]["pool_size"]
+        except KeyError:
+            config["servers"][server]["database"]["pool_size"] = 4
+
+        try:
+            config["servers"][server]["database"]["health_check_after"]
+        except KeyError:
+            config["servers"][server]["database"]["health_check_after"] = 30.0
+
         try:
             config["servers"][server]["alias"]
         except KeyError:
@@ -408,6 +523,50 @@ class YAML:
         except KeyError:
             config["ui"]["image"]["enabled"] = False
 
+        try:
+            config["ui"]["image"]["max_size"]
+        except KeyError:
+            config["ui"]["image"]["max_size"] = 16 * 1024 * 1024
+
+        try:
+            config["ui"]["image"]["cache"]
+        except KeyError:
+            config["ui"]["image"]["cache"] = t.cast(ConfigUiImageCache, {})
+
+        try:
+            config["ui"]["image"]["cache"]["memory_max_bytes"]
+        except KeyError:
+            config["ui"]["image"]["cache"]["memory_max_bytes"] = (
+                32 * 1024 * 1024
+            )
+
+        try:
+            config["ui"]["image"]["cache"]["memory_max_entries"]
+        except KeyError:
+            config["ui"]["image"]["cache"]["memory_max_entries"] = 1024
+
+        try:
+            config["ui"]["image"]["cache"]["disk_max_bytes"]
+        except KeyError:
+            config["ui"]["image"]["cache"]["disk_max_bytes"] = (
+                256 * 1024 * 1024
+            )
+
+        try:
+            config["ui"]["image"]["prefetch"]
+        except KeyError:
+            config["ui"]["image"]["prefetch"] = 16
+
+        try:
+            config["ui"]["image"]["protocol"]
+        except KeyError:
+            config["ui"]["image"]["protocol"] = "auto"
+
+        try:
+            config["ui"]["image"]["persist_cell_size"]
+        except KeyError:
+            config["ui"]["image"]["persist_cell_size"] = True
+
         return config
 
     def get_server_config(
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import logging
+import re
 import typing as t
 
 from matrixctl.errors import ParserError
@@ -21,6 +22,13 @@ ERR_MSG_INVALID_MXC_URI = (
     "The URI given was: "
 )
 
+# https://spec.matrix.org/latest/appendices/#server-name
+SERVER_NAME_PATTERN: re.Pattern[str] = re.compile(
+    r"(?:[A-Za-z0-9.-]+|\[[0-9A-Fa-f:.]+\])(?::[0-9]{1,5})?"
+)
+# https://spec.matrix.org/latest/client-server-api/#matrix-content-mxc-uris
+MEDIA_ID_PATTERN: re.Pattern[str] = re.compile(r"[A-Za-z0-9_-]+")
+
 
 class Mxc(t.NamedTuple):
     """Use this named tuple to store the server and media id of a mxc uri."""
@@ -45,7 +53,8 @@ def parse_mxc_uri(uri: str) -> Mxc:
     Raises
     ------
     matrix.errors.ParserError
-        If the `uri` cannot be split.
+        If the `uri` cannot be split or the homeserver or media ID contain
+        invalid characters.
 
     """
     try:
@@ -74,4 +83,19 @@ def parse_mxc_uri(uri: str) -> Mxc:
 
     homeserver, media_id = mxc_parts
 
+    # Both parts are used as path components, e.g. by bulk-download
+    if (
+        SERVER_NAME_PATTERN.fullmatch(homeserver) is None
+        or homeserver.strip(".") == ""
+        or MEDIA_ID_PATTERN.fullmatch(media_id) is None
+    ):
+        err_msg = (
+            f"{ERR_MSG_INVALID_MXC_URI} {uri}. "
+            "Please make sure the homeserver is a valid server name and the "
+            "media ID only contains the characters A-Z, a-z, 0-9, '_' and "
+            "'-'."
+        )
+        logger.error(err_msg)
+        raise ParserError(err_msg)
+
     return Mxc(homeserver=homeserver, media_id=media_id)
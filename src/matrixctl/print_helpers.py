@@ -2,22 +2,40 @@
 
 from __future__ import annotations
 
+import json
 import logging
+import math
 import os
 import shutil
+import textwrap
 import typing as t
 
+from collections.abc import Iterable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timezone
-from functools import lru_cache
+from functools import partial
+from types import TracebackType
 
+from typing_extensions import Self
+
+from matrixctl.errors import InternalResponseError
+from matrixctl.errors import MediaTooLargeError
 from matrixctl.errors import ParserError
 from matrixctl.handlers.api import download_media_to_buf
+from matrixctl.handlers.api import download_thumbnail_to_buf
+from matrixctl.handlers.media import MediaBuffer
+from matrixctl.handlers.media_cache import MediaCache
+from matrixctl.handlers.media_cache import media_cache
 from matrixctl.handlers.yaml import YAML
 from matrixctl.sanitizers import sanitize_mxc
+from matrixctl.terminal import ImageProtocol
+from matrixctl.terminal import ImageWriter
 from matrixctl.terminal import TerminalCellSizePx
 from matrixctl.terminal import get_terminal_cell_size_in_px
-from matrixctl.terminal import imgcat
+from matrixctl.terminal import kitty_graphics
+from matrixctl.terminal import write_imgcat
 
 
 __author__: str = "Michael Sasser"
@@ -26,6 +44,8 @@ __email__: str = "Michael@MichaelSasser.org"
 
 logger = logging.getLogger(__name__)
 
+PREFETCH_WORKERS: int = 4
+
 
 # TODO: Check if used and for what; type?; docs.
 def human_readable_bool(b: t.Any) -> str:
@@ -75,11 +95,151 @@ def timestamp_to_dt(ts: str, sep: str = " ") -> str:
     )
 
 
-@lru_cache(128)
+def print_json_array(items: Iterable[t.Any], indent: int = 4) -> None:
+    """Print an iterable as JSON array, while it is being consumed.
+
+    The output is the same as ``print(json.dumps(list(items), indent=4))``,
+    but the items are printed as soon as they are available and don't need
+    to be collected in a list first.
+
+    Parameters
+    ----------
+    items : Iterable of any
+        The JSON serializable items.
+    indent : int, default=4
+        The indentation of the JSON output.
+
+    Returns
+    -------
+    None
+
+    """
+    prefix: str = " " * indent
+    empty: bool = True
+    for item in items:
+        print(
+            "[\n" if empty else ",\n",
+            textwrap.indent(json.dumps(item, indent=indent), prefix),
+            sep="",
+            end="",
+        )
+        empty = False
+    print("[]" if empty else "\n]")
+
+
+class ImageSizePx(t.NamedTuple):
+    """A named tuple to store the size of an image in pixels.
+
+    Attributes
+    ----------
+    width : int
+        The width of the image in pixels.
+    height : int
+        The height of the image in pixels.
+
+    """
+
+    width: int
+    height: int
+
+
+def get_image_size_in_px(
+    width: int | None,
+    height: int | None,
+    yaml: YAML,
+) -> ImageSizePx | None:
+    """Get the size in pixels, an image is rendered with in the terminal.
+
+    The size of the image is multiplied by ``ui.image.scale_factor`` and then
+    scaled down (preserving the aspect ratio) to fit into the width of the
+    terminal and ``ui.image.max_height_of_terminal`` of its height. When the
+    size of the image is unknown, the size of that box is returned.
+
+    Parameters
+    ----------
+    width : int, optional
+        The width of the image in pixels, e.g. from the ``info`` of the event.
+    height : int, optional
+        The height of the image in pixels, e.g. from the ``info`` of the
+        event.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    size : matrixctl.print_helpers.ImageSizePx or None
+        The size in pixels or ``None``, if neither the size of the image nor
+        the size of the terminal cells is known.
+
+    """
+    user_scale_factor: float = yaml.get("ui", "image", "scale_factor")
+    known: bool = bool(width and height)
+    user_width: float = (width or 0) * user_scale_factor
+    user_height: float = (height or 0) * user_scale_factor
+
+    terminal_cell_size: TerminalCellSizePx | None = (
+        get_terminal_cell_size_in_px()
+    )
+    if terminal_cell_size is None:
+        if not known:
+            return None
+        return ImageSizePx(int(user_width), int(user_height))
+
+    terminal_size: os.terminal_size = shutil.get_terminal_size((80, 20))
+    # Number of columns/lines times their width/height in px
+    max_width: float = terminal_size.columns * terminal_cell_size.width
+    max_height: float = (
+        terminal_size.lines
+        * terminal_cell_size.height
+        * yaml.get("ui", "image", "max_height_of_terminal")
+    )
+    if not known:
+        return ImageSizePx(int(max_width), int(max_height))
+
+    scale_factor: float = max(
+        1.0,
+        user_height / max_height,  # Scale down height
+        user_width / max_width,  # Scale down width
+    )
+    logger.debug("Scale factor. scale_factor=%f", scale_factor)
+    return ImageSizePx(
+        max(1, int(user_width / scale_factor)),
+        max(1, int(user_height / scale_factor)),
+    )
+
+
 def render_image_from_mxc(
-    uri: t.Any | None, width: int, height: int, yaml: YAML
-) -> bytes | None:
-    """Render an image from a mxc:// URI in the terminal."""
+    uri: t.Any | None,
+    width: int | None,
+    height: int | None,
+    yaml: YAML,
+) -> ImageWriter | None:
+    """Render an image from a mxc:// URI in the terminal.
+
+    A thumbnail in the size the image is rendered with is requested from the
+    homeserver. If the homeserver is unable to create one (e.g. for animated
+    images on some servers), the original image is downloaded instead.
+
+    Parameters
+    ----------
+    uri : any, optional
+        The mxc:// URI of the image.
+    width : int, optional
+        The width of the image in pixels, e.g. from the ``info`` of the event.
+    height : int, optional
+        The height of the image in pixels, e.g. from the ``info`` of the
+        event.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Returns
+    -------
+    writer : matrixctl.terminal.ImageWriter or None
+        Writes the escape sequence rendering the image to a stream, e.g.
+        ``sys.stdout.buffer``, or ``None``, if images are disabled or the
+        image is too large. The image is encoded, while it is written.
+
+    """
     if not yaml.get("ui", "image", "enabled"):
         return None
     uri_sanitized: str | t.Literal[False] | None = sanitize_mxc(uri)
@@ -87,52 +247,367 @@ def render_image_from_mxc(
         error_msg: str = "The given URI is not a valid mxc:// URI."
         raise ParserError(error_msg)
 
+    pending: PendingImage | None = image_prefetcher.pop(
+        uri_sanitized,
+        width,
+        height,
+    )
+    size: ImageSizePx | None
+    try:
+        if pending is None:
+            size = get_image_size_in_px(width, height, yaml)
+            buf_image: bytes = load_image(uri_sanitized, size, yaml)
+        else:
+            size = pending.size
+            buf_image = pending.future.result()
+    except MediaTooLargeError as err:
+        logger.warning("The image is not rendered. %s", err)
+        return None
+    protocol: ImageProtocol
+    try:
+        protocol = ImageProtocol(yaml.get("ui", "image", "protocol"))
+    except ValueError:
+        logger.warning(
+            'Unknown image protocol "%s" in the config file. Use "auto".',
+            yaml.get("ui", "image", "protocol"),
+        )
+        protocol = ImageProtocol.AUTO
+    if protocol is ImageProtocol.AUTO:
+        protocol = ImageProtocol.detect()
+    if protocol is ImageProtocol.KITTY:
+        return partial(
+            kitty_graphics.write,
+            data=buf_image,
+            rows=get_image_rows(size),
+        )
+    return partial(
+        write_imgcat,
+        data=buf_image,
+        height="auto" if size is None else f"{size.height}px",
+        preserve_aspect_ratio=True,
+    )
+
+
+def get_image_rows(size: ImageSizePx | None) -> int | None:
+    """Get the number of terminal lines an image is rendered with.
+
+    Parameters
+    ----------
+    size : matrixctl.print_helpers.ImageSizePx, optional
+        The size the image is rendered with in pixels.
+
+    Returns
+    -------
+    rows : int or None
+        The number of lines or ``None``, if the size of the image or the
+        terminal cells is unknown.
+
+    """
+    if size is None:
+        return None
     terminal_cell_size: TerminalCellSizePx | None = (
         get_terminal_cell_size_in_px()
     )
+    if terminal_cell_size is None:
+        return None
+    return max(1, math.ceil(size.height / terminal_cell_size.height))
 
-    if terminal_cell_size is not None:
-        terminal_size: os.terminal_size = shutil.get_terminal_size((80, 20))
-        # Number of lines times their height in px
-        terminal_height: int = terminal_size.lines * terminal_cell_size.height
-        terminal_width: int = terminal_size.columns * terminal_cell_size.width
 
-        user_scale_factor: float = yaml.get("ui", "image", "scale_factor")
-        user_image_max_heigt: float = yaml.get(
-            "ui", "image", "max_height_of_terminal"
-        )
+def load_image(uri: str, size: ImageSizePx | None, yaml: YAML) -> bytes:
+    """Get an image from the media cache or download it.
+
+    Parameters
+    ----------
+    uri : str
+        The mxc:// URI of the image.
+    size : matrixctl.print_helpers.ImageSizePx, optional
+        The size of the image in pixels.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Raises
+    ------
+    matrixctl.errors.MediaTooLargeError
+        When the image is larger than the configured maximum size.
+
+    Returns
+    -------
+    buf : bytes
+        The raw image data.
+
+    """
+    key: str = MediaCache.key(
+        uri,
+        None if size is None else size.width,
+        None if size is None else size.height,
+    )
+    buf_image: bytes | None = media_cache.get(key)
+    if buf_image is None:
+        buf_image = download_image(uri, size, yaml)
+        media_cache.put(key, buf_image)
+    return buf_image
 
-        image_max_height: float = 1.0 / user_image_max_heigt
 
-        user_height: float = height * user_scale_factor
-        user_width: float = width * user_scale_factor
+def download_image(
+    uri: str,
+    size: ImageSizePx | None,
+    yaml: YAML,
+) -> bytes:
+    """Download a thumbnail of an image or, if there is none, the image.
 
-        scale_factor_height: float = 1.0
-        scale_factor_width: float = 1.0
-        if (user_height) > (terminal_height / image_max_height):
-            # Scale down height
-            scale_factor_height = user_height / (
-                terminal_height / image_max_height
+    Parameters
+    ----------
+    uri : str
+        The mxc:// URI of the image.
+    size : matrixctl.print_helpers.ImageSizePx, optional
+        The size of the thumbnail in pixels. If it is ``None``, the original
+        image is downloaded.
+    yaml : matrixctl.handlers.yaml.YAML
+        The configuration file handler.
+
+    Raises
+    ------
+    matrixctl.errors.MediaTooLargeError
+        When the image is larger than the configured maximum size.
+
+    Returns
+    -------
+    buf : bytes
+        The raw image data.
+
+    """
+    # The image limit applies in addition to the limit for all media
+    max_size: int | None = min(
+        (
+            limit
+            for limit in (
+                yaml.get("ui", "image", "max_size"),
+                yaml.get("server", "api", "media", "max_size"),
             )
-        if (user_width) > terminal_width:
-            # Scale down width
-            scale_factor_width = user_width / terminal_width
-        scale_factor: float = max(scale_factor_height, scale_factor_width)
-        logger.debug("Scale factor. scale_factor=%f", scale_factor)
-
-        scaled_height: int = int(user_height / scale_factor)
-
-    # Test: This should later follow the entry
-    buf_image = download_media_to_buf(
-        token=yaml.get_api_token(),
-        domain=yaml.get("server", "api", "domain"),
-        media_id=uri_sanitized,
+            if limit
+        ),
+        default=None,
     )
-    return imgcat(
-        buf_image,
-        height=f"{scaled_height}px",
-        preserve_aspect_ratio=True,
+    # Images are rendered from memory. Spooling an image, which is bounded
+    # by its maximum size, to a temporary file would only add a round trip
+    # through the disk.
+    spool_threshold: int = max_size or yaml.get(
+        "server", "api", "media", "spool_threshold"
     )
 
+    buf: MediaBuffer | None = None
+    if size is not None:
+        try:
+            buf = download_thumbnail_to_buf(
+                token=yaml.get_api_token(),
+                domain=yaml.get("server", "api", "domain"),
+                media_id=uri,
+                width=size.width,
+                height=size.height,
+                spool_threshold=spool_threshold,
+                max_size=max_size,
+            )
+        except InternalResponseError:
+            logger.debug(
+                "No thumbnail available, download the image. uri='%s'", uri
+            )
+
+    if buf is None:
+        buf = download_media_to_buf(
+            token=yaml.get_api_token(),
+            domain=yaml.get("server", "api", "domain"),
+            media_id=uri,
+            spool_threshold=spool_threshold,
+            max_size=max_size,
+        )
+    with buf:
+        return buf.getvalue()
+
+
+class PendingImage(t.NamedTuple):
+    """An image, which is downloaded in the background.
+
+    Attributes
+    ----------
+    size : matrixctl.print_helpers.ImageSizePx, optional
+        The size the image is rendered with.
+    future : concurrent.futures.Future of bytes
+        The future of ``load_image()``.
+
+    """
+
+    size: ImageSizePx | None
+    future: Future[bytes]
+
+
+class ImagePrefetcher:
+    """Download images on a thread pool, before they are rendered.
+
+    Submit the images of the upcoming rows, while the current row is
+    rendered. ``render_image_from_mxc()`` takes the pending download of an
+    image from the prefetcher, instead of downloading it again. Errors of a
+    download are raised, when the image is rendered.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       with image_prefetcher:
+           for uri, width, height in next_images:
+               image_prefetcher.submit(uri, width, height, yaml)
+           ...
+           render_image_from_mxc(uri, width, height, yaml)
+
+    Parameters
+    ----------
+    max_workers : int, default: PREFETCH_WORKERS
+        The maximum number of concurrent downloads.
+
+    """
+
+    __slots__ = ("_executor", "_pending", "max_workers")
+
+    def __init__(self, max_workers: int = PREFETCH_WORKERS) -> None:
+        self.max_workers: int = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: dict[
+            tuple[str, int | None, int | None],
+            PendingImage,
+        ] = {}
+
+    def __enter__(self) -> Self:
+        """Use the prefetcher as context manager.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        prefetcher : matrixctl.print_helpers.ImagePrefetcher
+            The prefetcher itself.
+
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Cancel the pending downloads.
+
+        Parameters
+        ----------
+        exc_type : type of BaseException, optional
+            The type of the exception.
+        exc_value : BaseException, optional
+            The exception.
+        traceback : types.TracebackType, optional
+            The traceback.
+
+        Returns
+        -------
+        None
+
+        """
+        self.close()
+
+    def submit(
+        self,
+        uri: t.Any | None,
+        width: int | None,
+        height: int | None,
+        yaml: YAML,
+    ) -> None:
+        """Start downloading an image in the background.
+
+        Invalid URIs are ignored here. They are reported, when the image is
+        rendered.
+
+        Parameters
+        ----------
+        uri : any, optional
+            The mxc:// URI of the image.
+        width : int, optional
+            The width of the image in pixels.
+        height : int, optional
+            The height of the image in pixels.
+        yaml : matrixctl.handlers.yaml.YAML
+            The configuration file handler.
+
+        Returns
+        -------
+        None
+
+        """
+        uri_sanitized: str | t.Literal[False] | None = sanitize_mxc(uri)
+        if not uri_sanitized:
+            return
+        pending_key: tuple[str, int | None, int | None] = (
+            uri_sanitized,
+            width,
+            height,
+        )
+        if pending_key in self._pending:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="matrixctl-prefetch",
+            )
+        # The terminal is probed for the size in the main thread
+        size: ImageSizePx | None = get_image_size_in_px(width, height, yaml)
+        self._pending[pending_key] = PendingImage(
+            size,
+            self._executor.submit(load_image, uri_sanitized, size, yaml),
+        )
+
+    def pop(
+        self,
+        uri: str,
+        width: int | None,
+        height: int | None,
+    ) -> PendingImage | None:
+        """Take the pending download of an image.
+
+        Parameters
+        ----------
+        uri : str
+            The sanitized mxc:// URI of the image.
+        width : int, optional
+            The width of the image in pixels.
+        height : int, optional
+            The height of the image in pixels.
+
+        Returns
+        -------
+        pending : matrixctl.print_helpers.PendingImage or None
+            The pending download or ``None``, if the image was not submitted.
+
+        """
+        return self._pending.pop((uri, width, height), None)
+
+    def close(self) -> None:
+        """Cancel the pending downloads and stop the threads.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_prefetcher: ImagePrefetcher = ImagePrefetcher()
+
 
 # vim: set ft=python :
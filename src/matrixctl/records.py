@@ -0,0 +1,176 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Use this module to decode list payloads of the admin API into records.
+
+A record is a ``NamedTuple``, which has no per-instance ``__dict__``. The
+field names are the keys of the JSON objects returned by the admin API. Keys
+missing in the payload (e.g. on older versions of synapse) are decoded as
+``None`` and unknown keys are dropped.
+
+Examples
+--------
+.. code-block:: python
+
+   users = map(UserRecord.from_json, paginate(req, "users"))
+
+"""
+
+from __future__ import annotations
+
+import typing as t
+
+from matrixctl.typehints import JsonDict
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+class UserRecord(t.NamedTuple):
+    """A user of ``/_synapse/admin/v2/users``."""
+
+    name: str
+    displayname: str | None
+    admin: bool
+    deactivated: bool
+    shadow_banned: bool
+    is_guest: bool
+    user_type: str | None
+    avatar_url: str | None
+    creation_ts: int | None
+    last_seen_ts: int | None
+    locked: bool | None
+    erased: bool | None
+
+    @classmethod
+    def from_json(cls, obj: JsonDict) -> UserRecord:
+        """Decode a user.
+
+        Parameters
+        ----------
+        obj : matrixctl.typehints.JsonDict
+            The user as returned by the API.
+
+        Returns
+        -------
+        record : matrixctl.records.UserRecord
+            The decoded user.
+
+        """
+        return tuple.__new__(cls, map(obj.get, cls._fields))
+
+
+class RoomRecord(t.NamedTuple):
+    """A room of ``/_synapse/admin/v1/rooms``."""
+
+    room_id: str
+    name: str | None
+    canonical_alias: str | None
+    joined_members: int
+    joined_local_members: int
+    version: str | None
+    creator: str | None
+    encryption: str | None
+    federatable: bool | None
+    public: bool | None
+    join_rules: str | None
+    guest_access: str | None
+    history_visibility: str | None
+    state_events: int | None
+    room_type: str | None
+
+    @classmethod
+    def from_json(cls, obj: JsonDict) -> RoomRecord:
+        """Decode a room.
+
+        Parameters
+        ----------
+        obj : matrixctl.typehints.JsonDict
+            The room as returned by the API.
+
+        Returns
+        -------
+        record : matrixctl.records.RoomRecord
+            The decoded room.
+
+        """
+        return tuple.__new__(cls, map(obj.get, cls._fields))
+
+
+class EventReportRecord(t.NamedTuple):
+    """An event report of ``/_synapse/admin/v1/event_reports``."""
+
+    id: int
+    received_ts: int
+    room_id: str
+    name: str | None
+    canonical_alias: str | None
+    event_id: str
+    user_id: str
+    sender: str
+    reason: str | None
+    score: int | None
+
+    @classmethod
+    def from_json(cls, obj: JsonDict) -> EventReportRecord:
+        """Decode an event report.
+
+        Parameters
+        ----------
+        obj : matrixctl.typehints.JsonDict
+            The event report as returned by the API.
+
+        Returns
+        -------
+        record : matrixctl.records.EventReportRecord
+            The decoded event report.
+
+        """
+        return tuple.__new__(cls, map(obj.get, cls._fields))
+
+
+class MediaRecord(t.NamedTuple):
+    """A media of ``/_synapse/admin/v1/users/<user_id>/media``."""
+
+    media_id: str
+    media_type: str | None
+    media_length: int | None
+    upload_name: str | None
+    created_ts: int | None
+    last_access_ts: int | None
+    quarantined_by: str | None
+    safe_from_quarantine: bool | None
+
+    @classmethod
+    def from_json(cls, obj: JsonDict) -> MediaRecord:
+        """Decode a media.
+
+        Parameters
+        ----------
+        obj : matrixctl.typehints.JsonDict
+            The media as returned by the API.
+
+        Returns
+        -------
+        record : matrixctl.records.MediaRecord
+            The decoded media.
+
+        """
+        return tuple.__new__(cls, map(obj.get, cls._fields))
+
+
+# vim: set ft=python :
@@ -38,6 +38,7 @@ class ConfigServer(t.TypedDict):
     synapse: ConfigServerSynapse
     api: ConfigServerAPI
     ssh: ConfigServerSSH
+    database: ConfigServerDatabase
     maintenance: ConfigServerMaintenance
     alias: ConfigServerAlias
 
@@ -75,6 +76,9 @@ class ConfigServerAPI(t.TypedDict):
     auth_token: ConfigServerAPIAuthToken
     auth_oidc: ConfigServerAPIAuthOidc
     concurrent_limit: int
+    connection_pool: ConfigServerAPIConnectionPool
+    response_cache: ConfigServerAPIResponseCache
+    media: ConfigServerAPIMedia
 
 
 class ConfigServerAPIAuthToken(t.TypedDict):
@@ -101,6 +105,29 @@ class ConfigServerAPIAuthOidc(t.TypedDict):
     payload: JsonDict
 
 
+class ConfigServerAPIConnectionPool(t.TypedDict):
+    """Add `connection_pool` to `server.api` in the YAML config structure."""
+
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float  # seconds
+
+
+class ConfigServerAPIResponseCache(t.TypedDict):
+    """Add `response_cache` to `server.api` in the YAML config structure."""
+
+    enabled: bool
+    ttl: float  # seconds
+    max_bytes: int
+
+
+class ConfigServerAPIMedia(t.TypedDict):
+    """Add `media` to `server.api` in the YAML config structure."""
+
+    spool_threshold: int  # bytes
+    max_size: int  # bytes, 0 = unlimited
+
+
 class ConfigServerSSH(t.TypedDict):
     """Add `ssh` to `server` in the YAML config structure."""
 
@@ -109,6 +136,19 @@ class ConfigServerSSH(t.TypedDict):
     user: str
 
 
+class ConfigServerDatabase(t.TypedDict):
+    """Add `database` to `server` in the YAML config structure."""
+
+    synapse_database: str
+    synapse_user: str
+    synapse_password: str
+    tunnel: bool
+    port: int
+    itersize: int  # rows
+    pool_size: int  # idle connections
+    health_check_after: float  # seconds
+
+
 class ConfigServerMaintenance(t.TypedDict):
     """Add `maintenance` to `server` in the YAML config structure."""
 
@@ -127,6 +167,19 @@ class ConfigUiImage(t.TypedDict):
     enabled: bool
     scale_factor: float  # Must be > 0.0
     max_height_of_terminal: float  # Must be > 0.0 and <= 1.0
+    max_size: int  # bytes, 0 = unlimited
+    cache: ConfigUiImageCache
+    prefetch: int  # rows, 0 = disabled
+    protocol: str  # "auto", "iterm2" or "kitty"
+    persist_cell_size: bool
+
+
+class ConfigUiImageCache(t.TypedDict):
+    """Add `cache` to `ui.image` in the YAML config structure."""
+
+    memory_max_bytes: int  # 0 = disabled
+    memory_max_entries: int  # 0 = disabled
+    disk_max_bytes: int  # 0 = disabled
 
 
 # vim: set ft=python :
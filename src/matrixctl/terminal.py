@@ -2,14 +2,31 @@
 
 from __future__ import annotations
 
+import fcntl
+import hashlib
+import io
+import json
 import logging
 import os
+import random
+import signal
+import struct
 import sys
 import termios
+import threading
 import tty
 import typing as t
 
 from base64 import b64encode
+from collections.abc import Callable
+from collections.abc import Generator
+from contextlib import suppress
+from enum import Enum
+from enum import unique
+from pathlib import Path
+from types import FrameType
+
+from xdg_base_dirs import xdg_cache_home
 
 
 __author__: str = "Michael Sasser"
@@ -23,6 +40,49 @@ BIN_ESC: bytes = b"\033"
 BIN_NL: bytes = b"\n"
 BIN_BEL: bytes = b"\a"
 
+PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+# Shown by the kitty backend instead of images, which are no PNG images
+KITTY_PLACEHOLDER: bytes = (
+    b"[Image not shown: kitty can only display PNG images inline]"
+)
+KITTY_CHUNK_SIZE: int = 4096  # Maximum size of the base64 payload of a chunk
+# A multiple of 3 bytes, so every chunk is encoded without padding
+B64_CHUNK_SIZE: int = 48 * 1024
+
+# Writes an escape sequence to a binary stream, e.g. ``sys.stdout.buffer``
+ImageWriter: t.TypeAlias = Callable[[t.BinaryIO], None]
+
+
+@unique
+class ImageProtocol(Enum):
+    """Use this enum to select the protocol to render images with."""
+
+    AUTO = "auto"  # Detect the protocol from the environment
+    ITERM2 = "iterm2"  # The inline images protocol (OSC 1337)
+    KITTY = "kitty"  # The kitty graphics protocol (APC G)
+
+    @classmethod
+    def detect(cls) -> ImageProtocol:
+        """Detect the protocol supported by the terminal.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        protocol : matrixctl.terminal.ImageProtocol
+            ``ImageProtocol.KITTY``, if the terminal is kitty, otherwise
+            ``ImageProtocol.ITERM2``.
+
+        """
+        if (
+            os.environ.get("TERM") == "xterm-kitty"
+            or "KITTY_WINDOW_ID" in os.environ
+        ):
+            return cls.KITTY
+        return cls.ITERM2
+
 
 class TerminalCellSizePx(t.NamedTuple):
     """A named tuple to store the terminal cell size in pixels.
@@ -97,6 +157,92 @@ def _generate_st(*, term_is_tmux: bool = False) -> bytes:
     return buf
 
 
+def iter_b64encode(
+    data: bytes,
+    chunk_size: int = B64_CHUNK_SIZE,
+) -> Generator[bytes, None, None]:
+    """Encode data with base64 chunk by chunk.
+
+    Joined, the chunks are the same as ``b64encode(data)``, but only one
+    chunk is in memory at a time.
+
+    Parameters
+    ----------
+    data : bytes
+        The data to encode.
+    chunk_size : int, default: B64_CHUNK_SIZE
+        The size of the unencoded chunks in bytes. It must be a multiple of
+        3.
+
+    Yields
+    ------
+    chunk : bytes
+        The next base64 encoded chunk.
+
+    """
+    view: memoryview = memoryview(data)
+    for i in range(0, len(view), chunk_size):
+        yield b64encode(view[i : i + chunk_size])
+
+
+def write_imgcat(  # noqa: PLR0913
+    out: t.BinaryIO,
+    data: bytes,
+    width: int | str = "auto",
+    height: int | str = "auto",
+    *,
+    preserve_aspect_ratio: bool = False,
+    inline: bool = True,
+) -> None:
+    """Write an image to the terminal with the iTerm2 inline images protocol.
+
+    The escape sequence is written while it is encoded, so the encoded image
+    is never held in memory as a whole.
+
+    Parameters
+    ----------
+    out : typing.BinaryIO
+        The stream to write to, e.g. ``sys.stdout.buffer``.
+    data : bytes
+        A buffer containing the raw image data.
+    width : int or str
+        The width (see ``imgcat()``).
+    height : int or str
+        The height (see ``imgcat()``).
+    preserve_aspect_ratio : bool
+        If set to `True`, the image's inherent aspect ratio is respected.
+    inline : bool
+        If set to `True`, the file will be displayed inline.
+
+    Returns
+    -------
+    None
+
+    """
+    term_is_tmux: bool = os.environ["TERM"].startswith("screen")
+
+    out.write(
+        _generate_osc_cs(
+            1337,
+            {
+                "File": "",
+                "size": str(len(data)),
+                "inline": str(int(inline)),
+                "preserveAspectRatio": str(int(preserve_aspect_ratio)),
+                "width": str(width),
+                "height": str(height),
+            },
+            term_is_tmux=term_is_tmux,
+        )
+    )
+
+    out.write(b":")
+    out.writelines(iter_b64encode(data))
+
+    # ST
+    out.write(_generate_st(term_is_tmux=term_is_tmux))
+
+
 def imgcat(
     data: bytes,
     width: int | str = "auto",
@@ -153,6 +299,10 @@ def imgcat(
            stdout.buffer.write(buf)
            stdout.flush()
 
+    See Also
+    --------
+    write_imgcat : Write the escape sequence to a stream, while it is encoded.
+
     Notes
     -----
     The documentation for this function mostly comes from:
@@ -160,32 +310,200 @@ def imgcat(
     - `Terminal Images <https://iterm2.com/documentation-images.html>`_
 
     """
-    term_is_tmux: bool = os.environ["TERM"].startswith("screen")
+    buf: io.BytesIO = io.BytesIO()
+    write_imgcat(
+        t.cast(t.BinaryIO, buf),
+        data,
+        width,
+        height,
+        preserve_aspect_ratio=preserve_aspect_ratio,
+        inline=inline,
+    )
+    return buf.getvalue()
+
+
+def _wrap_tmux(buf: bytes) -> bytes:
+    """Wrap an escape sequence, so tmux passes it through to the terminal.
+
+    Parameters
+    ----------
+    buf : bytes
+        The escape sequence.
+
+    Returns
+    -------
+    bytes : bytes
+        The wrapped escape sequence.
 
-    buf: bytes = _generate_osc_cs(
-        1337,
-        {
-            "File": "",
-            "size": str(len(data)),
-            "inline": str(int(inline)),
-            "preserveAspectRatio": str(int(preserve_aspect_ratio)),
-            "width": str(width),
-            "height": str(height),
-        },
-        term_is_tmux=term_is_tmux,
+    """
+    return (
+        BIN_ESC
+        + b"Ptmux;"
+        + buf.replace(BIN_ESC, BIN_ESC + BIN_ESC)
+        + BIN_ESC
+        + b"\\"
     )
 
-    buf += b":"
-    buf += b64encode(data)
 
-    # ST
-    buf += _generate_st(term_is_tmux=term_is_tmux)
+class KittyGraphics:
+    """Render images with the kitty graphics protocol.
 
-    return buf
+    Every distinct image is transmitted to the terminal once with an ID. The
+    terminal keeps the image, so later occurrences only place it by its ID,
+    which takes a few bytes instead of the whole image.
 
+    Only PNG images can be transmitted (``f=100``), other formats would
+    need to be decoded to raw pixels first. The homeserver creates
+    thumbnails in the format of the original image, so e.g. JPEG images are
+    shown as ``KITTY_PLACEHOLDER``.
 
-def get_terminal_cell_size_in_px() -> TerminalCellSizePx | None:
-    """Get the terminal cell size in pixels.
+    Notes
+    -----
+    The protocol is documented at
+    `Terminal graphics protocol
+    <https://sw.kovidgoyal.net/kitty/graphics-protocol/>`_.
+
+    """
+
+    __slots__ = ("_ids", "_next_id")
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        # Start at a random ID, so the images of an earlier run, which are
+        # still on the screen, are unlikely to be replaced.
+        self._next_id: int = random.randrange(1, 2**31)  # noqa: S311
+
+    @staticmethod
+    def _command(
+        control: dict[str, str | int],
+        payload: bytes = b"",
+        *,
+        term_is_tmux: bool = False,
+    ) -> bytes:
+        buf: bytes = BIN_ESC + b"_G"
+        buf += ",".join(f"{k}={v}" for k, v in control.items()).encode()
+        if payload:
+            buf += b";" + payload
+        buf += BIN_ESC + b"\\"
+        return _wrap_tmux(buf) if term_is_tmux else buf
+
+    def transmit(
+        self,
+        out: t.BinaryIO,
+        data: bytes,
+        image_id: int,
+        *,
+        term_is_tmux: bool = False,
+    ) -> None:
+        """Transmit an image to the terminal without displaying it.
+
+        Parameters
+        ----------
+        out : typing.BinaryIO
+            The stream to write to, e.g. ``sys.stdout.buffer``.
+        data : bytes
+            The PNG image.
+        image_id : int
+            The ID of the image.
+        term_is_tmux : bool, default: False
+            ``True``, if the terminal is tmux, ``False`` if not.
+
+        Returns
+        -------
+        None
+
+        """
+        raw_chunk_size: int = KITTY_CHUNK_SIZE // 4 * 3
+        last: int = max(0, (len(data) - 1) // raw_chunk_size)
+        chunks: t.Iterable[bytes] = iter_b64encode(data, raw_chunk_size)
+        for n, chunk in enumerate(chunks if data else [b""]):
+            control: dict[str, str | int] = (
+                {"a": "t", "f": 100, "i": image_id, "q": 2} if n == 0 else {}
+            )
+            control["m"] = int(n < last)
+            out.write(self._command(control, chunk, term_is_tmux=term_is_tmux))
+
+    def write(
+        self,
+        out: t.BinaryIO,
+        data: bytes,
+        rows: int | None = None,
+    ) -> None:
+        """Display an image at the position of the cursor.
+
+        If the image is no PNG image, ``KITTY_PLACEHOLDER`` is written
+        instead.
+
+        Parameters
+        ----------
+        out : typing.BinaryIO
+            The stream to write to, e.g. ``sys.stdout.buffer``.
+        data : bytes
+            The PNG image.
+        rows : int, optional
+            The height of the image in terminal lines. The width follows
+            from the aspect ratio. If it is ``None``, the image is displayed
+            in its original size.
+
+        Returns
+        -------
+        None
+
+        """
+        if not data.startswith(PNG_SIGNATURE):
+            logger.debug("The kitty graphics protocol only supports PNG.")
+            out.write(KITTY_PLACEHOLDER + BIN_NL)
+            return
+
+        term_is_tmux: bool = os.environ.get("TERM", "").startswith("screen")
+        digest: str = hashlib.sha256(data).hexdigest()
+        image_id: int | None = self._ids.get(digest)
+        if image_id is None:
+            image_id = self._next_id
+            self._next_id = self._next_id % (2**32 - 1) + 1
+            self._ids[digest] = image_id
+            self.transmit(out, data, image_id, term_is_tmux=term_is_tmux)
+
+        control: dict[str, str | int] = {"a": "p", "i": image_id, "q": 2}
+        if rows is not None:
+            control["r"] = rows
+        out.write(self._command(control, term_is_tmux=term_is_tmux))
+        out.write(BIN_NL)
+
+    def render(
+        self,
+        data: bytes,
+        rows: int | None = None,
+    ) -> bytes:
+        """Get the escape sequences to display an image.
+
+        Parameters
+        ----------
+        data : bytes
+            The PNG image.
+        rows : int, optional
+            The height of the image in terminal lines (see ``write()``).
+
+        Returns
+        -------
+        bytes : bytes
+            The escape sequences, which need to be written to the terminal,
+            or the placeholder, if the image is no PNG image.
+
+        """
+        buf: io.BytesIO = io.BytesIO()
+        self.write(t.cast(t.BinaryIO, buf), data, rows)
+        return buf.getvalue()
+
+
+kitty_graphics: KittyGraphics = KittyGraphics()
+
+
+def probe_terminal_cell_size_in_px() -> TerminalCellSizePx | None:
+    """Ask the terminal for its cell size in pixels.
+
+    This is a blocking round trip to the terminal. Use
+    ``get_terminal_cell_size_in_px()``, which caches the result.
 
     Returns
     -------
@@ -234,4 +552,195 @@ def get_terminal_cell_size_in_px() -> TerminalCellSizePx | None:
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
 
+class TerminalCellSizeCache:
+    """Cache the cell size of the terminal.
+
+    The terminal is probed once per process. The result is also stored per
+    TTY in the XDG cache directory, so the next process on the same TTY
+    does not need to probe the terminal again. A stored result is only
+    used, while the terminal still has the same type and size (in cells and
+    in pixels, as reported by the kernel). The result of the process is
+    invalidated, when the terminal is resized (``SIGWINCH``).
+
+    Parameters
+    ----------
+    directory : pathlib.Path, optional
+        The directory to store the results in.
+    persist : bool, default: True
+        ``True``, if the result should be stored per TTY, otherwise
+        ``False``.
+
+    """
+
+    __slots__ = ("_probed", "_value", "directory", "persist")
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        *,
+        persist: bool = True,
+    ) -> None:
+        self.directory: Path = (
+            directory or xdg_cache_home() / "matrixctl" / "terminal"
+        )
+        self.persist: bool = persist
+        self._probed: bool = False
+        self._value: TerminalCellSizePx | None = None
+
+    def get(self) -> TerminalCellSizePx | None:
+        """Get the cell size of the terminal.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        terminal_size : matrixctl.terminal.TerminalCellSizePx or None
+            The cell size of the terminal or ``None``, if it is unknown
+            (e.g. stdin is no terminal).
+
+        """
+        if self._probed:
+            return self._value
+
+        self._probed = True
+        if not sys.stdin.isatty():
+            self._value = None
+            return None
+
+        fingerprint: dict[str, t.Any] = self._fingerprint()
+        path: Path | None = self._path() if self.persist else None
+        self._value = None if path is None else self._load(path, fingerprint)
+        if self._value is None:
+            logger.debug("Probe the terminal cell size.")
+            self._value = probe_terminal_cell_size_in_px()
+            if path is not None and self._value is not None:
+                self._save(path, fingerprint, self._value)
+        return self._value
+
+    def invalidate(self) -> None:
+        """Probe the terminal again, the next time the cell size is needed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        self._probed = False
+        self._value = None
+
+    def install_sigwinch_handler(self) -> None:
+        """Invalidate the cache, when the terminal is resized.
+
+        An already installed handler is still called. The handler can only
+        be installed from the main thread.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous: t.Any = signal.getsignal(signal.SIGWINCH)
+
+        def handler(signum: int, frame: FrameType | None) -> None:
+            self.invalidate()
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(signal.SIGWINCH, handler)
+
+    @staticmethod
+    def _fingerprint() -> dict[str, t.Any]:
+        fingerprint: dict[str, t.Any] = {"term": os.environ.get("TERM")}
+        with suppress(OSError):
+            lines, columns, xpixel, ypixel = struct.unpack(
+                "HHHH",
+                fcntl.ioctl(
+                    sys.stdin.fileno(),
+                    termios.TIOCGWINSZ,
+                    bytes(8),
+                ),
+            )
+            fingerprint |= {
+                "lines": lines,
+                "columns": columns,
+                "xpixel": xpixel,
+                "ypixel": ypixel,
+            }
+        return fingerprint
+
+    def _path(self) -> Path | None:
+        try:
+            tty_name: str = os.ttyname(sys.stdin.fileno())
+        except OSError:
+            return None
+        return self.directory / hashlib.sha256(tty_name.encode()).hexdigest()
+
+    @staticmethod
+    def _load(
+        path: Path,
+        fingerprint: dict[str, t.Any],
+    ) -> TerminalCellSizePx | None:
+        try:
+            stored: dict[str, t.Any] = json.loads(path.read_text())
+            if stored["fingerprint"] != fingerprint:
+                logger.debug("The terminal changed, probe the cell size.")
+                return None
+            return TerminalCellSizePx(
+                width=int(stored["width"]),
+                height=int(stored["height"]),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _save(
+        path: Path,
+        fingerprint: dict[str, t.Any],
+        value: TerminalCellSizePx,
+    ) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                json.dumps(
+                    {
+                        "fingerprint": fingerprint,
+                        "width": value.width,
+                        "height": value.height,
+                    }
+                )
+            )
+        except OSError as err:
+            logger.debug("Unable to store the terminal cell size: %s", err)
+
+
+terminal_cell_size_cache: TerminalCellSizeCache = TerminalCellSizeCache()
+
+
+def get_terminal_cell_size_in_px() -> TerminalCellSizePx | None:
+    """Get the terminal cell size in pixels.
+
+    The result is cached (see ``TerminalCellSizeCache``).
+
+    Returns
+    -------
+    terminal_size : matrixctl.print_helpers.TerminalCellSizePx or None
+        A 2-tuple containing the width and height of the terminal cell in
+        pixels.
+
+    """
+    return terminal_cell_size_cache.get()
+
+
 # vim: set ft=python :
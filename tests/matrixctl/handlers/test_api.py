@@ -0,0 +1,902 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the api handler."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+import typing as t
+
+from pathlib import Path
+
+import httpx
+import pytest
+
+from matrixctl.errors import InternalResponseError
+from matrixctl.errors import MediaTooLargeError
+from matrixctl.handlers import api
+from matrixctl.handlers.api import AdaptiveConcurrencyLimiter
+from matrixctl.handlers.api import ClientPool
+from matrixctl.handlers.api import ConnectionPoolLimits
+from matrixctl.handlers.api import RequestBuilder
+from matrixctl.handlers.api import RetryPolicy
+from matrixctl.typehints import JsonDict
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+###############################################################################
+#                            ClientPool
+###############################################################################
+
+
+def test_client_pool_reuses_client() -> None:
+    """Test, if the synchronous client is shared."""
+
+    # Setup
+    pool: ClientPool = ClientPool()
+
+    # Exercise
+    first: httpx.Client = pool.get_client()
+    second: httpx.Client = pool.get_client()
+
+    # Verify
+    assert first is second
+
+    # Cleanup
+    pool.close()
+
+
+def test_client_pool_reopens_closed_client() -> None:
+    """Test, if a new client is opened after the old one was closed."""
+
+    # Setup
+    pool: ClientPool = ClientPool()
+    first: httpx.Client = pool.get_client()
+
+    # Exercise
+    pool.close()
+    second: httpx.Client = pool.get_client()
+
+    # Verify
+    assert first.is_closed
+    assert first is not second
+
+    # Cleanup
+    pool.close()
+
+
+def test_client_pool_configure_closes_client() -> None:
+    """Test, if new limits close the already opened client."""
+
+    # Setup
+    pool: ClientPool = ClientPool()
+    first: httpx.Client = pool.get_client()
+
+    # Exercise
+    pool.configure(ConnectionPoolLimits(max_connections=2))
+
+    # Verify
+    assert first.is_closed
+    assert pool.limits.max_connections == 2  # noqa: PLR2004
+
+    # Cleanup
+    pool.close()
+
+
+def test_client_pool_async_client_per_event_loop() -> None:
+    """Test, if every event loop gets its own asynchronous client."""
+
+    # Setup
+    pool: ClientPool = ClientPool()
+
+    async def get_clients() -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+        clients = (pool.get_async_client(), pool.get_async_client())
+        await pool.aclose()
+        return clients
+
+    # Exercise
+    first_loop = asyncio.run(get_clients())
+    second_loop = asyncio.run(get_clients())
+
+    # Verify
+    assert first_loop[0] is first_loop[1]
+    assert first_loop[0] is not second_loop[0]
+    assert first_loop[0].is_closed
+
+    # Cleanup - None
+
+
+###############################################################################
+#                            paginate
+###############################################################################
+
+TOTAL_USERS: int = 1234
+
+
+async def users_endpoint(request: httpx.Request) -> httpx.Response:
+    """Mock the paginated users endpoint of the admin API."""
+    start: int = int(request.url.params["from"])
+    limit: int = int(request.url.params["limit"])
+
+    # Answer in a random order
+    await asyncio.sleep(random.random() / 100)  # noqa: S311
+
+    users: list[JsonDict] = [
+        {"name": f"@user{i}:example.com"}
+        for i in range(start, min(start + limit, TOTAL_USERS))
+    ]
+    body: JsonDict = {"users": users, "total": TOTAL_USERS}
+    if start + limit < TOTAL_USERS:
+        body["next_token"] = str(start + limit)
+    return httpx.Response(200, json=body)
+
+
+@pytest.fixture
+def mock_users_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Route all asynchronous requests to the mocked users endpoint."""
+
+    def get_async_client(_: ClientPool) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.MockTransport(users_endpoint),
+        )
+
+    monkeypatch.setattr(ClientPool, "get_async_client", get_async_client)
+
+
+def users_request() -> RequestBuilder:
+    """Create the request for the first page of users."""
+    return RequestBuilder(
+        token="token",  # noqa: S106
+        domain="example.com",
+        path="/_synapse/admin/v2/users",
+        params={"from": 0, "limit": 100},
+        concurrent_limit=4,
+    )
+
+
+@pytest.mark.usefixtures("mock_users_endpoint")
+def test_paginate_yields_all_records_in_order() -> None:
+    """Test, if all records are yielded in the order of the pages."""
+
+    # Setup
+    desired: list[str] = [f"@user{i}:example.com" for i in range(TOTAL_USERS)]
+
+    # Exercise
+    actual: list[str] = [
+        user["name"] for user in api.paginate(users_request(), "users")
+    ]
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
+@pytest.mark.usefixtures("mock_users_endpoint")
+def test_paginate_respects_limit() -> None:
+    """Test, if no more than ``limit`` records are yielded."""
+
+    # Setup
+    desired: int = 321
+
+    # Exercise
+    actual: list[JsonDict] = list(
+        api.paginate(users_request(), "users", limit=desired, reorder_window=1)
+    )
+
+    # Verify
+    assert len(actual) == desired
+    assert actual[-1]["name"] == f"@user{desired - 1}:example.com"
+
+    # Cleanup - None
+
+
+###############################################################################
+#                            AdaptiveConcurrencyLimiter
+###############################################################################
+
+
+def test_limiter_increases_up_to_ceiling() -> None:
+    """Test, if the limit grows while latency is stable."""
+
+    # Setup
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(8)
+    desired: int = 8
+
+    # Exercise
+    for _ in range(100):
+        limiter.observe(0.1, 200)
+
+    # Verify
+    assert int(limiter.limit) == desired
+
+    # Cleanup - None
+
+
+@pytest.mark.parametrize("status_code", [429, 502, None])
+def test_limiter_backs_off(status_code: int | None) -> None:
+    """Test, if the limit is halved on 429, 5xx and connection errors."""
+
+    # Setup
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        8,
+        initial=8,
+    )
+    desired: int = 4
+
+    # Exercise
+    limiter.observe(0.1, status_code)
+
+    # Verify
+    assert int(limiter.limit) == desired
+
+    # Cleanup - None
+
+
+def test_limiter_backs_off_on_rising_latency() -> None:
+    """Test, if the limit is decreased, when the p95 latency rises."""
+
+    # Setup
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        8,
+        initial=8,
+    )
+    for _ in range(10):
+        limiter.observe(0.1, 200)
+
+    # Exercise
+    for _ in range(5):
+        limiter.observe(1.0, 200)
+
+    # Verify
+    assert int(limiter.limit) < 8  # noqa: PLR2004
+
+    # Cleanup - None
+
+
+def test_limiter_respects_floor() -> None:
+    """Test, if the limit never falls below the floor."""
+
+    # Setup
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        8,
+        floor=2,
+    )
+    desired: int = 2
+
+    # Exercise
+    for _ in range(10):
+        limiter._last_backoff = 0.0  # noqa: SLF001
+        limiter.observe(0.1, 503)
+
+    # Verify
+    assert int(limiter.limit) == desired
+
+    # Cleanup - None
+
+
+def test_limiter_limits_concurrency() -> None:
+    """Test, if no more than ``limit`` requests run at the same time."""
+
+    # Setup
+    limiter: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+        3,
+        initial=3,
+    )
+    in_flight: list[int] = []
+
+    async def work() -> None:
+        async with limiter:
+            in_flight.append(limiter.in_flight)
+            await asyncio.sleep(0.001)
+
+    async def run() -> None:
+        await asyncio.gather(*(work() for _ in range(20)))
+
+    # Exercise
+    asyncio.run(run())
+
+    # Verify
+    assert max(in_flight) == 3  # noqa: PLR2004
+    assert limiter.in_flight == 0
+
+    # Cleanup - None
+
+
+###############################################################################
+#                            RetryPolicy
+###############################################################################
+
+
+@pytest.mark.parametrize(
+    ("headers", "body", "desired"),
+    [
+        ({"Retry-After": "3"}, {}, 3.0),
+        ({}, {"errcode": "M_LIMIT_EXCEEDED", "retry_after_ms": 1500}, 1.5),
+        ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, {}, 0.0),
+        ({}, {}, None),
+    ],
+)
+def test_retry_policy_retry_after(
+    headers: dict[str, str],
+    body: JsonDict,
+    desired: float | None,
+) -> None:
+    """Test, if the delay requested by the server is found."""
+
+    # Setup
+    response: httpx.Response = httpx.Response(429, headers=headers, json=body)
+
+    # Exercise
+    actual: float | None = RetryPolicy.retry_after(response)
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
+@pytest.mark.parametrize(
+    ("method", "idempotent", "status_code", "should_retry"),
+    [
+        ("GET", None, 502, True),
+        ("GET", None, 404, False),
+        ("POST", None, 502, False),
+        ("POST", True, 502, True),
+        ("POST", None, 429, True),
+        ("GET", False, 503, False),
+    ],
+)
+def test_retry_policy_is_idempotency_aware(
+    method: str,
+    idempotent: bool | None,  # noqa: FBT001
+    status_code: int,
+    *,
+    should_retry: bool,
+) -> None:
+    """Test, if only safe requests are retried."""
+
+    # Setup
+    request_config: RequestBuilder = RequestBuilder(
+        token="token",  # noqa: S106
+        domain="example.com",
+        path="/",
+        method=method,
+        idempotent=idempotent,
+    )
+    response: httpx.Response = httpx.Response(status_code)
+
+    # Exercise
+    delay: float | None = request_config.retry.get_delay(
+        request_config,
+        1,
+        response,
+    )
+
+    # Verify
+    assert (delay is not None) is should_retry
+
+    # Cleanup - None
+
+
+def test_retry_policy_gives_up() -> None:
+    """Test, if the request is not retried after the last attempt."""
+
+    # Setup
+    request_config: RequestBuilder = RequestBuilder(
+        token="token",  # noqa: S106
+        domain="example.com",
+        path="/",
+        retry=RetryPolicy(max_attempts=2),
+    )
+    response: httpx.Response = httpx.Response(503)
+
+    # Exercise
+    first: float | None = request_config.retry.get_delay(
+        request_config,
+        1,
+        response,
+    )
+    second: float | None = request_config.retry.get_delay(
+        request_config,
+        2,
+        response,
+    )
+
+    # Verify
+    assert first is not None
+    assert second is None
+
+    # Cleanup - None
+
+
+def test_request_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test, if a synchronous request is retried until it succeeds."""
+
+    # Setup
+    responses: list[httpx.Response] = [
+        httpx.Response(502),
+        httpx.Response(
+            429,
+            json={"errcode": "M_LIMIT_EXCEEDED", "retry_after_ms": 250},
+        ),
+        httpx.Response(200, json={"ok": True}),
+    ]
+    delays: list[float] = []
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(lambda _: responses.pop(0)),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    monkeypatch.setattr(time, "sleep", delays.append)
+
+    # Exercise
+    response: httpx.Response = api.request(
+        RequestBuilder(
+            token="token",  # noqa: S106
+            domain="example.com",
+            path="/",
+        ),
+    )
+
+    # Verify
+    assert response.json() == {"ok": True}
+    assert len(delays) == 2  # noqa: PLR2004
+    assert delays[1] == 0.25  # noqa: PLR2004
+
+    # Cleanup
+    client.close()
+
+
+def test_paginate_retries_failed_pages(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if a rate limited page does not abort the whole listing."""
+
+    # Setup
+    limited: set[int] = set()
+
+    async def flaky_users_endpoint(request: httpx.Request) -> httpx.Response:
+        start: int = int(request.url.params["from"])
+        if start not in limited:
+            limited.add(start)
+            return httpx.Response(
+                429,
+                json={"errcode": "M_LIMIT_EXCEEDED", "retry_after_ms": 1},
+            )
+        return await users_endpoint(request)
+
+    def get_async_client(_: ClientPool) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.MockTransport(flaky_users_endpoint),
+        )
+
+    monkeypatch.setattr(ClientPool, "get_async_client", get_async_client)
+
+    # Exercise
+    actual: list[JsonDict] = list(api.paginate(users_request(), "users"))
+
+    # Verify
+    assert len(actual) == TOTAL_USERS
+
+    # Cleanup - None
+
+
+###############################################################################
+#                            streamed_upload
+###############################################################################
+
+
+def test_streamed_upload(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if a file is uploaded in chunks with a Content-Length."""
+
+    # Setup
+    desired: bytes = random.randbytes(10_000)  # noqa: S311
+    upload_path: Path = tmp_path / "file.bin"
+    upload_path.write_bytes(desired)
+    received: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        request.read()
+        received.append(request)
+        return httpx.Response(200, json={"content_uri": "mxc://a/b"})
+
+    client: httpx.Client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise
+    response: httpx.Response = api.streamed_upload(
+        RequestBuilder(
+            token="token",  # noqa: S106
+            domain="example.com",
+            path="/_matrix/media/r0/upload/",
+            method="POST",
+        ),
+        upload_path,
+        chunk_size=1024,
+    )
+
+    # Verify
+    assert response.json() == {"content_uri": "mxc://a/b"}
+    assert received[0].content == desired
+    assert received[0].headers["Content-Length"] == str(len(desired))
+    assert "Transfer-Encoding" not in received[0].headers
+
+    # Cleanup
+    client.close()
+
+
+###############################################################################
+#                            fetch_media
+###############################################################################
+
+
+def media_request() -> RequestBuilder:
+    """Create a request for a media download."""
+    return RequestBuilder(
+        token="token",  # noqa: S106
+        domain="example.com",
+        path="/_matrix/client/v1/media/download/example.com/abc",
+    )
+
+
+def test_fetch_media(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test, if the media and its content type are fetched."""
+
+    # Setup
+    desired: bytes = b"\x89PNG" * 1000
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(
+                200,
+                headers={"Content-Type": "image/png"},
+                content=desired,
+            ),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise
+    with api.fetch_media(media_request(), spool_threshold=1024) as buf:
+        actual: bytes = buf.getvalue()
+        content_type: str | None = buf.content_type
+
+    # Verify
+    assert actual == desired
+    assert content_type == "image/png"
+
+    # Cleanup
+    client.close()
+
+
+def test_fetch_media_max_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test, if media larger than ``max_size`` is rejected."""
+
+    # Setup
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(200, content=b"x" * 1000),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise & Verify
+    with pytest.raises(MediaTooLargeError):
+        api.fetch_media(media_request(), max_size=999)
+
+    # Cleanup
+    client.close()
+
+
+def test_download_thumbnail_to_buf(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test, if a thumbnail of the requested size is downloaded."""
+
+    # Setup
+    received: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        return httpx.Response(200, content=b"thumbnail")
+
+    client: httpx.Client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise
+    with api.download_thumbnail_to_buf(
+        token="token",  # noqa: S106
+        domain="example.com",
+        media_id="mxc://example.com/abc",
+        width=320,
+        height=240,
+    ) as buf:
+        actual: bytes = buf.getvalue()
+
+    # Verify
+    assert actual == b"thumbnail"
+    assert received[0].url.path == (
+        "/_matrix/client/v1/media/thumbnail/example.com/abc"
+    )
+    assert received[0].url.params["width"] == "320"
+    assert received[0].url.params["height"] == "240"
+    assert received[0].url.params["method"] == "scale"
+
+    # Cleanup
+    client.close()
+
+
+def test_download_thumbnail_to_buf_not_found(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if a missing thumbnail raises an error instead of exiting."""
+
+    # Setup
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(404, json={"errcode": "M_NOT_FOUND"}),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise & Verify
+    with pytest.raises(InternalResponseError):
+        api.download_thumbnail_to_buf(
+            token="token",  # noqa: S106
+            domain="example.com",
+            media_id="mxc://example.com/abc",
+            width=320,
+            height=240,
+        )
+
+    # Cleanup
+    client.close()
+
+
+###############################################################################
+#                            streamed_download
+###############################################################################
+
+MEDIA: bytes = bytes(range(256)) * 40
+
+
+class InterruptedStream(httpx.SyncByteStream):
+    """Send the first bytes of a body, then fail."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content: bytes = content
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        """Yield the content and break the connection."""
+        yield self.content
+        msg: str = "Connection reset by peer"
+        raise httpx.ReadError(msg)
+
+
+class ChunkedStream(httpx.SyncByteStream):
+    """Send a body in chunks, which can only be read once."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content: bytes = content
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        """Yield the content in chunks of 1 KiB."""
+        for start in range(0, len(self.content), 1024):
+            yield self.content[start : start + 1024]
+
+
+def media_endpoint(request: httpx.Request) -> httpx.Response:
+    """Mock the media download endpoint with support for ranges."""
+    headers: dict[str, str] = {"Content-Type": "image/png"}
+    range_header: str | None = request.headers.get("Range")
+    if range_header is None:
+        return httpx.Response(200, headers=headers, content=MEDIA)
+    start: int = int(range_header.removeprefix("bytes=").rstrip("-"))
+    headers["Content-Range"] = f"bytes {start}-{len(MEDIA) - 1}/{len(MEDIA)}"
+    return httpx.Response(206, headers=headers, content=MEDIA[start:])
+
+
+def test_streamed_download_resumes_partial_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if an existing partial file is completed with a range request."""
+
+    # Setup
+    ranges: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get("Range"))
+        return media_endpoint(request)
+
+    client: httpx.Client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    (tmp_path / "media.part").write_bytes(MEDIA[:1000])
+
+    # Exercise
+    api.streamed_download(media_request(), tmp_path / "media")
+
+    # Verify
+    assert ranges == ["bytes=1000-"]
+    assert (tmp_path / "media.png").read_bytes() == MEDIA
+    assert not (tmp_path / "media.part").exists()
+
+    # Cleanup
+    client.close()
+
+
+def test_streamed_download_resumes_after_interruption(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if an interrupted download is resumed on the next attempt."""
+
+    # Setup
+    ranges: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            return httpx.Response(
+                200,
+                headers={
+                    "Content-Type": "image/png",
+                    "Content-Length": str(len(MEDIA)),
+                },
+                stream=InterruptedStream(MEDIA[:4000]),
+            )
+        return media_endpoint(request)
+
+    client: httpx.Client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+
+    # Exercise
+    api.streamed_download(media_request(), tmp_path / "media")
+
+    # Verify
+    assert ranges == [None, "bytes=4000-"]
+    assert (tmp_path / "media.png").read_bytes() == MEDIA
+
+    # Cleanup
+    client.close()
+
+
+def test_streamed_download_with_debug_logging(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test, if a streamed body is not read again for the debug log."""
+
+    # Setup
+    caplog.set_level(logging.DEBUG, logger="matrixctl.handlers.api")
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(
+                200,
+                headers={"Content-Type": "image/png"},
+                stream=ChunkedStream(MEDIA),
+            ),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+
+    # Exercise
+    actual: Path = api.streamed_download(media_request(), tmp_path / "media")
+
+    # Verify
+    assert actual == tmp_path / "media.png"
+    assert actual.read_bytes() == MEDIA
+    assert not (tmp_path / "media.part").exists()
+
+    # Cleanup
+    client.close()
+
+
+def test_streamed_download_existing_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if an existing file is detected before the body is read."""
+
+    # Setup
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(
+                200,
+                headers={"Content-Type": "image/png"},
+                stream=InterruptedStream(MEDIA),  # Fails, if it is read
+            ),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    (tmp_path / "media.png").write_bytes(b"existing")
+
+    # Exercise & Verify
+    with pytest.raises(FileExistsError):
+        api.streamed_download(media_request(), tmp_path / "media")
+    assert (tmp_path / "media.png").read_bytes() == b"existing"
+    assert not (tmp_path / "media.part").exists()
+
+    # Cleanup
+    client.close()
+
+
+def test_streamed_download_max_size_removes_partial_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if an aborted download does not leave a resumable file."""
+
+    # Setup
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(media_endpoint),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    (tmp_path / "media.part").write_bytes(MEDIA[:1000])
+
+    # Exercise & Verify
+    with pytest.raises(MediaTooLargeError):
+        api.streamed_download(
+            media_request(),
+            tmp_path / "media",
+            max_size=len(MEDIA) // 2,
+        )
+    assert not (tmp_path / "media.part").exists()
+
+    # Cleanup
+    client.close()
+
+
+def test_astreamed_download(tmp_path: Path) -> None:
+    """Test, if media is downloaded concurrently to separate files."""
+
+    # Setup
+    async def download_all() -> list[Path]:
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(media_endpoint),
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    api.astreamed_download(
+                        media_request(),
+                        tmp_path / name,
+                        client,
+                    )
+                    for name in ("a", "b", "c")
+                ),
+            )
+
+    (tmp_path / "b.part").write_bytes(MEDIA[:100])
+
+    # Exercise
+    actual: list[Path] = asyncio.run(download_all())
+
+    # Verify
+    assert actual == [tmp_path / f"{name}.png" for name in ("a", "b", "c")]
+    assert all(path.read_bytes() == MEDIA for path in actual)
+    assert not list(tmp_path.glob("*.part"))
+
+
+# vim: set ft=python :
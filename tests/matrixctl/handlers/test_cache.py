@@ -0,0 +1,314 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the response cache."""
+
+from __future__ import annotations
+
+import os
+import time
+import typing as t
+
+from pathlib import Path
+
+import httpx
+import pytest
+
+from matrixctl.handlers import api
+from matrixctl.handlers.api import ClientPool
+from matrixctl.handlers.api import RequestBuilder
+from matrixctl.handlers.cache import CacheMode
+from matrixctl.handlers.cache import ResponseCache
+from matrixctl.handlers.cache import ResponseCacheConfig
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+SERVER: str = "example.com"
+URL: str = "https://matrix.example.com/_synapse/admin/v1/rooms"
+
+
+def make_response(content: bytes = b'{"rooms": []}') -> httpx.Response:
+    """Create a response to a GET request."""
+    return httpx.Response(
+        200,
+        headers={"Content-Type": "application/json"},
+        content=content,
+        request=httpx.Request("GET", URL),
+    )
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ResponseCache:
+    """Create a response cache in a temporary directory."""
+    return ResponseCache(ResponseCacheConfig(enabled=True), tmp_path)
+
+
+def test_cache_roundtrip(cache: ResponseCache) -> None:
+    """Test, if a cached response equals the original response."""
+
+    # Setup
+    key: str = cache.key("GET", URL, {"limit": 100})
+    desired: httpx.Response = make_response()
+
+    # Exercise
+    cache.put(SERVER, key, desired)
+    actual: httpx.Response | None = cache.get(SERVER, key)
+
+    # Verify
+    assert actual is not None
+    assert actual.status_code == desired.status_code
+    assert actual.json() == desired.json()
+    assert actual.headers["Content-Type"] == "application/json"
+
+    # Cleanup - None
+
+
+def test_cache_key_depends_on_params() -> None:
+    """Test, if the parameters are part of the key, but not their order."""
+
+    # Setup - None
+
+    # Exercise
+    first: str = ResponseCache.key("GET", URL, {"from": 0, "limit": 100})
+    second: str = ResponseCache.key("GET", URL, {"limit": 100, "from": 0})
+    third: str = ResponseCache.key("GET", URL, {"limit": 100, "from": 100})
+
+    # Verify
+    assert first == second
+    assert first != third
+
+    # Cleanup - None
+
+
+def test_cache_expires(tmp_path: Path) -> None:
+    """Test, if expired entries are not used."""
+
+    # Setup
+    cache: ResponseCache = ResponseCache(
+        ResponseCacheConfig(enabled=True, ttl=-1.0),
+        tmp_path,
+    )
+    key: str = cache.key("GET", URL)
+    cache.put(SERVER, key, make_response())
+
+    # Exercise
+    actual: httpx.Response | None = cache.get(SERVER, key)
+
+    # Verify
+    assert actual is None
+
+    # Cleanup - None
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Test, if the least recently used entry is evicted first."""
+
+    # Setup
+    cache: ResponseCache = ResponseCache(
+        ResponseCacheConfig(enabled=True, max_bytes=1500),
+        tmp_path,
+    )
+    keys: list[str] = [cache.key("GET", URL, {"from": i}) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(SERVER, key, make_response(b"x" * 400))
+        entry: Path = next(tmp_path.glob(f"*/{key}"))
+        os.utime(entry, (time.time() - 100 + i, time.time() - 100 + i))
+    assert cache.get(SERVER, keys[0]) is not None  # Mark as recently used
+
+    # Exercise
+    cache.put(SERVER, keys[2], make_response(b"x" * 400))
+
+    # Verify
+    assert cache.get(SERVER, keys[0]) is not None
+    assert cache.get(SERVER, keys[1]) is None
+    assert cache.get(SERVER, keys[2]) is not None
+
+    # Cleanup - None
+
+
+def test_cache_keeps_running_total(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if the entries are only scanned, when the limit is exceeded."""
+
+    # Setup
+    cache: ResponseCache = ResponseCache(
+        ResponseCacheConfig(enabled=True, max_bytes=5000),
+        tmp_path,
+    )
+    scans: list[int] = []
+    scan_entries: t.Callable[[ResponseCache], t.Any] = (
+        ResponseCache._scan_entries  # noqa: SLF001
+    )
+
+    def counting_scan_entries(self: ResponseCache) -> t.Any:
+        scans.append(1)
+        return scan_entries(self)
+
+    monkeypatch.setattr(ResponseCache, "_scan_entries", counting_scan_entries)
+    keys: list[str] = [cache.key("GET", URL, {"from": i}) for i in range(9)]
+
+    # Exercise
+    for key in keys[:5]:
+        cache.put(SERVER, key, make_response(b"x" * 800))
+    cache.put(SERVER, keys[0], make_response(b"x" * 800))  # Replace
+    scans_below_limit: int = len(scans)
+    size_below_limit: int = int((tmp_path / "size").read_text())
+    entries_below_limit: int = sum(
+        p.stat().st_size for p in tmp_path.glob("*/*")
+    )
+    for key in keys[5:]:
+        cache.put(SERVER, key, make_response(b"x" * 800))
+
+    # Verify
+    entries: list[int] = [p.stat().st_size for p in tmp_path.glob("*/*")]
+    assert scans_below_limit == 1  # The size file did not exist yet
+    assert size_below_limit == entries_below_limit
+    assert len(scans) == 3  # noqa: PLR2004 # Every eviction frees two entries
+    assert int((tmp_path / "size").read_text()) == sum(entries)
+    assert sum(entries) <= 5000  # noqa: PLR2004
+
+    # Cleanup - None
+
+
+def test_cache_invalidate(cache: ResponseCache) -> None:
+    """Test, if only the entries of the server are removed."""
+
+    # Setup
+    key: str = cache.key("GET", URL)
+    cache.put(SERVER, key, make_response())
+    cache.put("example.org", key, make_response())
+
+    # Exercise
+    cache.invalidate(SERVER)
+
+    # Verify
+    assert cache.get(SERVER, key) is None
+    assert cache.get("example.org", key) is not None
+
+    # Cleanup - None
+
+
+@pytest.mark.parametrize(
+    ("mode", "desired_requests"),
+    [(CacheMode.USE, 1), (CacheMode.REFRESH, 2), (CacheMode.BYPASS, 2)],
+)
+def test_request_uses_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    cache: ResponseCache,
+    mode: CacheMode,
+    desired_requests: int,
+) -> None:
+    """Test, if the cache mode of the request is respected."""
+
+    # Setup
+    sent: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return httpx.Response(200, json={"rooms": []})
+
+    client: httpx.Client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    monkeypatch.setattr(api, "response_cache", cache)
+    req: RequestBuilder = RequestBuilder(
+        token="token",  # noqa: S106
+        domain=SERVER,
+        path="/_synapse/admin/v1/rooms",
+        cache=mode,
+    )
+
+    # Exercise
+    api.request(req)
+    response: httpx.Response = api.request(req)
+
+    # Verify
+    assert response.json() == {"rooms": []}
+    assert len(sent) == desired_requests
+
+    # Cleanup
+    client.close()
+
+
+def test_request_bypasses_cache_by_default(
+    monkeypatch: pytest.MonkeyPatch,
+    cache: ResponseCache,
+) -> None:
+    """Test, if requests, which do not opt in, are never cached."""
+
+    # Setup
+    statuses: list[str] = ["shutting_down", "complete"]
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda _: httpx.Response(200, json={"status": statuses.pop(0)}),
+        ),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    monkeypatch.setattr(api, "response_cache", cache)
+    req: RequestBuilder = RequestBuilder(
+        token="token",  # noqa: S106
+        domain=SERVER,
+        path="/_synapse/admin/v2/rooms/delete_status/1",
+    )
+
+    # Exercise
+    api.request(req)
+    response: httpx.Response = api.request(req)
+
+    # Verify
+    assert response.json() == {"status": "complete"}
+    assert cache.resolve(None) is CacheMode.USE
+
+    # Cleanup
+    client.close()
+
+
+def test_mutating_request_invalidates_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    cache: ResponseCache,
+) -> None:
+    """Test, if a mutating request removes the cached responses."""
+
+    # Setup
+    client: httpx.Client = httpx.Client(
+        transport=httpx.MockTransport(lambda _: httpx.Response(200, json={})),
+    )
+    monkeypatch.setattr(ClientPool, "get_client", lambda _: client)
+    monkeypatch.setattr(api, "response_cache", cache)
+    key: str = cache.key("GET", URL)
+    cache.put(SERVER, key, make_response())
+
+    # Exercise
+    api.request(
+        RequestBuilder(
+            token="token",  # noqa: S106
+            domain=SERVER,
+            path="/_synapse/admin/v2/rooms/!room:example.com",
+            method="DELETE",
+        ),
+    )
+
+    # Verify
+    assert cache.get(SERVER, key) is None
+
+    # Cleanup
+    client.close()
+
+
+# vim: set ft=python :
@@ -0,0 +1,394 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the database handler."""
+
+from __future__ import annotations
+
+import threading
+import typing as t
+
+from collections.abc import Iterator
+from contextlib import ExitStack
+from contextlib import contextmanager
+
+import psycopg
+import pytest
+
+from typing_extensions import Self
+
+from matrixctl.handlers import db
+from matrixctl.handlers.db import DBConnectionPool
+from matrixctl.handlers.db import DBPoolLimits
+from matrixctl.handlers.db import DBTunnel
+from matrixctl.handlers.db import QueryBuilder
+from matrixctl.handlers.db import parallel_scan
+from matrixctl.handlers.db import server_cursor
+from matrixctl.handlers.db import time_buckets
+from matrixctl.handlers.yaml import YAML
+from matrixctl.sanitizers import EventType
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+class FakeCursor:
+    """Stand in for a ``psycopg.ServerCursor``."""
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.itersize: int = 100
+
+    def __enter__(self) -> Self:
+        """Open the cursor."""
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Close the cursor."""
+
+
+class FakeConnection:
+    """Stand in for a ``psycopg.Connection``."""
+
+    def __init__(self, *, healthy: bool = True) -> None:
+        self.healthy: bool = healthy
+        self.closed: bool = False
+        self.broken: bool = False
+        self.read_only: bool | None = None
+        self.commits: int = 0
+
+    def cursor(self, name: str = "") -> FakeCursor:  # noqa: D102
+        return FakeCursor(name)
+
+    def execute(self, _: str) -> None:  # noqa: D102
+        if not self.healthy:
+            raise psycopg.OperationalError
+
+    def commit(self) -> None:  # noqa: D102
+        self.commits += 1
+
+    def rollback(self) -> None:  # noqa: D102
+        pass
+
+    def close(self) -> None:  # noqa: D102
+        self.closed = True
+
+
+class FakeForwarder:
+    """Stand in for a ``sshtunnel.SSHTunnelForwarder``."""
+
+    def __init__(self) -> None:
+        self.is_active: bool = True
+
+
+class FakePool(DBConnectionPool):
+    """Record the tunnels and connections of the pool."""
+
+    tunnels: list[str]
+    connections: list[FakeConnection]
+    forwarders: list[FakeForwarder]
+    connect_errors: list[psycopg.OperationalError]
+
+
+@pytest.fixture
+def pool(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakePool]:
+    """Create a pool of fake connections through a fake tunnel."""
+    tunnels: list[str] = []
+    connections: list[FakeConnection] = []
+    forwarders: list[FakeForwarder] = []
+    connect_errors: list[psycopg.OperationalError] = []
+
+    @contextmanager
+    def db_tunnel(_: t.Any) -> Iterator[DBTunnel]:
+        tunnels.append("open")
+        forwarders.append(FakeForwarder())
+        yield DBTunnel("postgresql://", t.cast(t.Any, forwarders[-1]))
+        tunnels.append("closed")
+
+    def connect(_: str) -> FakeConnection:
+        if connect_errors:
+            raise connect_errors.pop(0)
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(db, "db_tunnel", db_tunnel)
+    monkeypatch.setattr(db.psycopg, "connect", connect)
+    pool_: FakePool = FakePool(DBPoolLimits(pool_size=2))
+    pool_.configure(t.cast(YAML, object()))
+    pool_.tunnels = tunnels
+    pool_.connections = connections
+    pool_.forwarders = forwarders
+    pool_.connect_errors = connect_errors
+    yield pool_
+    pool_.close()
+
+
+def test_server_cursor() -> None:
+    """Test, if the cursor is a named server-side cursor."""
+
+    # Setup
+    conn: t.Any = FakeConnection()
+
+    # Exercise
+    with (
+        server_cursor(conn, itersize=500) as first,
+        server_cursor(conn) as second,
+    ):
+        pass
+
+    # Verify
+    assert (first.itersize, second.itersize) == (500, 2000)
+    assert first.name.startswith("matrixctl_")
+    assert first.name != second.name
+
+
+@pytest.mark.parametrize(
+    ("start", "stop", "count", "desired"),
+    [
+        (0, 100, 4, [(0, 25), (25, 50), (50, 75), (75, 100)]),
+        (0, 10, 3, [(0, 3), (3, 6), (6, 10)]),
+        (5, 7, 4, [(5, 6), (6, 7)]),
+        (5, 5, 4, [(5, 5)]),
+    ],
+)
+def test_time_buckets(
+    start: int,
+    stop: int,
+    count: int,
+    desired: list[tuple[int, int]],
+) -> None:
+    """Test, if the time range is split into consecutive buckets."""
+
+    # Exercise
+    actual: list[tuple[int, int]] = time_buckets(start, stop, count)
+
+    # Verify
+    assert actual == desired
+
+
+def test_parallel_scan_keeps_order(pool: FakePool) -> None:
+    """Test, if the results are in the order of the tasks."""
+
+    # Setup
+    started: threading.Barrier = threading.Barrier(3, timeout=5)
+
+    read_only: list[bool | None] = []
+
+    def scan(conn: FakeConnection, task: int) -> Iterator[int]:
+        read_only.append(conn.read_only)
+        if task < 3:  # noqa: PLR2004
+            started.wait()  # Blocks, unless three tasks run at once
+        yield from range(task * 10, task * 10 + 10)
+
+    # Exercise
+    actual: list[int] = list(
+        parallel_scan(pool.connection, range(6), scan, workers=3, queue_size=2)
+    )
+
+    # Verify
+    assert actual == list(range(60))
+    assert read_only == [True] * 6
+    assert [conn.read_only for conn in pool.connections] == [None] * 3
+    assert len(pool.connections) == 3  # noqa: PLR2004
+    assert pool.tunnels == ["open"]
+    assert [conn.closed for conn in pool.connections].count(False) == 2  # noqa: PLR2004
+
+
+def test_parallel_scan_raises(pool: FakePool) -> None:
+    """Test, if an error of a worker is raised in order."""
+
+    # Setup
+    def scan(_: t.Any, task: int) -> Iterator[int]:
+        if task == 1:
+            msg = "scan failed"
+            raise RuntimeError(msg)
+        yield task
+
+    actual: list[int] = []
+
+    # Exercise
+    with pytest.raises(RuntimeError, match="scan failed"):
+        actual.extend(
+            parallel_scan(pool.connection, range(4), scan, workers=2)
+        )
+
+    # Verify
+    assert actual == [0]
+
+
+def test_db_pool_reuses_connections(pool: FakePool) -> None:
+    """Test, if the tunnel and an idle connection are reused."""
+
+    # Exercise
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    pool.close()
+
+    # Verify
+    assert first is second
+    assert first.commits == 2  # noqa: PLR2004
+    assert first.closed
+    assert pool.tunnels == ["open", "closed"]
+
+
+def test_db_pool_health_check(pool: FakePool) -> None:
+    """Test, if an idle connection, which failed the check, is replaced."""
+
+    # Setup
+    pool.limits = DBPoolLimits(pool_size=2, health_check_after=0.0)
+    with pool.connection() as first:
+        first.healthy = False
+
+    # Exercise
+    with pool.connection() as second:
+        pass
+
+    # Verify
+    assert second is not first
+    assert first.closed
+    assert pool.tunnels == ["open"]
+
+
+def test_db_pool_reopens_tunnel_when_down(pool: FakePool) -> None:
+    """Test, if a tunnel, which is down, is reopened."""
+
+    # Setup
+    with pool.connection():
+        pass
+    pool.forwarders[-1].is_active = False
+    pool.connections[-1].healthy = False
+    pool.limits = DBPoolLimits(pool_size=2, health_check_after=0.0)
+    pool.connect_errors.append(psycopg.OperationalError("connection refused"))
+
+    # Exercise
+    with pool.connection():
+        pass
+
+    # Verify
+    assert pool.tunnels == ["open", "closed", "open"]
+
+
+@pytest.mark.parametrize(("is_active", "borrowed"), [(True, 0), (False, 1)])
+def test_db_pool_keeps_tunnel(
+    pool: FakePool,
+    *,
+    is_active: bool,
+    borrowed: int,
+) -> None:
+    """Test, if other errors or borrowed connections keep the tunnel."""
+
+    # Setup
+    assert pool.connection_uri  # Open the tunnel
+    stack: ExitStack = ExitStack()
+    connections: list[FakeConnection] = [
+        stack.enter_context(pool.connection()) for _ in range(borrowed)
+    ]
+    # The tunnel is up and e.g. the password is wrong, or the tunnel is down,
+    # but a worker still uses it.
+    pool.forwarders[-1].is_active = is_active
+    pool.connect_errors.append(psycopg.OperationalError("failed"))
+
+    # Exercise
+    with pytest.raises(psycopg.OperationalError):
+        stack.enter_context(pool.connection())
+
+    # Verify
+    assert pool.tunnels == ["open"]
+    assert not any(conn.closed for conn in connections)
+
+    # Cleanup
+    stack.close()
+
+
+def test_db_pool_keeps_tunnel_while_connecting(
+    monkeypatch: pytest.MonkeyPatch,
+    pool: FakePool,
+) -> None:
+    """Test, if a connection being opened by a thread keeps the tunnel."""
+
+    # Setup
+    assert pool.connection_uri  # Open the tunnel
+    pool.forwarders[-1].is_active = False
+    connecting: threading.Event = threading.Event()
+    release: threading.Event = threading.Event()
+
+    def connect(_: str) -> FakeConnection:
+        if threading.current_thread().name == "worker":
+            connecting.set()
+            release.wait(timeout=5)
+            return FakeConnection()
+        msg: str = "connection refused"
+        raise psycopg.OperationalError(msg)
+
+    def borrow() -> None:
+        with pool.connection():
+            pass
+
+    monkeypatch.setattr(db.psycopg, "connect", connect)
+    worker: threading.Thread = threading.Thread(target=borrow, name="worker")
+    worker.start()
+    assert connecting.wait(timeout=5)
+
+    # Exercise
+    with pytest.raises(psycopg.OperationalError):
+        borrow()
+    release.set()
+    worker.join(timeout=5)
+
+    # Verify
+    assert pool.tunnels == ["open"]
+
+    # Cleanup - None
+
+
+def test_query_builder() -> None:
+    """Test, if the filters are added as array parameters."""
+
+    # Setup
+    users: list[str] = [f"@user{i}:example.com" for i in range(1000)]
+
+    # Exercise
+    query: QueryBuilder = (
+        QueryBuilder()
+        .where("origin_server_ts >= %s", 0)
+        .where_any("sender", users)
+        .where_any("type", (EventType.M_ROOM_MESSAGE,))
+        .where_any("room_id", None)
+    )
+
+    # Verify
+    assert query.condition == (
+        "origin_server_ts >= %s AND sender = ANY(%s::text[]) "
+        "AND type = ANY(%s::text[])"
+    )
+    assert query.params == (0, users, ["m.room.message"])
+
+
+def test_query_builder_without_conditions() -> None:
+    """Test, if a query without conditions matches every row."""
+
+    # Exercise
+    query: QueryBuilder = QueryBuilder().where_any("sender", ())
+
+    # Verify
+    assert query.condition == "TRUE"
+    assert query.params == ()
+
+
+# vim: set ft=python :
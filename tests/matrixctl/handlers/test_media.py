@@ -0,0 +1,121 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the media buffer."""
+
+from __future__ import annotations
+
+import tempfile
+
+from pathlib import Path
+
+import pytest
+
+from matrixctl.errors import MediaTooLargeError
+from matrixctl.handlers.media import MediaBuffer
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+CHUNKS: tuple[bytes, ...] = (b"abc", b"defg", b"hi")
+
+
+@pytest.mark.parametrize("expected_size", [None, 9, 4, 20])
+def test_media_buffer_in_memory(expected_size: int | None) -> None:
+    """Test, if the chunks are collected, independent of the expected size."""
+
+    # Setup
+    desired: bytes = b"".join(CHUNKS)
+
+    # Exercise
+    with MediaBuffer(expected_size) as buf:
+        for chunk in CHUNKS:
+            buf.write(chunk)
+        actual: bytes = buf.getvalue()
+
+        # Verify
+        assert actual == desired
+        assert buf.size == len(desired)
+        assert not buf.spilled
+
+    # Cleanup - None
+
+
+def test_media_buffer_spills_to_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if the media is written to a file above the threshold."""
+
+    # Setup
+    desired: bytes = b"".join(CHUNKS)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    # Exercise
+    with MediaBuffer(spool_threshold=5) as buf:
+        for chunk in CHUNKS:
+            buf.write(chunk)
+        spilled: bool = buf.spilled
+        value: bytes = buf.getvalue()
+        files: list[Path] = list(tmp_path.iterdir())
+
+    # Verify
+    assert spilled
+    assert value == desired
+    assert len(files) == 1
+
+    # Cleanup - None
+
+
+def test_media_buffer_removes_temporary_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if the temporary file is removed, when the buffer is closed."""
+
+    # Setup
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    buf: MediaBuffer = MediaBuffer(expected_size=100, spool_threshold=10)
+
+    # Exercise
+    buf.write(b"x" * 100)
+    buf.close()
+
+    # Verify
+    assert list(tmp_path.iterdir()) == []
+
+    # Cleanup - None
+
+
+@pytest.mark.parametrize("expected_size", [None, 20])
+def test_media_buffer_max_size(expected_size: int | None) -> None:
+    """Test, if media larger than ``max_size`` is rejected."""
+
+    # Setup - None
+
+    # Exercise & Verify
+    with (  # noqa: PT012
+        pytest.raises(MediaTooLargeError),
+        MediaBuffer(expected_size, max_size=8) as buf,
+    ):
+        for chunk in CHUNKS:
+            buf.write(chunk)
+
+    # Cleanup - None
+
+
+# vim: set ft=python :
@@ -0,0 +1,169 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the media cache."""
+
+from __future__ import annotations
+
+import os
+import time
+import typing as t
+
+from pathlib import Path
+
+import pytest
+
+from matrixctl.handlers.media_cache import MediaCache
+from matrixctl.handlers.media_cache import MediaCacheConfig
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+URI: str = "mxc://example.com/abc"
+
+
+def test_media_cache_shared_across_processes(tmp_path: Path) -> None:
+    """Test, if media cached on disk is found by a new cache instance."""
+
+    # Setup
+    key: str = MediaCache.key(URI, 100, 100)
+    MediaCache(directory=tmp_path).put(key, b"image")
+
+    # Exercise
+    actual: bytes | None = MediaCache(directory=tmp_path).get(key)
+
+    # Verify
+    assert actual == b"image"
+    assert (
+        MediaCache(directory=tmp_path).get(MediaCache.key(URI, 1, 1)) is None
+    )
+
+
+def test_media_cache_stores_content_once(tmp_path: Path) -> None:
+    """Test, if the same media under different keys is stored once."""
+
+    # Setup
+    cache: MediaCache = MediaCache(directory=tmp_path)
+
+    # Exercise
+    cache.put(MediaCache.key(URI, 100, 100), b"image")
+    cache.put(MediaCache.key("mxc://example.com/def", 100, 100), b"image")
+
+    # Verify
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+    assert len(list((tmp_path / "index").iterdir())) == 2  # noqa: PLR2004
+
+
+def test_media_cache_memory_tier_bounded_by_bytes(tmp_path: Path) -> None:
+    """Test, if the least recently used media leaves the memory tier."""
+
+    # Setup
+    cache: MediaCache = MediaCache(
+        MediaCacheConfig(memory_max_bytes=10, disk_max_bytes=0),
+        tmp_path,
+    )
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")  # Mark "a" as recently used
+
+    # Exercise
+    cache.put("c", b"cccc")
+
+    # Verify
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+    assert not tmp_path.joinpath("blobs").exists()
+
+
+def test_media_cache_memory_tier_bounded_by_entries(tmp_path: Path) -> None:
+    """Test, if the memory tier holds at most the configured entries."""
+
+    # Setup
+    cache: MediaCache = MediaCache(
+        MediaCacheConfig(memory_max_entries=2, disk_max_bytes=0),
+        tmp_path,
+    )
+
+    # Exercise
+    for key in "abc":
+        cache.put(key, b"x")
+
+    # Verify
+    assert [cache.get(key) for key in "abc"] == [None, b"x", b"x"]
+
+
+def test_media_cache_disk_tier_keeps_running_total(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Test, if the blobs are only scanned, when the limit is exceeded."""
+
+    # Setup
+    cache: MediaCache = MediaCache(
+        MediaCacheConfig(memory_max_bytes=0, disk_max_bytes=3500),
+        tmp_path,
+    )
+    scans: list[int] = []
+    scan_blobs: t.Callable[[MediaCache], t.Any] = MediaCache._scan_blobs  # noqa: SLF001
+
+    def counting_scan_blobs(self: MediaCache) -> t.Any:
+        scans.append(1)
+        return scan_blobs(self)
+
+    monkeypatch.setattr(MediaCache, "_scan_blobs", counting_scan_blobs)
+
+    # Exercise
+    for i in range(3):
+        cache.put(str(i), bytes([i]) * 1000)
+    size_below_limit: str = (tmp_path / "size").read_text()
+    scans_below_limit: int = len(scans)
+    cache.put("3", b"3" * 1000)
+
+    # Verify
+    assert size_below_limit == "3000"
+    assert scans_below_limit == 1  # The size file did not exist yet
+    assert len(scans) == 2  # noqa: PLR2004
+    assert (tmp_path / "size").read_text() == "3000"
+
+
+def test_media_cache_disk_tier_evicts_least_recently_used(
+    tmp_path: Path,
+) -> None:
+    """Test, if the disk tier is bounded by bytes."""
+
+    # Setup
+    config: MediaCacheConfig = MediaCacheConfig(
+        memory_max_bytes=0,
+        disk_max_bytes=1500,
+    )
+    cache: MediaCache = MediaCache(config, tmp_path)
+    cache.put("old", b"o" * 1000)
+    old_time: float = time.time() - 60
+    for path in (tmp_path / "blobs").iterdir():
+        os.utime(path, (old_time, old_time))
+
+    # Exercise
+    cache.put("new", b"n" * 1000)
+
+    # Verify
+    assert cache.get("old") is None
+    assert cache.get("new") == b"n" * 1000
+    assert [path.name for path in (tmp_path / "index").iterdir()] == ["new"]
+
+
+# vim: set ft=python :
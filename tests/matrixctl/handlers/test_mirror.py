@@ -0,0 +1,251 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the event mirror."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import typing as t
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from matrixctl.handlers import mirror
+from matrixctl.handlers.mirror import MIRROR_SYNC_OVERLAP
+from matrixctl.handlers.mirror import SYNC_QUERY_FORWARD
+from matrixctl.handlers.mirror import EventMirror
+from matrixctl.sanitizers import EventType
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+ROOM: str = "!room:example.com"
+
+
+def remote_event(stream_ordering: int) -> tuple[t.Any, ...]:
+    """Create a row of the sync query."""
+    return (
+        f"$event{stream_ordering}",
+        stream_ordering,
+        ROOM,
+        f"@user{stream_ordering % 2}:example.com",
+        "m.room.message" if stream_ordering % 3 else "m.room.member",
+        10_000 + 1000 * stream_ordering,
+        10_000 + 1000 * stream_ordering + 1,
+        "{}",
+    )
+
+
+class FakeHomeserver:
+    """Answer the sync queries with the events, the homeserver has."""
+
+    def __init__(self, stream_orderings: t.Iterable[int]) -> None:
+        self.events: list[tuple[t.Any, ...]] = [
+            remote_event(i) for i in stream_orderings
+        ]
+        self.queries: list[tuple[bool, int]] = []
+
+    def fetch_batches(
+        self,
+        _: t.Any,
+        query: str,
+        params: tuple[str, int],
+        itersize: int,
+    ) -> Iterator[list[tuple[t.Any, ...]]]:
+        """Fetch the events after the mark."""
+        forward: bool = query == SYNC_QUERY_FORWARD
+        mark: int = params[1]
+        self.queries.append((forward, mark))
+        rows: list[tuple[t.Any, ...]] = sorted(
+            (
+                e
+                for e in self.events
+                if (e[1] > mark if forward else e[1] < mark)
+            ),
+            key=lambda e: e[1],
+            reverse=not forward,
+        )
+        for i in range(0, len(rows), itersize):
+            yield rows[i : i + itersize]
+
+
+@pytest.fixture
+def homeserver(monkeypatch: pytest.MonkeyPatch) -> FakeHomeserver:
+    """Create a homeserver with backfilled and new events."""
+    homeserver_: FakeHomeserver = FakeHomeserver(range(-5, 11))
+    monkeypatch.setattr(mirror, "fetch_batches", homeserver_.fetch_batches)
+    return homeserver_
+
+
+def test_event_mirror_sync_room(
+    homeserver: FakeHomeserver,
+    tmp_path: Path,
+) -> None:
+    """Test, if only the events after the marks are read again."""
+
+    # Setup
+    path: Path = tmp_path / "mirror.sqlite3"
+    conn: t.Any = None
+
+    # Exercise
+    with EventMirror(path) as event_mirror:
+        first: int = event_mirror.sync_room(conn, ROOM, itersize=4)
+        homeserver.events += [remote_event(11), remote_event(-6)]
+        second: int = event_mirror.sync_room(conn, ROOM, itersize=4)
+    with EventMirror(path) as event_mirror:  # Next process
+        marks: tuple[int, int] = event_mirror.marks(ROOM)
+        rooms: list[str] = event_mirror.rooms()
+        events: int = len(list(event_mirror.events()))
+
+    # Verify
+    assert (first, second) == (16, 2)
+    assert marks == (11, -6)
+    assert rooms == [ROOM]
+    assert events == 18  # noqa: PLR2004
+    assert homeserver.queries[2:] == [
+        (True, 10 - MIRROR_SYNC_OVERLAP),
+        (False, -5 + MIRROR_SYNC_OVERLAP),
+    ]
+
+
+def test_event_mirror_events(
+    homeserver: FakeHomeserver,
+    tmp_path: Path,
+) -> None:
+    """Test, if the events are filtered and ordered by time."""
+
+    # Setup
+    with EventMirror(tmp_path / "mirror.sqlite3") as event_mirror:
+        event_mirror.sync_room(t.cast(t.Any, None), ROOM)
+
+        # Exercise
+        actual: list[t.Any] = list(
+            event_mirror.events(
+                since=11_000,
+                until=18_000,
+                users=["@user1:example.com"],
+                room_ids=[ROOM],
+                event_types=[EventType.M_ROOM_MESSAGE],
+            )
+        )
+
+    # Verify
+    assert actual == [
+        ("$event1", "{}", 11_000, 11_001),
+        ("$event5", "{}", 15_000, 15_001),
+        ("$event7", "{}", 17_000, 17_001),
+    ]
+    assert homeserver.queries == [
+        (True, -MIRROR_SYNC_OVERLAP),
+        (False, MIRROR_SYNC_OVERLAP),
+    ]
+
+
+def message(
+    stream_ordering: int, room_id: str, body: str
+) -> tuple[t.Any, ...]:
+    """Create a row of the sync query with a text message."""
+    return (
+        f"$message{stream_ordering}",
+        stream_ordering,
+        room_id,
+        f"@user{stream_ordering % 2}:example.com",
+        "m.room.message",
+        10_000 + 1000 * stream_ordering,
+        10_000 + 1000 * stream_ordering + 1,
+        json.dumps({"content": {"msgtype": "m.text", "body": body}}),
+    )
+
+
+def test_event_mirror_index_messages(tmp_path: Path) -> None:
+    """Test, if only new messages are indexed, batch by batch."""
+
+    # Setup
+    event_mirror: EventMirror = EventMirror(tmp_path / "mirror.sqlite3")
+    event_mirror.store(
+        ROOM,
+        [
+            message(1, ROOM, "Deploying the homeserver"),
+            remote_event(2),  # No body
+            message(3, ROOM, "Déployé"),
+        ],
+    )
+
+    # Exercise
+    first: int = event_mirror.index_messages(batch_size=1)
+    event_mirror.store(ROOM, [message(4, ROOM, "deploy again")])
+    second: int = event_mirror.index_messages(batch_size=1)
+    third: int = event_mirror.index_messages()
+
+    # Verify
+    assert (first, second, third) == (2, 1, 0)
+    assert sorted(row[0] for row in event_mirror.search("deploy*")) == [
+        "$message1",
+        "$message3",  # Without diacritics
+        "$message4",
+    ]
+
+    # Cleanup
+    event_mirror.close()
+
+
+def test_event_mirror_search(tmp_path: Path) -> None:
+    """Test, if the matches are filtered by sender, room and time."""
+
+    # Setup
+    other_room: str = "!other:example.com"
+    event_mirror: EventMirror = EventMirror(tmp_path / "mirror.sqlite3")
+    event_mirror.store(
+        ROOM,
+        [
+            message(1, ROOM, "synapse is up"),
+            message(2, other_room, "synapse is up"),
+            message(3, ROOM, "synapse is down"),
+            message(5, ROOM, "synapse is up again"),
+            message(7, ROOM, "dendrite is up"),
+        ],
+    )
+    event_mirror.index_messages()
+
+    # Exercise
+    actual: list[str] = sorted(
+        row[0]
+        for row in event_mirror.search(
+            "synapse AND up",
+            since=11_000,
+            until=17_000,
+            users=["@user1:example.com"],
+            room_ids=[ROOM],
+        )
+    )
+    limited: int = len(list(event_mirror.search("synapse", limit=2)))
+
+    # Verify
+    assert actual == ["$message1", "$message5"]
+    assert limited == 2  # noqa: PLR2004
+    with pytest.raises(sqlite3.OperationalError):
+        event_mirror.search("synapse AND")
+
+    # Cleanup
+    event_mirror.close()
+
+
+# vim: set ft=python :
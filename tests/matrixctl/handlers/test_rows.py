@@ -0,0 +1,87 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the row handler."""
+
+from __future__ import annotations
+
+import io
+import typing as t
+
+from rich.text import Text
+
+from matrixctl.handlers.rows import Ctx
+from matrixctl.handlers.rows import RowWriter
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+class CountingBytesIO(io.BytesIO):
+    """Count the writes to the stream."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes: int = 0
+
+    def write(self, b: t.Any) -> int:  # noqa: D102
+        self.writes += 1
+        return super().write(b)
+
+
+def test_row_writer_batches_rows() -> None:
+    """Test, if rows are collected and written at once."""
+
+    # Setup
+    out: CountingBytesIO = CountingBytesIO()
+
+    # Exercise
+    with RowWriter(out, flush_interval=60, line_buffered=False) as writer:
+        for i in range(100):
+            writer.write(Text(f"row {i}"))
+        writes_before_exit: int = out.writes
+
+    # Verify
+    assert writes_before_exit == 0
+    assert out.writes == 1
+    assert out.getvalue().decode().splitlines()[:4] == [
+        "row 0",
+        "",
+        "row 1",
+        "",
+    ]
+
+
+def test_row_writer_line_buffered_and_post_buf() -> None:
+    """Test, if a line buffered writer writes every row with its image."""
+
+    # Setup
+    out: CountingBytesIO = CountingBytesIO()
+    ctx: Ctx = Ctx(Text("row 0"), b"<image>")
+
+    # Exercise
+    writer: RowWriter = RowWriter(out, line_buffered=True)
+    writer.write(ctx.text, ctx)
+    writes_after_first_row: int = out.writes
+    writer.write(Text("row 1"))
+
+    # Verify
+    assert writes_after_first_row > 0
+    assert out.getvalue() == b"row 0\n<image>\nrow 1\n\n"
+
+
+# vim: set ft=python :
@@ -204,4 +204,98 @@ def test_get_ui_image_max_height_of_terminal(yaml: YAML) -> None:
     # Cleanup - None
 
 
+def test_get_api_connection_pool_max_connections(yaml: YAML) -> None:
+    """Test api -> connection_pool -> max_connections."""
+
+    # Setup
+    desired: int = 10
+
+    # Exercise
+    actual: int = yaml.get(
+        "server", "api", "connection_pool", "max_connections"
+    )
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
+def test_get_api_connection_pool_keepalive_expiry(yaml: YAML) -> None:
+    """Test api -> connection_pool -> keepalive_expiry."""
+
+    # Setup
+    desired: float = 30.0
+
+    # Exercise
+    actual: float = yaml.get(
+        "server", "api", "connection_pool", "keepalive_expiry"
+    )
+
+    # Verify
+    assert pytest.approx(actual, 0.1) == desired
+
+    # Cleanup - None
+
+
+def test_get_api_response_cache_enabled(yaml: YAML) -> None:
+    """Test api -> response_cache -> enabled."""
+
+    # Setup
+    desired: bool = False
+
+    # Exercise
+    actual: bool = yaml.get("server", "api", "response_cache", "enabled")
+
+    # Verify
+    assert actual is desired
+
+    # Cleanup - None
+
+
+def test_get_ui_image_cache_memory_max_entries(yaml: YAML) -> None:
+    """Test ui -> image -> cache -> memory_max_entries."""
+
+    # Setup
+    desired: int = 1024
+
+    # Exercise
+    actual: int = yaml.get("ui", "image", "cache", "memory_max_entries")
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
+def test_get_ui_image_cache_disk_max_bytes(yaml: YAML) -> None:
+    """Test ui -> image -> cache -> disk_max_bytes."""
+
+    # Setup
+    desired: int = 256 * 1024 * 1024
+
+    # Exercise
+    actual: int = yaml.get("ui", "image", "cache", "disk_max_bytes")
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
+def test_get_database_itersize(yaml: YAML) -> None:
+    """Test server -> database -> itersize."""
+
+    # Setup
+    desired: int = 2000
+
+    # Exercise
+    actual: int = yaml.get("server", "database", "itersize")
+
+    # Verify
+    assert actual == desired
+
+    # Cleanup - None
+
+
 # vim: set ft=python :
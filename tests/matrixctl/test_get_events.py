@@ -0,0 +1,137 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the output of the get-events command."""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import typing as t
+
+from pathlib import Path
+
+import pytest
+
+from matrixctl.commands.get_events.addon import export_events
+from matrixctl.commands.get_events.addon import open_export
+from matrixctl.commands.get_events.addon import output_as_compact_json
+from matrixctl.commands.get_events.addon import output_as_ndjson
+from matrixctl.commands.get_events.addon import resolve_output_format
+from matrixctl.commands.get_events.parser import OutputType
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+EVENTS: list[str] = [
+    '{"type":"m.room.message","content":{"body":"a\\nb"}}',
+    '{"type":"m.room.member","content":{"membership":"join"}}',
+]
+
+
+def test_output_as_ndjson() -> None:
+    """Test, if the events are written verbatim, one per line."""
+
+    # Setup
+    out: io.BytesIO = io.BytesIO()
+    cur: t.Any = [("$a", EVENTS[0], 0, 0), ("$b", EVENTS[1], 0, 0)]
+
+    # Exercise
+    err_code: int = output_as_ndjson(cur, out)
+
+    # Verify
+    assert err_code == 0
+    assert out.getvalue().decode().splitlines() == EVENTS
+
+
+@pytest.mark.parametrize("number_of_events", [0, 1, 2])
+def test_output_as_compact_json(number_of_events: int) -> None:
+    """Test, if the events are written as valid JSON array."""
+
+    # Setup
+    out: io.BytesIO = io.BytesIO()
+    events: list[str] = EVENTS[:number_of_events]
+    cur: t.Any = [("$a", event, 0, 0) for event in events]
+
+    # Exercise
+    output_as_compact_json(cur, out)
+
+    # Verify
+    assert json.loads(out.getvalue()) == [json.loads(e) for e in events]
+
+
+def test_export_events() -> None:
+    """Test, if the header and the data of ``COPY`` are written."""
+
+    # Setup
+    chunks: list[bytes] = [f"{event}\n".encode() for event in EVENTS]
+    out: io.BytesIO = io.BytesIO()
+
+    # Exercise
+    err_code: int = export_events(chunks, out, header=b"json\n")
+
+    # Verify
+    assert err_code == 0
+    assert out.getvalue() == b"json\n" + b"".join(chunks)
+
+
+@pytest.mark.parametrize("name", ["events.ndjson", "events.ndjson.gz"])
+def test_open_export(tmp_path: Path, name: str) -> None:
+    """Test, if the file is compressed, when it ends with ".gz"."""
+
+    # Setup
+    path: Path = tmp_path / name
+
+    # Exercise
+    with open_export(path) as out:
+        out.write(b"{}\n")
+
+    # Verify
+    data: bytes = path.read_bytes()
+    if name.endswith(".gz"):
+        data = gzip.decompress(data)
+    assert data == b"{}\n"
+
+
+@pytest.mark.parametrize(
+    ("output_format", "export", "desired"),
+    [
+        (None, None, OutputType.ROWS),
+        (None, Path("events.ndjson"), OutputType.NDJSON),
+        (None, Path("events.json.gz"), OutputType.NDJSON),
+        (None, Path("events.csv"), OutputType.CSV),
+        (None, Path("events.csv.gz"), OutputType.CSV),
+        (OutputType.NDJSON, Path("events.csv"), OutputType.NDJSON),
+        (OutputType.JSON, None, OutputType.JSON),
+    ],
+)
+def test_resolve_output_format(
+    output_format: OutputType | None,
+    export: Path | None,
+    desired: OutputType,
+) -> None:
+    """Test, if exports without an output format get an export format."""
+
+    # Exercise
+    actual: OutputType = resolve_output_format(output_format, export)
+
+    # Verify
+    assert actual is desired
+
+
+# vim: set ft=python :
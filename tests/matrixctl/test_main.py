@@ -0,0 +1,87 @@
+# matrixctl
+# Copyright (c) 2021-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the entrypoint of the application."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import typing as t
+
+import pytest
+
+from matrixctl import __main__ as main
+from matrixctl.handlers.yaml import YAML
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+def test_parsers_do_not_import_the_database_driver() -> None:
+    """Test, if the database driver is only imported by addons using it."""
+
+    # Setup
+    code: str = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "import matrixctl.__main__\n"
+        "from matrixctl import command\n"
+        "command.import_commands_from(\n"
+        "    str(Path(matrixctl.__main__.__file__).parent / 'commands'),\n"
+        "    'matrixctl.commands',\n"
+        "    'parser',\n"
+        ")\n"
+        "print(sorted({'psycopg', 'sshtunnel'} & set(sys.modules)))\n"
+    )
+
+    # Exercise
+    actual: str = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.strip()
+
+    # Verify
+    assert actual == "[]"
+
+
+def test_setup_handlers_only_configures_imported_handlers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if only the handlers imported by the addon are configured."""
+
+    # Setup
+    configured: list[str] = []
+    monkeypatch.setattr(
+        main,
+        "HANDLER_SETUPS",
+        (
+            ("matrixctl.handlers.yaml", lambda _: configured.append("yaml")),
+            ("matrixctl.not_imported", lambda _: configured.append("other")),
+        ),
+    )
+
+    # Exercise
+    main.setup_handlers(t.cast(YAML, None))
+
+    # Verify
+    assert configured == ["yaml"]
+
+
+# vim: set ft=python :
@@ -0,0 +1,77 @@
+# matrixctl
+# Copyright (c) 2021-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the parsers."""
+
+from __future__ import annotations
+
+import pytest
+
+from matrixctl.errors import ParserError
+from matrixctl.parse import Mxc
+from matrixctl.parse import parse_mxc_uri
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+@pytest.mark.parametrize(
+    ("uri", "desired"),
+    [
+        (
+            "mxc://matrix.org/rFzCZiffizZGTyWXWONCVjXw",
+            Mxc("matrix.org", "rFzCZiffizZGTyWXWONCVjXw"),
+        ),
+        ("mxc://example.com:8448/a_b-c", Mxc("example.com:8448", "a_b-c")),
+        ("mxc://[::1]:8448/abc", Mxc("[::1]:8448", "abc")),
+    ],
+)
+def test_parse_mxc_uri(uri: str, desired: Mxc) -> None:
+    """Test, if valid URIs are split into homeserver and media ID."""
+
+    # Exercise
+    actual: Mxc = parse_mxc_uri(uri)
+
+    # Verify
+    assert actual == desired
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "https://matrix.org/abc",
+        "mxc://matrix.org",
+        "mxc://matrix.org/abc/def",
+        "mxc://../..",
+        "mxc://x/..",
+        "mxc://./abc",
+        "mxc://../abc",
+        "mxc://matrix.org/",
+        "mxc://matrix.org/a.png",
+        "mxc://ma trix.org/abc",
+        "mxc://matrix.org\\..\\/abc",
+    ],
+)
+def test_parse_mxc_uri_invalid(uri: str) -> None:
+    """Test, if URIs, which are not safe as path components, are rejected."""
+
+    # Exercise & Verify
+    with pytest.raises(ParserError):
+        parse_mxc_uri(uri)
+
+
+# vim: set ft=python :
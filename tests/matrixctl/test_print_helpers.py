@@ -0,0 +1,169 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the print helpers."""
+
+from __future__ import annotations
+
+import threading
+import typing as t
+
+import pytest
+
+from matrixctl import print_helpers
+from matrixctl.handlers.media import MediaBuffer
+from matrixctl.handlers.rows import image_references
+from matrixctl.handlers.yaml import YAML
+from matrixctl.print_helpers import ImagePrefetcher
+from matrixctl.print_helpers import ImageSizePx
+from matrixctl.print_helpers import PendingImage
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+YAML_: YAML = t.cast(YAML, None)
+
+
+def test_image_references() -> None:
+    """Test, if the images of image and member events are found."""
+
+    # Setup
+    image: dict[str, t.Any] = {
+        "type": "m.room.message",
+        "content": {
+            "msgtype": "m.image",
+            "url": "mxc://example.com/abc",
+            "info": {"w": 640, "h": 480},
+        },
+    }
+    member: dict[str, t.Any] = {
+        "type": "m.room.member",
+        "content": {"avatar_url": "mxc://example.com/def"},
+    }
+    text: dict[str, t.Any] = {
+        "type": "m.room.message",
+        "content": {"msgtype": "m.text", "body": "Hello"},
+    }
+
+    # Exercise
+    actual: list[t.Any] = [
+        image_references(ev) for ev in (image, member, text, {})
+    ]
+
+    # Verify
+    assert actual == [
+        [("mxc://example.com/abc", 640, 480)],
+        [("mxc://example.com/def", 100, 100)],
+        [],
+        [],
+    ]
+
+
+def test_image_prefetcher_downloads_concurrently(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if submitted images are downloaded in parallel."""
+
+    # Setup
+    barrier: threading.Barrier = threading.Barrier(3, timeout=5)
+
+    def load_image(uri: str, _: ImageSizePx | None, __: YAML) -> bytes:
+        barrier.wait()  # Blocks, unless all three downloads run at once
+        return uri.encode()
+
+    monkeypatch.setattr(print_helpers, "load_image", load_image)
+    monkeypatch.setattr(
+        print_helpers,
+        "get_image_size_in_px",
+        lambda *_: ImageSizePx(10, 10),
+    )
+    uris: list[str] = [f"mxc://example.com/{i}" for i in range(3)]
+
+    # Exercise
+    with ImagePrefetcher(max_workers=3) as prefetcher:
+        for uri in uris:
+            prefetcher.submit(uri, 10, 10, YAML_)
+        pending: list[PendingImage | None] = [
+            prefetcher.pop(uri, 10, 10) for uri in uris
+        ]
+        actual: list[bytes] = [
+            p.future.result(timeout=5) for p in pending if p is not None
+        ]
+        unknown: PendingImage | None = prefetcher.pop(uris[0], 10, 10)
+
+    # Verify
+    assert actual == [uri.encode() for uri in uris]
+    assert unknown is None
+
+
+class FakeYAML:
+    """Provide the configuration of an image download."""
+
+    values: t.ClassVar[dict[tuple[str, ...], t.Any]] = {
+        ("ui", "image", "max_size"): 4096,
+        ("server", "api", "media", "max_size"): 0,
+        ("server", "api", "media", "spool_threshold"): 1024,
+        ("server", "api", "domain"): "example.com",
+    }
+
+    def get(self, *keys: str) -> t.Any:
+        """Get a value of the configuration."""
+        return self.values[keys]
+
+    def get_api_token(self) -> str:
+        """Get the token."""
+        return "token"
+
+
+def test_download_image_is_not_spooled(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if an image bounded by its maximum size stays in memory."""
+
+    # Setup
+    buffers: list[MediaBuffer] = []
+
+    def download_thumbnail_to_buf(**kwargs: t.Any) -> MediaBuffer:
+        buf: MediaBuffer = MediaBuffer(
+            spool_threshold=kwargs["spool_threshold"],
+            max_size=kwargs["max_size"],
+        )
+        buf.write(b"x" * 2048)
+        buffers.append(buf)
+        return buf
+
+    monkeypatch.setattr(
+        print_helpers,
+        "download_thumbnail_to_buf",
+        download_thumbnail_to_buf,
+    )
+
+    # Exercise
+    actual: bytes = print_helpers.download_image(
+        "mxc://example.com/abc",
+        ImageSizePx(10, 10),
+        t.cast(YAML, FakeYAML()),
+    )
+
+    # Verify
+    assert actual == b"x" * 2048
+    assert not buffers[0].spilled
+
+    # Cleanup - None
+
+
+# vim: set ft=python :
@@ -0,0 +1,79 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the records."""
+
+from __future__ import annotations
+
+from matrixctl.records import RoomRecord
+from matrixctl.records import UserRecord
+from matrixctl.typehints import JsonDict
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+def test_user_record_from_json() -> None:
+    """Test, if a user is decoded by the keys of the payload."""
+
+    # Setup
+    user: JsonDict = {
+        "name": "@user:example.com",
+        "displayname": "User",
+        "admin": True,
+        "deactivated": False,
+        "shadow_banned": False,
+        "is_guest": False,
+    }
+
+    # Exercise
+    actual: UserRecord = UserRecord.from_json(user)
+
+    # Verify
+    assert actual.name == "@user:example.com"
+    assert actual.displayname == "User"
+    assert actual.admin is True
+    assert actual.deactivated is False
+
+    # Cleanup - None
+
+
+def test_room_record_from_json_missing_and_unknown_keys() -> None:
+    """Test, if missing keys are ``None`` and unknown keys are dropped."""
+
+    # Setup
+    room: JsonDict = {
+        "room_id": "!room:example.com",
+        "joined_members": 2,
+        "joined_local_members": 1,
+        "unknown_key": "value",
+    }
+
+    # Exercise
+    actual: RoomRecord = RoomRecord.from_json(room)
+
+    # Verify
+    assert actual.room_id == "!room:example.com"
+    assert actual.joined_members == 2  # noqa: PLR2004
+    assert actual.name is None
+    assert len(actual) == len(RoomRecord._fields)
+    assert not hasattr(actual, "__dict__")
+
+    # Cleanup - None
+
+
+# vim: set ft=python :
@@ -0,0 +1,66 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the search command."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from matrixctl.commands.search.addon import is_query_error
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["synapse AND", '"synapse', "synapse:up", "NEAR(a b, x)"],
+)
+def test_is_query_error(query: str) -> None:
+    """Test, if invalid FTS5 queries are recognized."""
+
+    # Setup
+    conn: sqlite3.Connection = sqlite3.connect(":memory:")
+    conn.execute("CREATE VIRTUAL TABLE messages USING fts5 (body)")
+
+    # Exercise
+    with pytest.raises(sqlite3.OperationalError) as exc_info:
+        conn.execute("SELECT * FROM messages WHERE messages MATCH ?", (query,))
+
+    # Verify
+    assert is_query_error(exc_info.value)
+
+    # Cleanup
+    conn.close()
+
+
+def test_is_query_error_locked() -> None:
+    """Test, if other errors are not reported as invalid queries."""
+
+    # Exercise
+    actual: bool = is_query_error(
+        sqlite3.OperationalError("database is locked")
+    )
+
+    # Verify
+    assert not actual
+
+
+# vim: set ft=python :
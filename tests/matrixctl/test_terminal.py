@@ -0,0 +1,222 @@
+# matrixctl
+# Copyright (c) 2020-2023  Michael Sasser <Michael@MichaelSasser.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the terminal helpers."""
+
+from __future__ import annotations
+
+import io
+import re
+import sys
+import typing as t
+
+from base64 import b64decode
+from base64 import b64encode
+from pathlib import Path
+
+import pytest
+
+from matrixctl import terminal
+from matrixctl.terminal import KITTY_CHUNK_SIZE
+from matrixctl.terminal import KITTY_PLACEHOLDER
+from matrixctl.terminal import PNG_SIGNATURE
+from matrixctl.terminal import ImageProtocol
+from matrixctl.terminal import KittyGraphics
+from matrixctl.terminal import TerminalCellSizeCache
+from matrixctl.terminal import TerminalCellSizePx
+from matrixctl.terminal import iter_b64encode
+from matrixctl.terminal import write_imgcat
+
+
+__author__: str = "Michael Sasser"
+__email__: str = "Michael@MichaelSasser.org"
+
+KITTY_COMMAND: re.Pattern[bytes] = re.compile(
+    rb"\033_G([^;\033]*);?([^\033]*)\033\\"
+)
+
+
+@pytest.mark.parametrize(
+    ("env", "desired"),
+    [
+        ({"TERM": "xterm-kitty"}, ImageProtocol.KITTY),
+        (
+            {"TERM": "xterm-256color", "KITTY_WINDOW_ID": "1"},
+            ImageProtocol.KITTY,
+        ),
+        ({"TERM": "xterm-256color"}, ImageProtocol.ITERM2),
+    ],
+)
+def test_image_protocol_detect(
+    monkeypatch: pytest.MonkeyPatch,
+    env: dict[str, str],
+    desired: ImageProtocol,
+) -> None:
+    """Test, if the image protocol is detected from the environment."""
+
+    # Setup
+    monkeypatch.delenv("KITTY_WINDOW_ID", raising=False)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+
+    # Exercise
+    actual: ImageProtocol = ImageProtocol.detect()
+
+    # Verify
+    assert actual is desired
+
+
+def test_kitty_graphics_transmits_image_once(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test, if an image is transmitted in chunks once and placed by ID."""
+
+    # Setup
+    monkeypatch.setenv("TERM", "xterm-kitty")
+    image: bytes = PNG_SIGNATURE + bytes(range(256)) * 20
+    kitty: KittyGraphics = KittyGraphics()
+
+    # Exercise
+    first: bytes = kitty.render(image, rows=5)
+    second: bytes = kitty.render(image, rows=5)
+
+    # Verify
+    commands: list[tuple[bytes, bytes]] = KITTY_COMMAND.findall(first)
+    *transmit, place = commands
+    assert len(transmit) > 1
+    assert all(len(payload) <= KITTY_CHUNK_SIZE for _, payload in transmit)
+    assert b64decode(b"".join(payload for _, payload in transmit)) == image
+    assert transmit[0][0].startswith(b"a=t,f=100,i=")
+    assert [control[-3:] for control, _ in transmit] == [b"m=1"] * (
+        len(transmit) - 1
+    ) + [b"m=0"]
+    assert place[0].startswith(b"a=p,i=")
+    assert place[0].endswith(b",r=5")
+    assert KITTY_COMMAND.findall(second) == [place]
+
+
+def test_kitty_graphics_replaces_non_png() -> None:
+    """Test, if images, which are not PNG images, are shown as placeholder."""
+
+    # Exercise
+    actual: bytes = KittyGraphics().render(b"\xff\xd8\xff\xe0JFIF")
+
+    # Verify
+    assert actual == KITTY_PLACEHOLDER + b"\n"
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 4, 3 * 1024, 3 * 1024 + 1])
+def test_iter_b64encode(size: int) -> None:
+    """Test, if the chunks join to the base64 encoding of the data."""
+
+    # Setup
+    data: bytes = bytes(range(256)) * 13
+    data = data[:size]
+
+    # Exercise
+    actual: bytes = b"".join(iter_b64encode(data, chunk_size=3 * 256))
+
+    # Verify
+    assert actual == b64encode(data)
+
+
+def test_write_imgcat(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test, if the escape sequence is written to the stream."""
+
+    # Setup
+    monkeypatch.setenv("TERM", "xterm-256color")
+    data: bytes = PNG_SIGNATURE + bytes(range(256)) * 1000
+    out: io.BytesIO = io.BytesIO()
+
+    # Exercise
+    write_imgcat(out, data, height="100px", preserve_aspect_ratio=True)
+
+    # Verify
+    assert out.getvalue() == (
+        b"\033]1337;File=;size="
+        + str(len(data)).encode()
+        + b";inline=1;preserveAspectRatio=1;width=auto;height=100px:"
+        + b64encode(data)
+        + b"\a\n"
+    )
+
+
+@pytest.fixture
+def probes(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Count the probes of a fake terminal on /dev/pts/1."""
+    calls: list[int] = []
+
+    def probe() -> TerminalCellSizePx:
+        calls.append(1)
+        return TerminalCellSizePx(10, 20)
+
+    monkeypatch.setattr(terminal, "probe_terminal_cell_size_in_px", probe)
+    monkeypatch.setattr(sys.stdin, "isatty", lambda: True)
+    monkeypatch.setattr(sys.stdin, "fileno", lambda: 0)
+    monkeypatch.setattr(terminal.os, "ttyname", lambda _: "/dev/pts/1")
+    monkeypatch.setattr(
+        TerminalCellSizeCache,
+        "_fingerprint",
+        staticmethod(lambda: {"term": "xterm", "lines": 24, "columns": 80}),
+    )
+    return calls
+
+
+def test_terminal_cell_size_cache_probes_once(
+    probes: list[int],
+    tmp_path: Path,
+) -> None:
+    """Test, if the terminal is probed once per TTY."""
+
+    # Setup
+    cache: TerminalCellSizeCache = TerminalCellSizeCache(tmp_path)
+
+    # Exercise
+    actual: list[TerminalCellSizePx | None] = [cache.get() for _ in range(3)]
+    actual.append(TerminalCellSizeCache(tmp_path).get())  # Next process
+
+    # Verify
+    assert actual == [TerminalCellSizePx(10, 20)] * 4
+    assert len(probes) == 1
+
+
+def test_terminal_cell_size_cache_invalidated(
+    monkeypatch: pytest.MonkeyPatch,
+    probes: list[int],
+    tmp_path: Path,
+) -> None:
+    """Test, if the terminal is probed again after it was resized."""
+
+    # Setup
+    cache: TerminalCellSizeCache = TerminalCellSizeCache(tmp_path)
+    cache.get()
+    resized: dict[str, t.Any] = {"term": "xterm", "lines": 50, "columns": 80}
+    monkeypatch.setattr(
+        TerminalCellSizeCache,
+        "_fingerprint",
+        staticmethod(lambda: resized),
+    )
+
+    # Exercise
+    cache.invalidate()  # SIGWINCH
+    cache.get()
+    TerminalCellSizeCache(tmp_path).get()  # Next process, same size
+
+    # Verify
+    assert len(probes) == 2  # noqa: PLR2004
+
+
+# vim: set ft=python :